@@ -0,0 +1,171 @@
+"""Estado de agregação persistido para CSVs que só crescem no final.
+
+O snapshot guarda o cubo já agregado e até que byte do arquivo ele foi
+construído. Na execução seguinte só os bytes depois desse ponto são lidos
+e somados ao cubo, então uma atualização diária custa o tamanho do dia,
+não o do histórico.
+
+Para detectar que o arquivo foi reescrito (e não só estendido) o snapshot
+guarda também o cabeçalho e um hash dos últimos bytes consumidos; se algo
+não bater, o estado é reconstruído do zero. O mesmo vale para uma troca
+de resolução do cubo (mensal ou diária, veja `gr.RESOLUCAO_CUBO`) ou de
+esquema de leitura (`gr.ESQUEMAS`).
+"""
+import hashlib
+import io
+import os
+from io import BytesIO
+
+import pandas as pd
+
+import generate_report as gr
+
+VERSAO_ESTADO = 1
+BYTES_CAUDA   = 64 * 1024
+
+
+def _hash_trecho(f, inicio, fim):
+    f.seek(inicio)
+    h = hashlib.blake2b(digest_size=16)
+    while inicio < fim:
+        bloco = f.read(min(BYTES_CAUDA, fim - inicio))
+        if not bloco:
+            break
+        h.update(bloco)
+        inicio += len(bloco)
+    return h.hexdigest()
+
+
+class _Trecho(io.RawIOBase):
+    """Leitura de `f` de `inicio` até `fim`: o pandas lê o trecho aos poucos e para no limite."""
+
+    def __init__(self, f, inicio, fim):
+        super().__init__()
+        f.seek(inicio)
+        self._f     = f
+        self._resta = fim - inicio
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        n = min(len(destino), self._resta)
+        if n <= 0:
+            return 0
+        lidos = self._f.readinto(memoryview(destino)[:n])
+        self._resta -= lidos
+        return lidos
+
+
+def _fim_ultima_linha(f, tamanho):
+    """Posição logo após o último '\\n' do arquivo (ignora uma linha parcial)."""
+    pos = tamanho
+    while pos > 0:
+        inicio = max(0, pos - BYTES_CAUDA)
+        f.seek(inicio)
+        trecho = f.read(pos - inicio)
+        i = trecho.rfind(b"\n")
+        if i >= 0:
+            return inicio + i + 1
+        pos = inicio
+    return 0
+
+
+def _agregar(fonte, colunas, chunksize, resolucao, esquema, cubo):
+    """Soma ao `cubo` (ou None) as linhas CSV lidas de `fonte`; devolve (cubo, linhas)."""
+    linhas = 0
+    with gr._ler_csv(fonte, esquema, header=None, names=colunas,
+                     chunksize=chunksize) as leitor:
+        for bloco in leitor:
+            parcial = gr.construir_cubo(gr.preparar_linhas(bloco, esquema), resolucao)
+            cubo = parcial if cubo is None else gr.combinar_cubos([cubo, parcial])
+            linhas += len(bloco)
+    return cubo, linhas
+
+
+def carregar_estado(caminho_estado):
+    try:
+        estado = pd.read_pickle(caminho_estado)
+    except (OSError, EOFError, ValueError):
+        return None
+    if not isinstance(estado, dict) or estado.get("versao") != VERSAO_ESTADO:
+        return None
+    return estado
+
+
+def salvar_estado(estado, caminho_estado):
+    tmp = caminho_estado + ".tmp"
+    pd.to_pickle(estado, tmp)
+    os.replace(tmp, caminho_estado)
+
+
+def _estado_valido(estado, f, caminho, cabecalho, tamanho, resolucao, esquema):
+    return (
+        estado is not None
+        and estado["entrada"] == os.path.abspath(caminho)
+        and estado.get("resolucao", "M") == resolucao
+        and estado.get("esquema", "padrao") == esquema
+        and estado["cabecalho"] == cabecalho
+        and estado["offset"] <= tamanho
+        and estado["hash_cauda"] == _hash_trecho(
+            f, max(len(cabecalho), estado["offset"] - BYTES_CAUDA), estado["offset"])
+    )
+
+
+def atualizar(caminho, caminho_estado, chunksize=100_000, resolucao="M", esquema="padrao"):
+    """Atualiza o snapshot com as linhas novas de `caminho` e devolve (cubo, info).
+
+    `info` descreve o que foi feito: "modo" ("incremental" ou "completo"),
+    bytes e linhas lidos nesta execução e o total de linhas do estado.
+    """
+    estado = carregar_estado(caminho_estado)
+    with open(caminho, "rb") as f:
+        cabecalho = f.readline()
+        colunas = cabecalho.decode("utf-8-sig").strip().split(",")
+        tamanho = os.fstat(f.fileno()).st_size
+        fim = _fim_ultima_linha(f, tamanho)
+
+        if _estado_valido(estado, f, caminho, cabecalho, tamanho, resolucao, esquema):
+            modo, inicio, cubo, linhas = "incremental", estado["offset"], estado["cubo"], estado["linhas"]
+        else:
+            modo, inicio, cubo, linhas = "completo", len(cabecalho), None, 0
+
+        novas = 0
+        if fim > inicio:
+            cubo, novas = _agregar(io.BufferedReader(_Trecho(f, inicio, fim)), colunas,
+                                   chunksize, resolucao, esquema, cubo)
+        offset = max(fim, inicio)
+        hash_cauda = _hash_trecho(f, max(len(cabecalho), offset - BYTES_CAUDA), offset)
+
+        # uma última linha sem '\n' entra no relatório desta execução, mas
+        # não no snapshot: a próxima execução a lê de novo, já completa
+        f.seek(offset)
+        cauda = f.read(tamanho - offset)
+        cubo_relatorio, linhas_cauda = cubo, 0
+        if cauda.strip():
+            cubo_relatorio, linhas_cauda = _agregar(BytesIO(cauda), colunas, chunksize,
+                                                    resolucao, esquema, cubo)
+        if cubo_relatorio is None:
+            raise ValueError(f"{caminho}: arquivo sem linhas de dados")
+
+    salvar_estado({
+        "versao": VERSAO_ESTADO,
+        "entrada": os.path.abspath(caminho),
+        "cabecalho": cabecalho,
+        "resolucao": resolucao,
+        "esquema": esquema,
+        "offset": offset,
+        "hash_cauda": hash_cauda,
+        "linhas": linhas + novas,
+        "cubo": cubo,
+    }, caminho_estado)
+    info = {"modo": modo, "bytes_lidos": max(fim - inicio, 0) + len(cauda),
+            "linhas_novas": novas + linhas_cauda, "linhas_total": linhas + novas + linhas_cauda}
+    return cubo_relatorio, info
+
+
+def verificar(cubo, caminho, chunksize=100_000, resolucao="M", esquema="padrao"):
+    """Compara `cubo` com um recálculo completo; devolve a lista de divergências."""
+    referencia = gr.combinar_cubos([gr.construir_cubo(b, resolucao)
+                                    for b in gr.ler_em_blocos(caminho, chunksize, esquema)])
+    return gr.comparar_cubos(cubo, referencia, ("estado", "recálculo"))
@@ -0,0 +1,67 @@
+"""Tamanho e tempo dos gráficos em PNG (150 dpi) contra o backend vetorial.
+
+Para cada um dos seis gráficos do relatório mede o tempo de renderização
+(figura → bytes) e o tamanho de um PDF contendo só aquele gráfico, nos
+dois formatos. Sem cache e num único processo, para comparar só o custo
+de cada backend.
+
+    python benchmarks/bench_chart_backends.py [CSV] [--repeat 3] [--json saida.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_report as gr  # noqa: E402
+
+
+def medir(tarefa, formato, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        dados = gr.renderizar_grafico(tarefa, formato)
+        melhor = min(melhor, time.perf_counter() - t0)
+    flowable = gr.bytes_to_flowable(dados, formato, tarefa[2], tarefa[3])
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        destino = f.name
+    try:
+        t0 = time.perf_counter()
+        gr.gerar_pdf([flowable], destino)
+        t_pdf = time.perf_counter() - t0
+        tamanho = os.path.getsize(destino)
+    finally:
+        os.remove(destino)
+    return {"render_s": round(melhor, 4), "pdf_s": round(t_pdf, 4), "pdf_bytes": tamanho}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entrada", nargs="?", default=gr.ARQUIVO_ENTRADA)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    ag = gr.analisar(gr.carregar_dados(args.entrada))
+    resultados = {}
+    print(f"{'gráfico':<20} {'formato':>7} {'render (s)':>11} {'PDF (s)':>8} {'PDF (KB)':>9}")
+    for nome, tarefa in gr.tarefas_graficos(ag).items():
+        for formato in gr.FORMATOS_GRAFICO:
+            r = medir(tarefa, formato, args.repeat)
+            resultados.setdefault(nome, {})[formato] = r
+            print(f"{nome:<20} {formato:>7} {r['render_s']:>11.3f} {r['pdf_s']:>8.3f} "
+                  f"{r['pdf_bytes'] / 1024:>9.1f}")
+    for formato in gr.FORMATOS_GRAFICO:
+        render = sum(r[formato]["render_s"] for r in resultados.values())
+        tamanho = sum(r[formato]["pdf_bytes"] for r in resultados.values())
+        print(f"{'TOTAL':<20} {formato:>7} {render:>11.3f} {'':>8} {tamanho / 1024:>9.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Tamanho do PDF e tempo de geração: PNG a 150 dpi contra PNG de paleta.
+
+Para cada configuração mede, sem cache e num único processo, o tempo de
+renderizar os seis gráficos, o de gerar o PDF (`doc.build` + gravação)
+e o tamanho final. As configurações são o PNG de sempre, o formato
+"indexado" e o indexado com alguns orçamentos de bytes (`--budget`).
+
+O caso "repetido" monta um PDF com o relatório `--copies` vezes seguidas,
+como um lote juntado num arquivo só: com imagens idênticas, o tamanho
+mostra se elas são gravadas uma vez ou a cada aparição.
+
+    python benchmarks/bench_images.py [CSV] [--budget 40 20] [--copies 4] [--json saida.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_report as gr  # noqa: E402
+import indexed_images  # noqa: E402
+
+
+def medir(ag, fonte, formato, orcamento_kb=None, copias=1, repeticoes=3):
+    melhor = {"graficos_s": float("inf"), "pdf_s": float("inf")}
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        imagens = gr.renderizar_graficos(gr.tarefas_graficos(ag), workers=1, formato=formato)
+        if orcamento_kb is not None:
+            imagens, _ = indexed_images.aplicar_orcamento(imagens, int(orcamento_kb * 1024))
+        t1 = time.perf_counter()
+        story = []
+        for _ in range(copias):
+            story += gr.montar_story(ag, fonte, imagens)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            destino = f.name
+        try:
+            gr.gerar_pdf(story, destino)
+            t2 = time.perf_counter()
+            tamanho = os.path.getsize(destino)
+        finally:
+            os.remove(destino)
+        melhor["graficos_s"] = min(melhor["graficos_s"], t1 - t0)
+        melhor["pdf_s"] = min(melhor["pdf_s"], t2 - t1)
+    return {**{k: round(v, 4) for k, v in melhor.items()}, "pdf_bytes": tamanho}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entrada", nargs="?", default=gr.ARQUIVO_ENTRADA)
+    parser.add_argument("--budget", type=float, nargs="*", default=[40, 20], metavar="KB")
+    parser.add_argument("--copies", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    ag = gr.analisar(gr.carregar_dados(args.entrada))
+    fonte = os.path.basename(args.entrada)
+    casos = [("png", "png", None), ("indexado", "indexado", None)]
+    casos += [(f"indexado {kb:g} KB", "indexado", kb) for kb in args.budget]
+    resultados = []
+    print(f"{'caso':<20} {'cópias':>6} {'gráficos (s)':>13} {'PDF (s)':>8} {'PDF (KB)':>9}")
+    for copias in (1, args.copies):
+        for nome, formato, orcamento in casos:
+            r = medir(ag, fonte, formato, orcamento, copias, args.repeat)
+            resultados.append({"caso": nome, "copias": copias, **r})
+            print(f"{nome:<20} {copias:>6} {r['graficos_s']:>13.3f} {r['pdf_s']:>8.3f} "
+                  f"{r['pdf_bytes'] / 1024:>9.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Diagramação de tabelas longas: `Table` único contra `TabelaLonga`.
+
+Monta uma tabela no formato da de produtos com N linhas e mede só o
+`doc.build` de um story que contém apenas ela, num subprocesso por
+medição (tempo, páginas e pico de RSS). O `Table` único do ReportLab
+refaz a tabela inteira a cada quebra de página; a `TabelaLonga` corta
+blocos do tamanho da página e deve crescer linearmente com N. O modo
+antigo só é medido até `--legacy-max` linhas, porque acima disso leva
+minutos.
+
+    python benchmarks/bench_long_tables.py --rows 1e3 1e4 1e5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _pico_rss_mb():
+    with open("/proc/self/status") as f:
+        return int(re.search(r"VmHWM:\s+(\d+)", f.read()).group(1)) / 1024
+
+
+def linhas_produtos(n):
+    linhas = [["Produto", "Categoria", "Receita", "Qtd", "Ticket Médio", "% Total"]]
+    for i in range(n):
+        receita, qtd = 1_000_000 / (i + 1), 1000 + i
+        linhas.append([f"Produto {i:06d}", "Categoria", f"R$ {receita:,.2f}", f"{qtd:,}",
+                       f"R$ {receita / qtd:,.2f}", f"{receita / 1e7 * 100:.1f}%"])
+    linhas.append(["TOTAL", "—", "R$ 1,000,000.00", "1,000", "R$ 1,000.00", "100%"])
+    return linhas
+
+
+def medir(modo, n):
+    import generate_report as gr
+    from reportlab.platypus import Table
+
+    linhas = linhas_produtos(n)
+    larguras = [4.5 * gr.cm, 2.8 * gr.cm, 3.2 * gr.cm, 2 * gr.cm, 2.8 * gr.cm, 1.7 * gr.cm]
+    t0 = time.perf_counter()
+    if modo == "longa":
+        tabela = gr.TabelaLonga(linhas, larguras, tem_total=True)
+    else:
+        tabela = Table(linhas, colWidths=larguras)
+        tabela.setStyle(gr.tabela_estilo(tem_total=True))
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        doc = gr.SimpleDocTemplate(f.name, pagesize=gr.A4)
+        doc.build([tabela])
+        paginas = doc.page
+    return {
+        "modo": modo,
+        "linhas": n,
+        "paginas": paginas,
+        "diagramacao_s": round(time.perf_counter() - t0, 3),
+        "pico_rss_mb": round(_pico_rss_mb(), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e3, 1e4, 1e5])
+    parser.add_argument("--legacy-max", type=float, default=1e4,
+                        help="maior N medido com o Table único (padrão: 1e4)")
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--_worker", nargs=2, metavar=("MODO", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._worker:
+        print(json.dumps(medir(args._worker[0], int(args._worker[1]))))
+        return
+
+    resultados = []
+    print(f"{'linhas':>10} {'modo':>7} {'páginas':>8} {'tempo (s)':>10} "
+          f"{'s/1k linhas':>12} {'pico RSS (MB)':>14}")
+    for n in (int(r) for r in args.rows):
+        for modo in ("table", "longa"):
+            if modo == "table" and n > args.legacy_max:
+                continue
+            saida = subprocess.run([sys.executable, __file__, "--_worker", modo, str(n)],
+                                   check=True, capture_output=True, text=True).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            resultados.append(r)
+            print(f"{n:>10,} {modo:>7} {r['paginas']:>8,} {r['diagramacao_s']:>10.2f} "
+                  f"{r['diagramacao_s'] / n * 1000:>12.3f} {r['pico_rss_mb']:>14.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""RSS e tempo da numeração de páginas em função do número de páginas.
+
+Compara o `NumeradorPaginas` atual (forms preenchidos no `save`) com a
+implementação antiga, que guardava `dict(self.__dict__)` de cada página
+até o fim. Cada medição roda num subprocesso próprio para que o pico de
+memória (ru_maxrss) de uma não contamine a outra.
+
+    python benchmarks/bench_page_numbering.py --pages 100 500 1500
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _canvas_legado():
+    from reportlab.pdfgen import canvas as rl_canvas
+
+    import generate_report as gr
+
+    class NumeradorPaginasLegado(rl_canvas.Canvas):
+        """Implementação original: uma cópia do estado do canvas por página."""
+
+        def __init__(self, *args, **kwargs):
+            rl_canvas.Canvas.__init__(self, *args, **kwargs)
+            self._saved_page_states = []
+
+        def showPage(self):
+            self._saved_page_states.append(dict(self.__dict__))
+            self._startPage()
+
+        def save(self):
+            total = len(self._saved_page_states)
+            for i, state in enumerate(self._saved_page_states):
+                self.__dict__.update(state)
+                if i > 0:
+                    gr.desenhar_rodape(self, i + 1, total)
+                rl_canvas.Canvas.showPage(self)
+            rl_canvas.Canvas.save(self)
+
+    return NumeradorPaginasLegado
+
+
+def _pagina_densa():
+    """Flowable leve no story mas com muitos operadores na página.
+
+    Assim o pico de memória mede o que o canvas retém por página, e não o
+    tamanho do próprio story.
+    """
+    from reportlab.platypus import Flowable
+
+    class PaginaDensa(Flowable):
+        def wrap(self, aw, ah):
+            return aw, 650
+
+        def draw(self):
+            c = self.canv
+            c.setFont("Helvetica", 6)
+            for i in range(120):
+                y = 4 + i * 6
+                c.drawString(0, y, f"linha {i:03d}  Produto {i * 7 % 97:02d}  "
+                                   f"R$ {i * 37.5:12,.2f}  Eletrônicos  Sudeste")
+                c.line(300, y, 450, y + 3)
+
+    return PaginaDensa
+
+
+def medir(modo, paginas, destino):
+    """Gera um PDF de `paginas` páginas densas e devolve tempo e pico de RSS."""
+    import generate_report as gr
+
+    canvas = gr.NumeradorPaginas if modo == "atual" else _canvas_legado()
+    PaginaDensa = _pagina_densa()
+    story = [PaginaDensa() for _ in range(paginas)]
+
+    t0 = time.perf_counter()
+    gr.gerar_pdf(story, destino) if canvas is gr.NumeradorPaginas else _gerar(story, destino, canvas)
+    segundos = time.perf_counter() - t0
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"modo": modo, "paginas": paginas, "segundos": round(segundos, 3),
+            "pico_rss_mb": round(rss_kb / 1024, 1)}
+
+
+def _gerar(story, destino, canvas):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    import generate_report as gr
+
+    doc = SimpleDocTemplate(destino, pagesize=A4, rightMargin=gr.MARGEM,
+                            leftMargin=gr.MARGEM, topMargin=gr.MARGEM,
+                            bottomMargin=2.5 * gr.cm)
+    doc.build(story, canvasmaker=canvas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 1500])
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--_worker", nargs=2, metavar=("MODO", "PAGINAS"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._worker:
+        modo, paginas = args._worker[0], int(args._worker[1])
+        destino = f"/tmp/bench_paginas_{modo}_{paginas}_{os.getpid()}.pdf"
+        try:
+            print(json.dumps(medir(modo, paginas, destino)))
+        finally:
+            if os.path.exists(destino):
+                os.remove(destino)
+        return
+
+    resultados = []
+    print(f"{'páginas':>8} {'modo':>7} {'segundos':>9} {'pico RSS (MB)':>14}")
+    for paginas in args.pages:
+        for modo in ("legado", "atual"):
+            saida = subprocess.run(
+                [sys.executable, __file__, "--_worker", modo, str(paginas)],
+                check=True, capture_output=True, text=True).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            resultados.append(r)
+            print(f"{paginas:>8} {modo:>7} {r['segundos']:>9.2f} {r['pico_rss_mb']:>14.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Carga sobre o agendador (`report_scheduler.py`): parte justa contra FIFO.
+
+Um cliente "pesado" despeja de uma vez muitos relatórios de um CSV
+sintético grande, enquanto clientes "leves" enviam relatórios pequenos
+em intervalos regulares. O cenário roda duas vezes, cada uma num pool novo:
+"justo", com um cliente por remetente, e "fifo", com todos os jobs como
+se fossem de um cliente só (ordem de chegada). Saem os percentis de
+latência de cada cliente, a vazão, a fila máxima observada e quantos
+envios esperaram vaga ou expiraram.
+
+    python benchmarks/bench_scheduler.py --workers 2 --heavy-jobs 16 --light-tenants 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import report_scheduler as rs  # noqa: E402
+from run_benchmarks import arquivo_sintetico  # noqa: E402
+
+
+async def _cenario(args, modo, grande, pequeno, destino):
+    async with rs.Agendador(args.workers, args.capacity, args.per_tenant,
+                            timeout=args.timeout) as agendador:
+        tarefas = []  # (cliente, tarefa)
+        fila_maxima = 0
+
+        async def enviar(cliente, entrada, i):
+            nome = cliente if modo == "justo" else "todos"
+            saida = os.path.join(destino, f"{modo}_{cliente}_{i}.pdf")
+            tarefa = await agendador.enviar(nome, entrada, saida, {"no_cache": True})
+            tarefas.append((cliente, tarefa))
+
+        async def pesado():
+            for i in range(args.heavy_jobs):
+                await enviar("pesado", grande, i)
+
+        async def leve(cliente):
+            await asyncio.sleep(args.interval / 2)
+            for i in range(args.light_jobs):
+                await enviar(cliente, pequeno, i)
+                await asyncio.sleep(args.interval)
+
+        async def amostrar():
+            nonlocal fila_maxima
+            while True:
+                fila_maxima = max(fila_maxima, agendador.metricas()["fila"])
+                await asyncio.sleep(0.1)
+
+        amostragem = asyncio.create_task(amostrar())
+        t0 = time.monotonic()
+        await asyncio.gather(pesado(), *(leve(f"leve{i + 1}") for i in range(args.light_tenants)))
+        await asyncio.gather(*(t for _, t in tarefas), return_exceptions=True)
+        duracao = time.monotonic() - t0
+        amostragem.cancel()
+        metricas = agendador.metricas()
+
+    por_cliente = {}
+    for cliente, tarefa in tarefas:
+        por_cliente.setdefault(cliente, []).append(tarefa)
+    clientes = {}
+    for cliente, lista in por_cliente.items():
+        latencias = [t.terminada - t.enviada for t in lista if t.estado == "concluido"]
+        clientes[cliente] = {
+            "jobs": len(lista),
+            "concluidos": len(latencias),
+            "expirados": sum(t.estado == "expirado" for t in lista),
+            "latencia_s": {k: round(v, 2) for k, v in rs._percentis(latencias).items()},
+            "latencia_max_s": round(max(latencias), 2) if latencias else None,
+        }
+    return {
+        "modo": modo,
+        "duracao_s": round(duracao, 2),
+        "vazao_por_s": round(metricas["concluidos"] / duracao, 3),
+        "fila_maxima": fila_maxima,
+        "esperas_por_vaga": metricas["esperas_por_vaga"],
+        "processos_substituidos": metricas["processos_substituidos"],
+        "clientes": clientes,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--per-tenant", type=int, default=10)
+    parser.add_argument("--heavy-jobs", type=int, default=16)
+    parser.add_argument("--heavy-rows", type=float, default=5e4)
+    parser.add_argument("--light-tenants", type=int, default=2)
+    parser.add_argument("--light-jobs", type=int, default=4)
+    parser.add_argument("--light-rows", type=float, default=2e3)
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="segundos entre os envios de cada cliente leve")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="prazo de cada job; os que passarem contam como expirados")
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    grande = arquivo_sintetico(int(args.heavy_rows), 14, 4, 366, 42)
+    pequeno = arquivo_sintetico(int(args.light_rows), 14, 4, 366, 42)
+    resultados = []
+    with tempfile.TemporaryDirectory() as destino:
+        for modo in ("justo", "fifo"):
+            r = asyncio.run(_cenario(args, modo, grande, pequeno, destino))
+            resultados.append(r)
+            print(f"\n{modo}: {r['duracao_s']:.1f}s, {r['vazao_por_s']:.2f} jobs/s, "
+                  f"fila máx. {r['fila_maxima']}, {r['esperas_por_vaga']} envios esperaram vaga")
+            print(f"  {'cliente':<8} {'jobs':>5} {'ok':>4} {'exp.':>5} "
+                  f"{'p50 (s)':>8} {'p90 (s)':>8} {'máx (s)':>8}")
+            for cliente, c in sorted(r["clientes"].items()):
+                lat = c["latencia_s"]
+                print(f"  {cliente:<8} {c['jobs']:>5} {c['concluidos']:>4} {c['expirados']:>5} "
+                      f"{lat.get('p50', float('nan')):>8.2f} {lat.get('p90', float('nan')):>8.2f} "
+                      f"{c['latencia_max_s'] or float('nan'):>8.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
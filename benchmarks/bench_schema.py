@@ -0,0 +1,79 @@
+"""Memória e tempo do esquema padrão contra o esquema enxuto (`--schema enxuto`).
+
+Para cada tamanho gera (ou reaproveita) um CSV sintético e, num
+subprocesso por medição, lê o arquivo inteiro e constrói o cubo. Mede o
+tamanho do DataFrame (`memory_usage(deep=True)`), o pico de RSS e o tempo
+de carga e de agregação.
+
+    python benchmarks/bench_schema.py --rows 1e5 1e6 5e6
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _pico_rss_mb():
+    # VmHWM e não ru_maxrss: este herda o pico do processo pai através do exec
+    with open("/proc/self/status") as f:
+        return int(re.search(r"VmHWM:\s+(\d+)", f.read()).group(1)) / 1024
+
+
+def medir(esquema, caminho):
+    import generate_report as gr
+
+    t0 = time.perf_counter()
+    df = gr.carregar_dados(caminho, esquema)
+    t1 = time.perf_counter()
+    gr.construir_cubo(df)
+    t2 = time.perf_counter()
+    return {
+        "esquema": esquema,
+        "linhas": len(df),
+        "carga_s": round(t1 - t0, 3),
+        "agregacao_s": round(t2 - t1, 3),
+        "dataframe_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1),
+        "pico_rss_mb": round(_pico_rss_mb(), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e5, 1e6])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--sellers", type=int, default=100)
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--_worker", nargs=2, metavar=("ESQUEMA", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._worker:
+        print(json.dumps(medir(*args._worker)))
+        return
+
+    from run_benchmarks import arquivo_sintetico
+
+    resultados = []
+    print(f"{'linhas':>10} {'esquema':>8} {'carga (s)':>10} {'agreg. (s)':>11} "
+          f"{'DataFrame (MB)':>15} {'pico RSS (MB)':>14}")
+    for linhas in (int(r) for r in args.rows):
+        caminho = arquivo_sintetico(linhas, args.products, args.sellers, 366, 42)
+        for esquema in ("padrao", "enxuto"):
+            saida = subprocess.run(
+                [sys.executable, __file__, "--_worker", esquema, caminho],
+                check=True, capture_output=True, text=True).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            resultados.append(r)
+            print(f"{linhas:>10,} {esquema:>8} {r['carga_s']:>10.2f} {r['agregacao_s']:>11.2f} "
+                  f"{r['dataframe_mb']:>15.1f} {r['pico_rss_mb']:>14.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Latência por relatório: CLI a frio contra o serviço (`report_server.py`).
+
+Mede N execuções de `python generate_report.py` (um processo novo por
+relatório) e N pedidos sequenciais ao serviço, que já tem os imports e os
+estilos carregados. O primeiro pedido ao serviço inclui a criação do
+worker e aparece separado. Os dois lados usam `no_cache`, para que a
+diferença seja só o custo de subir o processo.
+
+    python benchmarks/bench_service.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import report_server  # noqa: E402
+
+
+def medir_cli(entrada, destino, execucoes):
+    tempos = []
+    for _ in range(execucoes):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(RAIZ, "generate_report.py"), entrada,
+                        "-o", destino, "--no-cache", "-j", "1"],
+                       check=True, capture_output=True)
+        tempos.append(time.perf_counter() - t0)
+    return tempos
+
+
+def medir_servico(entrada, destino, execucoes, caminho_socket):
+    servidor = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, "report_server.py"), "servir",
+         "--socket", caminho_socket, "-c", "1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        cliente = report_server.Cliente(caminho_socket=caminho_socket)
+        while True:  # espera o serviço aceitar conexões
+            try:
+                cliente.saude()
+                break
+            except OSError:
+                time.sleep(0.05)
+        tempos = []
+        for _ in range(execucoes + 1):
+            t0 = time.perf_counter()
+            estado = cliente.gerar(entrada, destino, {"no_cache": True})
+            tempos.append(time.perf_counter() - t0)
+            if estado["estado"] != "concluido":
+                raise RuntimeError(estado.get("erro"))
+        return tempos[0], tempos[1:]
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entrada", nargs="?", default=os.path.join(RAIZ, "sales_data.csv"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = os.path.join(tmp, "relatorio.pdf")
+        cli = medir_cli(args.entrada, destino, args.runs)
+        primeiro, servico = medir_servico(args.entrada, destino, args.runs,
+                                          os.path.join(tmp, "servico.sock"))
+
+    resultado = {
+        "cli_mediana_s": round(statistics.median(cli), 3),
+        "servico_primeiro_s": round(primeiro, 3),
+        "servico_mediana_s": round(statistics.median(servico), 3),
+        "cli_s": [round(t, 3) for t in cli],
+        "servico_s": [round(t, 3) for t in servico],
+    }
+    print(f"CLI a frio:        mediana {resultado['cli_mediana_s']:.2f}s")
+    print(f"Serviço, 1º pedido:        {resultado['servico_primeiro_s']:.2f}s")
+    print(f"Serviço, aquecido: mediana {resultado['servico_mediana_s']:.2f}s "
+          f"({resultado['cli_mediana_s'] / resultado['servico_mediana_s']:.1f}× mais rápido)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
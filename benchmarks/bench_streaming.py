@@ -0,0 +1,122 @@
+"""Tempo até o primeiro byte e memória do PDF gravado página a página.
+
+Gera um PDF com uma tabela de produtos de N linhas (a `TabelaLonga`,
+como em `bench_long_tables.py`) para um fluxo que só conta os bytes,
+como um socket para um cliente rápido, e mede o tempo até o primeiro
+byte, o tempo total e o acréscimo de RSS durante o `doc.build`. O modo
+"arquivo" é a numeração anterior, que retinha as páginas até o `save`
+e gravava o PDF inteiro de uma vez; "continuo" é o `gerar_pdf` atual.
+Cada medição roda num subprocesso próprio.
+
+    python benchmarks/bench_streaming.py --rows 1e4 1e5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_long_tables import linhas_produtos  # noqa: E402
+
+
+def _rss_mb(campo):
+    with open("/proc/self/status") as f:
+        return int(re.search(campo + r":\s+(\d+)", f.read()).group(1)) / 1024
+
+
+class Destino:
+    """Fluxo binário que só conta os bytes e anota quando chegou o primeiro."""
+
+    def __init__(self):
+        self.bytes    = 0
+        self.primeiro = None
+
+    def write(self, dados):
+        if self.primeiro is None:
+            self.primeiro = time.perf_counter()
+        self.bytes += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+
+def _canvas_arquivo():
+    import generate_report as gr
+
+    class NumeradorPaginasArquivo(gr.CanvasCompacto):
+        """Numeração anterior: páginas retidas até o `save` e PDF gravado de uma vez."""
+
+        def showPage(self):
+            atual = self.getPageNumber()
+            if atual > 1:
+                self.doForm(f"rodape{atual}")
+            gr.CanvasCompacto.showPage(self)
+
+        def save(self):
+            total = self.getPageNumber() - 1
+            for atual in range(2, total + 1):
+                self.beginForm(f"rodape{atual}")
+                gr.desenhar_rodape(self, atual, total)
+                self.endForm()
+            gr.rl_canvas.Canvas.save(self)
+
+    return NumeradorPaginasArquivo
+
+
+def medir(modo, n):
+    import generate_report as gr
+
+    larguras = [4.5 * gr.cm, 2.8 * gr.cm, 3.2 * gr.cm, 2 * gr.cm, 2.8 * gr.cm, 1.7 * gr.cm]
+    story = [gr.TabelaLonga(linhas_produtos(n), larguras, tem_total=True)]
+    destino = Destino()
+    rss_inicio = _rss_mb("VmRSS")
+    t0 = time.perf_counter()
+    if modo == "continuo":
+        gr.gerar_pdf(story, destino)
+    else:
+        gr._documento(destino).build(story, canvasmaker=_canvas_arquivo())
+    total = time.perf_counter() - t0
+    return {
+        "modo": modo,
+        "linhas": n,
+        "primeiro_byte_s": round(destino.primeiro - t0, 3),
+        "total_s": round(total, 3),
+        "pdf_bytes": destino.bytes,
+        "acrescimo_rss_mb": round(_rss_mb("VmHWM") - rss_inicio, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e4, 1e5])
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--_worker", nargs=2, metavar=("MODO", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._worker:
+        print(json.dumps(medir(args._worker[0], int(args._worker[1]))))
+        return
+
+    resultados = []
+    print(f"{'linhas':>10} {'modo':>9} {'1º byte (s)':>12} {'total (s)':>10} "
+          f"{'PDF (MB)':>9} {'+RSS (MB)':>10}")
+    for n in (int(r) for r in args.rows):
+        for modo in ("arquivo", "continuo"):
+            saida = subprocess.run([sys.executable, __file__, "--_worker", modo, str(n)],
+                                   check=True, capture_output=True, text=True).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            resultados.append(r)
+            print(f"{n:>10,} {modo:>9} {r['primeiro_byte_s']:>12.2f} {r['total_s']:>10.2f} "
+                  f"{r['pdf_bytes'] / 2**20:>9.1f} {r['acrescimo_rss_mb']:>10.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Renderização dos gráficos de evolução contra o tamanho da série.
+
+Gera uma série diária sintética de N períodos e mede, num subprocesso
+por medição, o tempo de renderizar (PNG) os gráficos de tendência e de
+crescimento. No modo "reduzido" valem os limites de `generate_report`
+(LTTB, mínimo/máximo por faixa e rótulos limitados); no modo "completo"
+os limites são desligados e cada período vira ponto, barra e rótulo,
+como antes. O modo completo só é medido até `--legacy-max` períodos.
+
+    python benchmarks/bench_time_series.py --periods 12 365 1e4 1e5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serie_sintetica(n, seed=42):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    tendencia = np.linspace(100_000, 300_000, n)
+    sazonal = 20_000 * np.sin(np.arange(n) * 2 * np.pi / 7)
+    valores = tendencia + sazonal + rng.normal(0, 15_000, n)
+    serie = pd.Series(valores, index=pd.period_range("2000-01-01", periods=n, freq="D"))
+    return serie, serie.pct_change() * 100
+
+
+def medir(modo, n):
+    import generate_report as gr
+
+    if modo == "completo":
+        gr.MAX_PONTOS_LINHA = gr.MAX_BARRAS = gr.MAX_ROTULOS = gr.MAX_MARCAS = float("inf")
+    serie, crescimento = serie_sintetica(n)
+    rotulos = [p.strftime("%d/%m/%y") for p in serie.index]
+    gr.fig_to_png(gr.plt.figure())  # fontes e backend fora da medição
+    tempos = {}
+    for nome, func, args, w, h in (
+            ("tendencia", gr.chart_tendencia_mensal, (serie, rotulos, "dia"), 17, 5.5),
+            ("crescimento", gr.chart_crescimento_mensal, (crescimento, rotulos, "dia"), 17, 4)):
+        t0 = time.perf_counter()
+        gr.renderizar_grafico((func, args, w, h))
+        tempos[nome] = round(time.perf_counter() - t0, 3)
+    return {"modo": modo, "periodos": n, **tempos}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--periods", type=float, nargs="+", default=[12, 365, 1e4, 1e5])
+    parser.add_argument("--legacy-max", type=float, default=1e4,
+                        help="maior N medido sem os limites (padrão: 1e4)")
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--_worker", nargs=2, metavar=("MODO", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._worker:
+        print(json.dumps(medir(args._worker[0], int(args._worker[1]))))
+        return
+
+    resultados = []
+    print(f"{'períodos':>10} {'modo':>10} {'tendência (s)':>14} {'crescimento (s)':>16}")
+    for n in (int(p) for p in args.periods):
+        for modo in ("completo", "reduzido"):
+            if modo == "completo" and n > args.legacy_max:
+                continue
+            saida = subprocess.run([sys.executable, __file__, "--_worker", modo, str(n)],
+                                   check=True, capture_output=True, text=True).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            resultados.append(r)
+            print(f"{n:>10,} {modo:>10} {r['tendencia']:>14.2f} {r['crescimento']:>16.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Conferências de equivalência entre caminhos do pipeline que devem dar o mesmo cubo.
+
+O repositório não tem suíte de testes; este script roda, sobre CSVs
+sintéticos pequenos, as conferências que os modos alternativos prometem
+e sai com código 1 se alguma divergir.
+
+- estado: `aggregate_state.atualizar` num CSV sem '\\n' no fim, a
+  primeira vez e depois de o arquivo crescer, contra um recálculo, nos
+  dois esquemas de leitura.
+- backends: o cubo do sqlite e do duckdb (se instalado), mensal e
+  diário, de um CSV puro e de um `.csv.gz`, contra o do pandas; e a
+  recusa de uma compressão que o duckdb não lê.
+- recorte: um gráfico cuja linha sai dos limites do eixo, no backend
+  vetorial contra o PNG: a linha visível ocupa a mesma região nos dois.
+
+    python benchmarks/check_equivalence.py
+"""
+import argparse
+import bz2
+import gzip
+import importlib.util
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import aggregate_state  # noqa: E402
+import generate_report as gr  # noqa: E402
+import gerar_dados  # noqa: E402
+import sql_backend  # noqa: E402
+
+
+def conferir_estado(diretorio, linhas):
+    """Estado incremental num CSV cuja última linha não termina em '\\n'."""
+    completo = os.path.join(diretorio, "completo.csv")
+    gerar_dados.gerar(completo, linhas, seed=7)
+    with open(completo, "rb") as f:
+        conteudo = f.read().rstrip(b"\n")
+    corte = conteudo.rfind(b"\n", 0, len(conteudo) // 2) + 1
+
+    entrada = os.path.join(diretorio, "vendas.csv")
+    erros = []
+    for esquema in gr.ESQUEMAS:
+        estado = os.path.join(diretorio, f"vendas_{esquema}.state")
+        # metade do arquivo sem '\n' final, depois o arquivo inteiro, também sem '\n'
+        for etapa, trecho in (("primeira execução", conteudo[:corte - 1]),
+                              ("execução incremental", conteudo)):
+            with open(entrada, "wb") as f:
+                f.write(trecho)
+            cubo, info = aggregate_state.atualizar(entrada, estado, esquema=esquema)
+            rotulo = f"estado ({esquema}, {etapa})"
+            esperadas = trecho.count(b"\n")  # linhas de dados: o cabeçalho tem o seu '\n'
+            if info["linhas_total"] != esperadas:
+                erros.append(f"{rotulo}: {info['linhas_total']} linhas, esperado {esperadas}")
+            erros += [f"{rotulo}: {d}"
+                      for d in aggregate_state.verificar(cubo, entrada, esquema=esquema)]
+    return erros
+
+
+def conferir_backends(diretorio, linhas):
+    """Cubos dos motores SQL contra o do pandas, em CSV puro e comprimido."""
+    entrada = os.path.join(diretorio, "backends.csv")
+    gerar_dados.gerar(entrada, linhas, dias=60, seed=11)
+    with open(entrada, "rb") as f:
+        conteudo = f.read()
+    with gzip.open(entrada + ".gz", "wb") as f:
+        f.write(conteudo)
+    with bz2.open(entrada + ".bz2", "wb") as f:
+        f.write(conteudo)
+
+    motores = list(sql_backend.MOTORES)
+    if importlib.util.find_spec("duckdb") is None:
+        print("  duckdb não instalado; só o sqlite é conferido")
+        motores.remove("duckdb")
+    erros = []
+    for resolucao in ("M", "D"):
+        referencia = gr.cubo_de_arquivos([entrada], 1, resolucao=resolucao)
+        for motor in motores:
+            for caminho in (entrada, entrada + ".gz"):
+                cubo = sql_backend.construir_cubo_sql([caminho], motor, resolucao)
+                rotulo = f"{motor}, {os.path.basename(caminho)}, resolução {resolucao}"
+                erros += [f"backends ({rotulo}): {d}" for d in
+                          gr.comparar_cubos(cubo, referencia, (motor, "pandas"))]
+    if "duckdb" in motores:
+        try:
+            sql_backend.construir_cubo_sql([entrada + ".bz2"], "duckdb")
+            erros.append("backends: o duckdb aceitou um .bz2")
+        except ValueError:
+            pass
+    return erros
+
+
+def _cortar_segmento(p, q, recorte):
+    """Trecho do segmento p–q dentro do retângulo `recorte` (Liang–Barsky), ou None."""
+    (x0, y0), (x1, y1) = p, q
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0.0, 1.0
+    for lado, dist in ((-dx, x0 - recorte[0]), (dx, recorte[2] - x0),
+                       (-dy, y0 - recorte[1]), (dy, recorte[3] - y0)):
+        if lado == 0:
+            if dist < 0:
+                return None
+            continue
+        t = dist / lado
+        if lado < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+    if t0 > t1:
+        return None
+    return (x0 + t0 * dx, y0 + t0 * dy), (x0 + t1 * dx, y0 + t1 * dy)
+
+
+def _pontos_cor(shapes, cor, matriz=(1, 0, 0, 1, 0, 0), recorte=None):
+    """Pontos visíveis das linhas com traço `cor`, já cortadas pelos retângulos de clip."""
+    from reportlab.graphics.shapes import Group, Path, mmult
+
+    def transformar(pontos):
+        a, b, c, d, e, f = matriz
+        return [(a * x + c * y + e, b * x + d * y + f) for x, y in zip(pontos[::2], pontos[1::2])]
+
+    visiveis = []
+    for shape in shapes:
+        if isinstance(shape, Group):
+            visiveis += _pontos_cor(shape.contents, cor, mmult(matriz, shape.transform), recorte)
+        elif isinstance(shape, Path) and shape.isClipPath:
+            xs, ys = zip(*transformar(shape.points))
+            recorte = (min(xs), min(ys), max(xs), max(ys))
+        elif isinstance(shape, Path) and shape.strokeColor is not None \
+                and shape.strokeColor.hexval() == cor:
+            pontos = transformar(shape.points)
+            for p, q in zip(pontos, pontos[1:]):
+                trecho = (p, q) if recorte is None else _cortar_segmento(p, q, recorte)
+                visiveis += trecho or []
+    return visiveis
+
+
+def conferir_recorte(diretorio, linhas):
+    """Linha que sai do eixo: a parte desenhada no vetorial é a mesma do PNG."""
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    import vector_charts
+
+    fig = Figure(figsize=(4, 3))
+    ax = fig.add_subplot()
+    ax.plot([0, 10], [-10, 10], color="#ff00ff", linewidth=2)
+    ax.set_ylim(-1, 1)
+    largura, altura = fig.bbox.size / fig.dpi * 72
+
+    canvas = FigureCanvasAgg(fig)
+    fig.set_dpi(72)
+    canvas.draw()
+    pixels = np.asarray(canvas.buffer_rgba())
+    linhas_px, colunas_px = np.nonzero((pixels[..., 0] > 200) & (pixels[..., 1] < 80)
+                                       & (pixels[..., 2] > 200))
+    png = (colunas_px.min(), altura - linhas_px.max() - 1,
+           colunas_px.max() + 1, altura - linhas_px.min())
+
+    desenho, _ = vector_charts.fig_to_drawing(fig, largura, altura)
+    pontos = _pontos_cor(desenho.contents, "0xff00ff")
+    if not pontos:
+        return ["recorte: a linha não aparece no desenho vetorial"]
+    xs, ys = zip(*pontos)
+    vetor = (min(xs), min(ys), max(xs), max(ys))
+    tolerancia = 3  # pontos: espessura da linha e antisserrilhado do PNG
+    if any(abs(v - p) > tolerancia for v, p in zip(vetor, png)):
+        return [f"recorte: linha ocupa {tuple(round(float(v), 1) for v in vetor)} no vetorial "
+                f"e {tuple(round(float(p), 1) for p in png)} no PNG"]
+    return []
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000, help="linhas de cada CSV sintético")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    erros = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        for nome, conferir in (("estado", conferir_estado), ("backends", conferir_backends),
+                               ("recorte", conferir_recorte)):
+            divergencias = conferir(diretorio, args.rows)
+            print(f"{nome}: {'ok' if not divergencias else f'{len(divergencias)} divergência(s)'}")
+            erros += divergencias
+    for erro in erros:
+        print(f"  {erro}")
+    if erros:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
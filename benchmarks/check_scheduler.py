@@ -0,0 +1,94 @@
+"""Conferências do agendador (`report_scheduler.py`) em jobs interrompidos cedo.
+
+Jobs cancelados logo no despacho ou com `timeout=0` podem ser
+interrompidos antes de a task que os executa dar o primeiro passo; este
+script confere que eles ainda assim terminam, que o processo volta ao
+pool, que os contadores zeram e que `encerrar` não fica preso. Sai com
+código 1 se algo divergir.
+
+    python benchmarks/check_scheduler.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import gerar_dados  # noqa: E402
+import report_scheduler as rs  # noqa: E402
+
+PRAZO_S = 60  # tempo máximo para um job interrompido terminar
+
+
+async def _desfecho(tarefa):
+    try:
+        await asyncio.wait_for(asyncio.shield(tarefa.futuro), PRAZO_S)
+    except asyncio.TimeoutError:
+        if not tarefa.futuro.done():
+            return "preso"
+    except (asyncio.CancelledError, Exception):
+        pass
+    return tarefa.estado
+
+
+async def _conferir(entrada, destino, rodadas):
+    erros = []
+    async with rs.Agendador(1) as agendador:
+        for i in range(rodadas):
+            # cancelado assim que sai da fila
+            tarefa = await agendador.enviar("a", entrada, os.path.join(destino, f"c{i}.pdf"),
+                                            {"no_cache": True})
+            while tarefa.estado == "na_fila":
+                await asyncio.sleep(0)
+            tarefa.cancelar()
+            estado = await _desfecho(tarefa)
+            if estado != "cancelado":
+                erros.append(f"cancelado no despacho ({i}): terminou {estado!r}")
+
+            tarefa = await agendador.enviar("a", entrada, os.path.join(destino, f"t{i}.pdf"),
+                                            {"no_cache": True}, timeout=0)
+            estado = await _desfecho(tarefa)
+            if estado != "expirado":
+                erros.append(f"timeout=0 ({i}): terminou {estado!r}")
+
+        # o processo substituído ainda gera relatórios
+        tarefa = await agendador.enviar("a", entrada, os.path.join(destino, "ok.pdf"),
+                                        {"no_cache": True})
+        estado = await _desfecho(tarefa)
+        if estado != "concluido":
+            erros.append(f"job depois das interrupções: terminou {estado!r}")
+        metricas = agendador.metricas()
+        if metricas["executando"] or metricas["fila"]:
+            erros.append(f"contadores não zeraram: {metricas['executando']} executando, "
+                         f"{metricas['fila']} na fila")
+    return erros
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5, help="rodadas de cada interrupção")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as destino:
+        entrada = os.path.join(destino, "vendas.csv")
+        gerar_dados.gerar(entrada, 500, seed=3)
+        try:
+            erros = asyncio.run(asyncio.wait_for(_conferir(entrada, destino, args.rounds),
+                                                 PRAZO_S * (2 * args.rounds + 2)))
+        except asyncio.TimeoutError:
+            erros = ["o agendador não encerrou"]
+    print(f"agendador: {'ok' if not erros else f'{len(erros)} divergência(s)'}")
+    for erro in erros:
+        print(f"  {erro}")
+    if erros:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Gerador de CSVs sintéticos no esquema de `sales_data.csv`.
+
+Produz `data, produto, categoria, quantidade, preco_unitario, vendedor,
+regiao` com distribuições parecidas com as reais: cada produto tem uma
+categoria e um preço base fixos, a quantidade cai com o preço, a receita
+cresce ao longo do período e alguns produtos e vendedores concentram a
+maior parte das vendas. O arquivo é escrito em blocos, então 10⁷ linhas
+não precisam caber em memória.
+
+    python benchmarks/gerar_dados.py vendas_1m.csv --rows 1000000 --products 5000 --sellers 200
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CATEGORIAS = ["Eletrônicos", "Móveis", "Papelaria", "Eletrodomésticos", "Vestuário",
+              "Esporte", "Brinquedos", "Alimentos"]
+REGIOES    = ["Sudeste", "Sul", "Nordeste", "Centro-Oeste", "Norte"]
+NOMES      = ["Ana", "Bruno", "Carlos", "Diana", "Eduardo", "Fernanda", "Gabriel",
+              "Helena", "Igor", "Julia", "Lucas", "Marina", "Nicolas", "Olivia"]
+SOBRENOMES = ["Silva", "Costa", "Mendes", "Rocha", "Souza", "Lima", "Alves",
+              "Pereira", "Gomes", "Ribeiro", "Martins", "Barros"]
+# faixa de preço (log-uniforme) por categoria
+PRECOS     = {"Eletrônicos": (80, 6000), "Móveis": (300, 4000), "Papelaria": (5, 80),
+              "Eletrodomésticos": (150, 5000), "Vestuário": (30, 600),
+              "Esporte": (40, 2500), "Brinquedos": (20, 700), "Alimentos": (3, 90)}
+
+
+def catalogo(produtos, categorias, rng):
+    """Nome, categoria e preço base de cada produto."""
+    cats = rng.choice(CATEGORIAS[:categorias], size=produtos)
+    precos = np.array([
+        np.exp(rng.uniform(np.log(PRECOS[c][0]), np.log(PRECOS[c][1]))) for c in cats
+    ]).round(2)
+    nomes = np.array([f"{c[:4]} {i:0{len(str(produtos))}d}" for i, c in enumerate(cats, 1)])
+    return nomes, cats, precos
+
+
+def equipe(vendedores, regioes, rng):
+    """Nome e região de cada vendedor (nomes únicos)."""
+    nomes = []
+    for i in range(vendedores):
+        nome = f"{NOMES[i % len(NOMES)]} {SOBRENOMES[(i // len(NOMES)) % len(SOBRENOMES)]}"
+        if i >= len(NOMES) * len(SOBRENOMES):
+            nome += f" {i // (len(NOMES) * len(SOBRENOMES)) + 1}"
+        nomes.append(nome)
+    return np.array(nomes), rng.choice(REGIOES[:regioes], size=vendedores)
+
+
+def _zipf_pesos(n, s=1.1):
+    pesos = 1.0 / np.arange(1, n + 1) ** s
+    return pesos / pesos.sum()
+
+
+def gerar(destino, linhas, produtos=14, vendedores=4, regioes=4, categorias=3,
+          inicio="2024-01-01", dias=366, seed=42, bloco=1_000_000):
+    """Escreve `linhas` vendas sintéticas em `destino`, ordenadas por data."""
+    rng = np.random.default_rng(seed)
+    p_nome, p_cat, p_preco = catalogo(produtos, categorias, rng)
+    v_nome, v_reg = equipe(vendedores, regioes, rng)
+    p_pesos = _zipf_pesos(produtos)
+    v_pesos = _zipf_pesos(vendedores, 0.6)
+    # mais vendas no fim do período: densidade linear crescente
+    d_pesos = np.linspace(1.0, 3.0, dias)
+    d_pesos /= d_pesos.sum()
+    base = np.datetime64(inicio, "D")
+
+    pasta = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(pasta, exist_ok=True)
+    escritas = 0
+    with open(destino, "w", encoding="utf-8", newline="") as f:
+        while escritas < linhas:
+            n = min(bloco, linhas - escritas)
+            dia = np.sort(rng.choice(dias, size=n, p=d_pesos))
+            prod = rng.choice(produtos, size=n, p=p_pesos)
+            vend = rng.choice(vendedores, size=n, p=v_pesos)
+            # itens baratos saem em quantidades maiores
+            media_qtd = np.clip(400 / np.sqrt(p_preco[prod]), 1, 60)
+            qtd = 1 + rng.poisson(media_qtd - 1)
+            bloco_df = pd.DataFrame({
+                "data": (base + dia).astype("datetime64[D]").astype(str),
+                "produto": p_nome[prod],
+                "categoria": p_cat[prod],
+                "quantidade": qtd,
+                "preco_unitario": p_preco[prod],
+                "vendedor": v_nome[vend],
+                "regiao": v_reg[vend],
+            })
+            bloco_df.to_csv(f, index=False, header=escritas == 0, float_format="%.2f")
+            escritas += n
+    return destino
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("destino", help="CSV a gerar")
+    parser.add_argument("--rows", type=float, default=1e5,
+                        help="número de linhas (aceita 1e6 etc.; padrão: 1e5)")
+    parser.add_argument("--products", type=int, default=14)
+    parser.add_argument("--sellers", type=int, default=4)
+    parser.add_argument("--regions", type=int, default=4, choices=range(1, len(REGIOES) + 1))
+    parser.add_argument("--categories", type=int, default=3, choices=range(1, len(CATEGORIAS) + 1))
+    parser.add_argument("--start", default="2024-01-01", help="primeira data (AAAA-MM-DD)")
+    parser.add_argument("--days", type=int, default=366, help="extensão do período em dias")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    gerar(args.destino, int(args.rows), args.products, args.sellers, args.regions,
+          args.categories, args.start, args.days, args.seed)
+    print(f"{int(args.rows):,} linhas gravadas em {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Suíte de benchmarks do pipeline com dados sintéticos.
+
+Para cada tamanho pedido gera (ou reaproveita) um CSV sintético e mede em
+separado cada estágio do relatório: carga, agregação, gráficos, montagem
+do story e `doc.build`. Os resultados vão para um JSON que pode servir de
+baseline para execuções futuras; com `--baseline`, estágios mais lentos
+que a tolerância fazem o script sair com código 1.
+
+A inicialização também é medida, em processos novos: o tempo de
+`import generate_report` segundo `python -X importtime` (com os módulos
+mais caros) e o de um `generate_report.py --dry-run` completo.
+
+    python benchmarks/run_benchmarks.py --rows 1e3 1e5 1e6 -o resultados.json
+    python benchmarks/run_benchmarks.py --rows 1e3 1e5 1e6 --baseline resultados.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import gerar_dados  # noqa: E402
+import generate_report as gr  # noqa: E402
+
+DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".dados")
+ESTAGIOS = ["carga", "agregacao", "graficos", "story", "pdf"]
+
+
+def arquivo_sintetico(linhas, produtos, vendedores, dias, seed):
+    """Caminho do CSV sintético com esses parâmetros, gerando-o se preciso."""
+    nome = f"vendas_{linhas}l_{produtos}p_{vendedores}v_{dias}d_s{seed}.csv"
+    caminho = os.path.join(DIRETORIO_DADOS, nome)
+    if not os.path.exists(caminho):
+        gerar_dados.gerar(caminho + ".tmp", linhas, produtos, vendedores, dias=dias, seed=seed)
+        os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+
+def medir_caso(caminho, chunksize=None, formato="png"):
+    """Tempo (s) de cada estágio do pipeline sobre `caminho`."""
+    tempos = {}
+    t0 = time.perf_counter()
+    if chunksize:
+        # no modo em blocos carga e agregação acontecem juntas
+        ag = gr.analisar_em_blocos(gr.ler_em_blocos(caminho, chunksize))
+        t1 = t2 = time.perf_counter()
+    else:
+        df = gr.carregar_dados(caminho)
+        t1 = time.perf_counter()
+        ag = gr.analisar(df)
+        del df
+        t2 = time.perf_counter()
+    imagens = gr.renderizar_graficos(gr.tarefas_graficos(ag), workers=1, formato=formato)
+    t3 = time.perf_counter()
+    story = gr.montar_story(ag, os.path.basename(caminho), imagens)
+    t4 = time.perf_counter()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        destino = f.name
+    try:
+        gr.gerar_pdf(story, destino)
+        t5 = time.perf_counter()
+        tamanho = os.path.getsize(destino)
+    finally:
+        os.remove(destino)
+    tempos.update(carga=t1 - t0, agregacao=t2 - t1, graficos=t3 - t2,
+                  story=t4 - t3, pdf=t5 - t4)
+    return {k: round(v, 4) for k, v in tempos.items()}, tamanho
+
+
+def _tempos_import(modulo):
+    """(self, cumulativo) em segundos de cada módulo importado por `modulo`."""
+    saida = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                           cwd=RAIZ, check=True, capture_output=True, text=True).stderr
+    tempos = {}
+    for linha in saida.splitlines():
+        proprio, cumulativo, nome = linha.removeprefix("import time:").split("|")
+        if proprio.strip().isdigit():
+            tempos[nome.strip()] = (int(proprio) / 1e6, int(cumulativo) / 1e6)
+    return tempos
+
+
+def medir_inicializacao(repeticoes=3, mais_caros=10):
+    """Import de `generate_report` e `--dry-run`, em processos novos; vale o menor tempo."""
+    importacoes = min((_tempos_import("generate_report") for _ in range(repeticoes)),
+                      key=lambda t: t["generate_report"][1])
+    ensaio = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "generate_report.py", "--dry-run"],
+                       cwd=RAIZ, check=True, capture_output=True)
+        ensaio.append(time.perf_counter() - t0)
+    caros = sorted(importacoes.items(), key=lambda item: item[1][0], reverse=True)
+    return {
+        "import_s": round(importacoes["generate_report"][1], 4),
+        "dry_run_s": round(min(ensaio), 4),
+        "modulos": len(importacoes),
+        "mais_caros": [{"modulo": nome, "proprio_s": round(proprio, 4),
+                        "cumulativo_s": round(cumulativo, 4)}
+                       for nome, (proprio, cumulativo) in caros[:mais_caros]],
+    }
+
+
+def chave_caso(caso):
+    return (caso["linhas"], caso["produtos"], caso["vendedores"], caso["dias"],
+            caso.get("chunksize"), caso.get("formato", "png"))
+
+
+def comparar(atual, baseline, tolerancia, minimo_s):
+    """Lista de regressões: estágios mais lentos que baseline × (1 + tolerância)."""
+    base = {chave_caso(c): c for c in baseline["casos"]}
+    regressoes = []
+    for medida, segundos in atual.get("inicializacao", {}).items():
+        antes = baseline.get("inicializacao", {}).get(medida)
+        if not medida.endswith("_s") or antes is None:
+            continue
+        # a inicialização é curta: a folga absoluta é um décimo da dos estágios
+        if segundos > antes * (1 + tolerancia) and segundos - antes > minimo_s / 10:
+            regressoes.append(f"inicialização / {medida}: {antes:.3f}s → {segundos:.3f}s "
+                              f"(+{(segundos / antes - 1) * 100:.0f}%)")
+    for caso in atual["casos"]:
+        ref = base.get(chave_caso(caso))
+        if ref is None:
+            continue
+        for estagio, segundos in caso["estagios"].items():
+            antes = ref["estagios"].get(estagio)
+            if antes is None:
+                continue
+            if segundos > antes * (1 + tolerancia) and segundos - antes > minimo_s:
+                regressoes.append(
+                    f"{caso['linhas']:,} linhas / {estagio}: {antes:.3f}s → {segundos:.3f}s "
+                    f"(+{(segundos / antes - 1) * 100:.0f}%)")
+    return regressoes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e3, 1e4, 1e5],
+                        help="tamanhos a medir, de 1e3 a 1e7 (padrão: 1e3 1e4 1e5)")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--days", type=int, default=366)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="usa a leitura em blocos (carga e agregação medidas juntas)")
+    parser.add_argument("--charts", choices=gr.FORMATOS_GRAFICO, default="png")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="repetições por caso; vale o menor tempo de cada estágio")
+    parser.add_argument("--no-startup", action="store_true",
+                        help="não mede o import e o --dry-run")
+    parser.add_argument("-o", "--output", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--baseline", metavar="ARQUIVO",
+                        help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="folga relativa antes de acusar regressão (padrão: 0.2)")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="diferença absoluta mínima, em segundos (padrão: 0.05)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    resultado = {
+        "meta": {
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pandas": gr.pd.__version__,
+            "matplotlib": gr.matplotlib.__version__,
+        },
+        "casos": [],
+    }
+    if not args.no_startup:
+        inicio = resultado["inicializacao"] = medir_inicializacao(max(args.repeat, 3))
+        print(f"import generate_report: {inicio['import_s']:.3f}s "
+              f"({inicio['modulos']} módulos), --dry-run: {inicio['dry_run_s']:.3f}s")
+        for m in inicio["mais_caros"][:5]:
+            print(f"  {m['modulo']:<40} {m['proprio_s']:.3f}s")
+    print(f"{'linhas':>11} " + " ".join(f"{e:>10}" for e in ESTAGIOS) + f" {'PDF (KB)':>9}")
+    for linhas in (int(r) for r in args.rows):
+        caminho = arquivo_sintetico(linhas, args.products, args.sellers, args.days, args.seed)
+        melhores = None
+        for _ in range(args.repeat):
+            tempos, tamanho = medir_caso(caminho, args.chunksize, args.charts)
+            melhores = tempos if melhores is None else {
+                k: min(v, melhores[k]) for k, v in tempos.items()}
+        resultado["casos"].append({
+            "linhas": linhas, "produtos": args.products, "vendedores": args.sellers,
+            "dias": args.days, "chunksize": args.chunksize, "formato": args.charts,
+            "estagios": melhores, "pdf_bytes": tamanho,
+        })
+        print(f"{linhas:>11,} " + " ".join(f"{melhores[e]:>10.3f}" for e in ESTAGIOS)
+              + f" {tamanho / 1024:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressoes = comparar(resultado, baseline, args.tolerance, args.min_delta)
+        for r in regressoes:
+            print(f"REGRESSÃO: {r}")
+        if regressoes:
+            raise SystemExit(1)
+        print("Sem regressões em relação ao baseline")
+
+
+if __name__ == "__main__":
+    main()
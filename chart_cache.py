@@ -0,0 +1,132 @@
+"""Cache em disco dos gráficos renderizados, endereçado pelo conteúdo.
+
+A chave é um hash de tudo que determina a saída de um gráfico: o código
+da função `chart_*` e o do módulo que a define (os auxiliares que ela
+chama, limites e paleta), o dos codificadores de `MODULOS_RENDERIZACAO`,
+as séries que ela recebe, o tamanho de destino, o formato (PNG, vetorial
+ou de paleta), o dpi, os `rcParams` e a versão do matplotlib.
+Num acerto os bytes são lidos do disco e o matplotlib nem é chamado.
+
+O diretório tem um limite de tamanho; quando ele é ultrapassado, os
+arquivos usados há mais tempo (pelo mtime, renovado a cada acerto) são
+removidos primeiro. Vários processos podem usar o mesmo diretório: cada
+entrada é gravada num temporário e renomeada, e uma entrada que outro
+processo já removeu é só ignorada.
+"""
+import contextlib
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+from functools import lru_cache
+
+LIMITE_PADRAO = 64 * 1024 * 1024
+# módulos vizinhos que convertem a figura nos bytes guardados
+MODULOS_RENDERIZACAO = ("vector_charts", "indexed_images")
+
+
+@lru_cache(maxsize=None)
+def _hash_arquivo(caminho, _tamanho, _mtime_ns):
+    with open(caminho, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def assinatura_codigo(*caminhos):
+    """Hash do conteúdo dos arquivos de código; muda quando qualquer um deles muda."""
+    h = hashlib.blake2b(digest_size=16)
+    for caminho in caminhos:
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            continue
+        conteudo = _hash_arquivo(caminho, st.st_size, st.st_mtime_ns)
+        h.update(f"{os.path.basename(caminho)}:{conteudo}\n".encode())
+    return h.hexdigest()
+
+
+def arquivos_renderizacao(*modulos):
+    """Arquivos dos `modulos` dados e dos de `MODULOS_RENDERIZACAO`."""
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    caminhos = [getattr(sys.modules.get(m), "__file__", None) for m in modulos]
+    caminhos += [os.path.join(pasta, f"{m}.py") for m in MODULOS_RENDERIZACAO]
+    return [c for c in caminhos if c]
+
+
+def _assinatura_funcao(func):
+    try:
+        fonte = inspect.getsource(func)
+    except (OSError, TypeError):
+        fonte = ""
+    return f"{func.__name__}\n{fonte}"
+
+
+class CacheGraficos:
+    """Gráficos por chave de conteúdo, com limite de bytes e descarte LRU."""
+
+    def __init__(self, diretorio, limite_bytes=LIMITE_PADRAO):
+        self.diretorio    = diretorio
+        self.limite_bytes = limite_bytes
+        self.acertos      = 0
+        self.faltas       = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    def chave(self, func, args, largura_cm, altura_cm, formato, dpi, rc_params=None):
+        """Hash do que determina o gráfico; `rc_params` vem do chamador já configurado."""
+        import matplotlib  # o chamador já o importou para obter o rcParams
+
+        if rc_params is None:
+            rc_params = matplotlib.rcParams
+        h = hashlib.blake2b(digest_size=20)
+        h.update(_assinatura_funcao(func).encode())
+        h.update(assinatura_codigo(*arquivos_renderizacao(func.__module__)).encode())
+        h.update(pickle.dumps(args, protocol=5))
+        h.update(repr((largura_cm, altura_cm, formato, dpi)).encode())
+        h.update(repr(sorted(rc_params.items())).encode())
+        h.update(matplotlib.__version__.encode())
+        return h.hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + ".bin")
+
+    def obter(self, chave):
+        """Bytes do gráfico em cache, ou None. Conta o acerto/falta."""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+        except OSError:
+            self.faltas += 1
+            return None
+        with contextlib.suppress(FileNotFoundError):  # outro processo pode tê-lo podado
+            os.utime(caminho)  # marca como usado recentemente
+        self.acertos += 1
+        return dados
+
+    def guardar(self, chave, dados):
+        caminho = self._caminho(chave)
+        tmp = f"{caminho}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, caminho)
+        self._podar()
+
+    def _podar(self):
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".bin"):
+                continue
+            # outro processo podando o mesmo diretório pode remover a entrada antes
+            with contextlib.suppress(FileNotFoundError):
+                st = os.stat(os.path.join(self.diretorio, nome))
+                entradas.append((st.st_mtime_ns, st.st_size, nome))
+        total = sum(tam for _, tam, _ in entradas)
+        for _, tam, nome in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.diretorio, nome))
+            total -= tam
+
+    def resumo(self):
+        return f"Cache de gráficos: {self.acertos} acertos, {self.faltas} faltas"
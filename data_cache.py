@@ -0,0 +1,136 @@
+"""Cache colunar em disco do CSV de vendas já tipado.
+
+Cada arquivo de entrada ganha um diretório próprio com uma matriz NumPy
+(.npy) por coluna, carregada com `mmap_mode="r"`. Num acerto de cache não
+há parsing de CSV nem de datas: as colunas numéricas e de data são
+mapeadas direto do disco e as dimensões de texto voltam como
+`Categorical` a partir dos códigos inteiros.
+
+A chave é (caminho absoluto, tamanho, mtime, hash do conteúdo); qualquer
+mudança em um deles descarta a entrada antiga do mesmo caminho.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+DIRETORIO_CACHE = ".cache_relatorio"
+VERSAO_FORMATO  = 1
+
+COLUNAS_TEXTO   = ["produto", "categoria", "vendedor", "regiao"]
+COLUNAS_NUMERO  = ["quantidade", "preco_unitario", "total"]
+
+
+def hash_conteudo(caminho, bloco=1 << 20):
+    """BLAKE2b do conteúdo do arquivo, lido em blocos de 1 MiB."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(caminho, "rb") as f:
+        for parte in iter(lambda: f.read(bloco), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def impressao_digital(caminho, esquema="padrao"):
+    """Identifica a versão do arquivo: caminho, tamanho, mtime e conteúdo."""
+    st = os.stat(caminho)
+    return {
+        "caminho": os.path.abspath(caminho),
+        "tamanho": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hash": hash_conteudo(caminho),
+        "esquema": esquema,
+        "versao": VERSAO_FORMATO,
+    }
+
+
+def _diretorio_entrada(caminho, diretorio, esquema="padrao"):
+    chave = hashlib.blake2b(f"{os.path.abspath(caminho)}\0{esquema}".encode(),
+                            digest_size=10).hexdigest()
+    return os.path.join(diretorio, chave)
+
+
+def _salvar(df, destino, digital):
+    import numpy as np
+    import pandas as pd
+
+    tmp = destino + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    mes_periodo = isinstance(df["mes"].dtype, pd.PeriodDtype)
+    meta = {"digital": digital, "linhas": len(df), "categorias": {},
+            "mes_periodo": mes_periodo}
+    np.save(os.path.join(tmp, "data.npy"),
+            df["data"].to_numpy(dtype="datetime64[ns]").view("int64"))
+    np.save(os.path.join(tmp, "mes.npy"),
+            df["mes"].array.asi8 if mes_periodo else df["mes"].to_numpy())
+    for col in COLUNAS_NUMERO:
+        np.save(os.path.join(tmp, f"{col}.npy"), df[col].to_numpy())
+    for col in COLUNAS_TEXTO:
+        cat = pd.Categorical(df[col])
+        np.save(os.path.join(tmp, f"{col}.npy"), cat.codes)
+        meta["categorias"][col] = cat.categories.tolist()
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # troca atômica: leitores nunca veem uma entrada pela metade
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(tmp, destino)
+
+
+def _carregar(origem, meta):
+    import numpy as np
+    import pandas as pd
+
+    def coluna(nome):
+        return np.load(os.path.join(origem, f"{nome}.npy"), mmap_mode="r")
+
+    dados = {
+        "data": pd.Series(coluna("data").view("datetime64[ns]"), copy=False),
+    }
+    for col in COLUNAS_TEXTO:
+        dados[col] = pd.Categorical.from_codes(
+            coluna(col), categories=meta["categorias"][col])
+    for col in COLUNAS_NUMERO:
+        dados[col] = pd.Series(coluna(col), copy=False)
+    if meta.get("mes_periodo", True):
+        dados["mes"] = pd.arrays.PeriodArray(np.asarray(coluna("mes")),
+                                             dtype=pd.PeriodDtype("M"))
+    else:
+        # chave inteira do esquema enxuto
+        dados["mes"] = pd.Series(coluna("mes"), copy=False)
+    ordem = ["data", "produto", "categoria", "quantidade", "preco_unitario",
+             "vendedor", "regiao", "total", "mes"]
+    return pd.DataFrame({col: dados[col] for col in ordem}, copy=False)
+
+
+def carregar_com_cache(caminho, carregar, diretorio=DIRETORIO_CACHE, esquema="padrao"):
+    """Devolve o DataFrame de `caminho`, do cache se a impressão digital bater.
+
+    `carregar(caminho)` é chamado só em caso de falta, e o resultado é
+    gravado no cache antes de ser devolvido. Cada `esquema` de leitura tem
+    a sua própria entrada, já que os tipos das colunas diferem.
+    """
+    digital = impressao_digital(caminho, esquema)
+    entrada = _diretorio_entrada(caminho, diretorio, esquema)
+    meta = _ler_meta(entrada)
+    if meta is None or meta["digital"] != digital:
+        os.makedirs(diretorio, exist_ok=True)
+        _salvar(carregar(caminho), entrada, digital)
+        meta = _ler_meta(entrada)
+    # mesmo numa falta devolvemos a versão do cache, para que os tipos
+    # das colunas não dependam de ter havido acerto ou não
+    return _carregar(entrada, meta)
+
+
+def _ler_meta(entrada):
+    try:
+        with open(os.path.join(entrada, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def limpar_cache(diretorio=DIRETORIO_CACHE):
+    """Remove todas as entradas do cache."""
+    shutil.rmtree(diretorio, ignore_errors=True)
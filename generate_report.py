@@ -1,7 +1,20 @@
-import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import argparse
+import bz2
+import csv
+import glob
+import gzip
+import importlib
+import io
+import lzma
+import math
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -9,11 +22,57 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    HRFlowable, Image, PageBreak, KeepTogether,
+    HRFlowable, Image, PageBreak, KeepTogether, Flowable,
 )
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from reportlab.pdfgen import canvas as rl_canvas
-from datetime import datetime
+from reportlab.pdfbase import pdfdoc
+from reportlab import rl_config
+from datetime import date, datetime
+
+import chart_cache
+import data_cache
+import pdf_stream
+import section_cache
+from instrumentacao import Metricas, SEM_METRICAS
+
+# ── IMPORTAÇÕES SOB DEMANDA ───────────────────────────────────────────────────
+# pandas e matplotlib respondem pela maior parte do tempo de import; só são
+# carregados quando uma etapa os usa de fato (um --dry-run não os carrega,
+# e uma execução com todos os gráficos em cache não carrega o pyplot).
+class _ModuloPreguicoso:
+    """Importa o módulo no primeiro acesso a um atributo.
+
+    Depois disso o nome global passa a ser o próprio módulo, então o
+    desvio custa só o primeiro acesso.
+    """
+
+    def __init__(self, apelido, importar):
+        self._apelido = apelido
+        self._importar = importar
+
+    def __getattr__(self, atributo):
+        modulo = self._importar()
+        globals()[self._apelido] = modulo
+        return getattr(modulo, atributo)
+
+
+def _importar_matplotlib():
+    mpl = importlib.import_module("matplotlib")
+    mpl.use("Agg")
+    mpl.rcParams.update(RC_GRAFICOS)
+    return mpl
+
+
+def _importar_pyplot():
+    # pelo proxy, carrega o matplotlib com o estilo; o backend vem antes do pyplot
+    matplotlib.use("Agg")
+    return importlib.import_module("matplotlib.pyplot")
+
+
+pd         = _ModuloPreguicoso("pd", lambda: importlib.import_module("pandas"))
+matplotlib = _ModuloPreguicoso("matplotlib", _importar_matplotlib)
+plt        = _ModuloPreguicoso("plt", _importar_pyplot)
 
 # ── PALETA DE CORES ───────────────────────────────────────────────────────────
 AZUL_ESCURO  = colors.HexColor("#16213e")
@@ -32,116 +91,731 @@ WIDTH, HEIGHT = A4
 MARGEM       = 2 * cm
 FULL_W       = WIDTH - 2 * MARGEM
 
+ARQUIVO_ENTRADA = "sales_data.csv"
+ARQUIVO_SAIDA   = "sales_report.pdf"
+DPI_GRAFICOS    = 150
+
+# Chave do cubo de agregação: toda métrica do relatório sai destas dimensões
+DIMENSOES = ["mes", "categoria", "produto", "vendedor", "regiao"]
+
+# Granularidade da série temporal dos gráficos → frequência do Period.
+# Dia e semana exigem o cubo em resolução diária (semanas cruzam meses);
+# nesse caso a coluna "mes" do cubo guarda o dia.
+GRANULARIDADES = {"dia": "D", "semana": "W", "mes": "M", "trimestre": "Q"}
+RESOLUCAO_CUBO = {"dia": "D", "semana": "D", "mes": "M", "trimestre": "M"}
+
+# Modo --approx-top: dimensões ranqueadas por esboço (topn_sketch.py) em vez
+# de entrarem no cubo, e o prefixo das colunas de receita por categoria
+DIMENSOES_ESBOCO  = ("produto", "vendedor")
+PREFIXO_CATEGORIA = "categoria="
+CAPACIDADE_ESBOCO = 1000
+
+# Esquema explícito do modo "enxuto": dimensões como category (códigos
+# inteiros + dicionário), quantidade em 32 bits e datas num formato fixo.
+# O preço fica em float64 para que a receita some igual ao esquema padrão.
+ESQUEMAS      = ("padrao", "enxuto")
+TIPOS_ENXUTOS = {
+    "produto": "category", "categoria": "category", "vendedor": "category",
+    "regiao": "category", "quantidade": "int32", "preco_unitario": "float64",
+}
+FORMATO_DATA  = "%Y-%m-%d"
+
+# Colunas obrigatórias do CSV de vendas
+COLUNAS_ENTRADA = ["data", "produto", "categoria", "quantidade", "preco_unitario",
+                   "vendedor", "regiao"]
+
+# Arquivos aceitos ao ler um diretório de partições (um por dia, loja...)
+EXTENSOES_ENTRADA = (".csv", ".csv.gz", ".csv.bz2", ".csv.xz", ".csv.zst", ".csv.zip")
+
+# Motores de agregação: o pandas, ou um SQL embutido (veja sql_backend.py)
+BACKENDS = ("pandas", "sqlite", "duckdb")
+
 # ── 1. CARREGAR E PROCESSAR DADOS ─────────────────────────────────────────────
-df = pd.read_csv("sales_data.csv")
-df["data"]  = pd.to_datetime(df["data"])
-df["total"] = df["quantidade"] * df["preco_unitario"]
-df["mes"]   = df["data"].dt.to_period("M")
-
-# KPIs gerais
-total_geral      = df["total"].sum()
-total_transacoes = len(df)
-ticket_medio     = df["total"].mean()
-qtd_total        = df["quantidade"].sum()
-
-# Análise mensal
-monthly       = df.groupby("mes")["total"].sum().sort_index()
-monthly_qtd   = df.groupby("mes")["quantidade"].sum().sort_index()
-monthly_short = [m.strftime("%b/%y") for m in monthly.index]
-monthly_growth = monthly.pct_change() * 100
-crescimento_anual = (monthly.iloc[-1] / monthly.iloc[0] - 1) * 100
-
-# Análise por categoria
-cat_receita = df.groupby("categoria")["total"].sum().sort_values(ascending=False)
-cat_qtd     = df.groupby("categoria")["quantidade"].sum()
-cat_ticket  = cat_receita / cat_qtd
-
-# Análise por produto
-prod_receita = df.groupby("produto")["total"].sum().sort_values(ascending=False)
-prod_qtd     = df.groupby("produto")["quantidade"].sum()
-top5_prods   = prod_receita.head(5)
-
-# Análise por vendedor
-vend_receita    = df.groupby("vendedor")["total"].sum().sort_values(ascending=False)
-vend_transacoes = df.groupby("vendedor").size()
-vend_ticket     = (
-    df.groupby("vendedor")["total"].sum() / df.groupby("vendedor").size()
-)
+def preparar_linhas(df, esquema="padrao"):
+    """Converte `data` e adiciona as colunas derivadas `total` e `mes`.
+
+    No esquema enxuto `mes` é uma chave inteira (o ordinal do período
+    mensal, meses desde 1970-01), bem mais barata de agrupar que Period;
+    `construir_cubo` a devolve como Period no cubo.
+    """
+    if esquema == "enxuto":
+        df["data"]  = pd.to_datetime(df["data"], format=FORMATO_DATA)
+        df["total"] = df["quantidade"] * df["preco_unitario"]
+        df["mes"]   = df["data"].to_numpy().astype("datetime64[M]").astype("int32")
+        return df
+    df["data"]  = pd.to_datetime(df["data"])
+    df["total"] = df["quantidade"] * df["preco_unitario"]
+    df["mes"]   = df["data"].dt.to_period("M")
+    return df
+
+
+def _ler_csv(caminho, esquema, **kwargs):
+    tipos = TIPOS_ENXUTOS if esquema == "enxuto" else None
+    return pd.read_csv(caminho, dtype=tipos, **kwargs)
+
+
+def carregar_dados(caminho=ARQUIVO_ENTRADA, esquema="padrao"):
+    """Lê o CSV inteiro em memória, já com as colunas derivadas."""
+    return preparar_linhas(_ler_csv(caminho, esquema), esquema)
+
+
+def ler_em_blocos(caminho=ARQUIVO_ENTRADA, chunksize=100_000, esquema="padrao"):
+    """Lê o CSV em blocos de até `chunksize` linhas, já com as colunas derivadas."""
+    with _ler_csv(caminho, esquema, chunksize=chunksize) as leitor:
+        for bloco in leitor:
+            yield preparar_linhas(bloco, esquema)
+
+
+def expandir_entradas(entrada):
+    """Arquivos de `entrada`, em ordem: um arquivo, um diretório ou um padrão glob.
+
+    Num diretório entram os arquivos com uma das `EXTENSOES_ENTRADA`; a
+    compressão de cada arquivo é inferida pelo pandas a partir da extensão.
+    """
+    if any(c in entrada for c in "*?["):
+        arquivos = sorted(glob.glob(entrada, recursive=True))
+    elif os.path.isdir(entrada):
+        arquivos = sorted(os.path.join(entrada, nome) for nome in os.listdir(entrada)
+                          if nome.endswith(EXTENSOES_ENTRADA))
+    else:
+        return [entrada]
+    if not arquivos:
+        raise FileNotFoundError(f"nenhum arquivo de vendas em {entrada}")
+    return arquivos
+
+
+def abrir_texto(caminho):
+    """Abre um CSV, comprimido ou não (pela extensão), em modo texto, sem pandas."""
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rt", newline="", encoding="utf-8")
+    if caminho.endswith(".bz2"):
+        return bz2.open(caminho, "rt", newline="", encoding="utf-8")
+    if caminho.endswith(".xz"):
+        return lzma.open(caminho, "rt", newline="", encoding="utf-8")
+    if caminho.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("arquivos .zst requerem o pacote zstandard: "
+                              "pip install zstandard") from None
+        bruto = zstandard.ZstdDecompressor().stream_reader(open(caminho, "rb"), closefd=True)
+        return io.TextIOWrapper(bruto, newline="", encoding="utf-8")
+    if caminho.endswith(".zip"):
+        # como o pandas: o arquivo compactado tem um único membro
+        arquivo = zipfile.ZipFile(caminho)
+        nome, = arquivo.namelist()
+        return io.TextIOWrapper(arquivo.open(nome), newline="", encoding="utf-8")
+    return open(caminho, newline="", encoding="utf-8")
+
+
+def validar_amostra(caminho, linhas=100):
+    """Problemas no cabeçalho e nas primeiras `linhas` linhas de um CSV.
+
+    Só usa o módulo `csv`: é o que o `--dry-run` roda, sem importar o
+    pandas. Confere as colunas obrigatórias, datas em ISO e quantidade e
+    preço numéricos. Devolve uma lista de mensagens (vazia se está ok).
+    """
+    try:
+        with abrir_texto(caminho) as f:
+            leitor = csv.DictReader(f)
+            faltando = set(COLUNAS_ENTRADA) - set(leitor.fieldnames or ())
+            if faltando:
+                return [f"{caminho}: colunas ausentes: {sorted(faltando)}"]
+            problemas = []
+            for n, linha in enumerate(leitor, start=2):
+                if n > linhas + 1:
+                    break
+                try:
+                    date.fromisoformat(linha["data"])  # bem mais rápido que strptime
+                    int(linha["quantidade"])
+                    float(linha["preco_unitario"])
+                except (TypeError, ValueError) as e:
+                    problemas.append(f"{caminho}:{n}: {e}")
+            return problemas
+    except (OSError, ValueError, UnicodeDecodeError, zipfile.BadZipFile, ImportError) as e:
+        return [f"{caminho}: {e}"]
+
+
+def construir_cubo(df, resolucao="M"):
+    """Soma de receita, transações e quantidade por (mes, categoria, produto, vendedor, regiao).
+
+    É a única passada sobre as linhas do CSV; todo o resto do relatório é
+    derivado do cubo, cujo tamanho depende do número de grupos. Cada célula
+    guarda também a primeira e a última data vista, para que qualquer
+    recorte do cubo saiba o próprio período. Com `resolucao="D"` a chave
+    temporal é o dia, para as séries diárias e semanais.
+    """
+    chaves = DIMENSOES
+    if resolucao == "D":
+        # dias desde 1970-01-01, o ordinal do Period diário
+        dias = df["data"].to_numpy().astype("datetime64[D]").astype("int64")
+        chaves = [pd.Series(dias, index=df.index, name="mes")] + DIMENSOES[1:]
+    cubo = (
+        df.groupby(chaves, sort=True, observed=True)
+          .agg(total=("total", "sum"),
+               transacoes=("total", "size"),
+               quantidade=("quantidade", "sum"),
+               data_min=("data", "min"),
+               data_max=("data", "max"))
+          .reset_index()
+    )
+    if pd.api.types.is_integer_dtype(cubo["mes"]):
+        # chave inteira (esquema enxuto ou dia) → Period, como no esquema padrão
+        cubo["mes"] = pd.arrays.PeriodArray(cubo["mes"].to_numpy("int64"),
+                                            dtype=pd.PeriodDtype(resolucao))
+    return cubo
+
+
+# Como cada medida do cubo é combinada ao juntar cubos parciais
+AGREGACAO_CUBO = {
+    "total": "sum", "transacoes": "sum", "quantidade": "sum",
+    "data_min": "min", "data_max": "max",
+}
+
+
+def combinar_cubos(cubos):
+    """Junta cubos parciais (de blocos, arquivos ou dias) num cubo único."""
+    return (
+        pd.concat(cubos, ignore_index=True)
+          .groupby(DIMENSOES, sort=True, observed=True)
+          .agg(AGREGACAO_CUBO)
+          .reset_index()
+    )
+
+
+def comparar_cubos(cubo, referencia, nomes=("cubo", "referência")):
+    """Lista as divergências entre dois cubos (células e medidas).
+
+    A receita é comparada com tolerância relativa de 1e-6, já que motores
+    diferentes somam os mesmos valores em ordens diferentes; as contagens
+    e as datas precisam ser iguais.
+    """
+    a, b = combinar_cubos([cubo]), combinar_cubos([referencia])  # mesma ordenação e tipos
+    for c in DIMENSOES:
+        a[c], b[c] = a[c].astype(object), b[c].astype(object)
+    juntos = a.merge(b, on=DIMENSOES, how="outer", suffixes=("_a", "_b"), indicator=True)
+
+    divergencias = []
+    for _, linha in juntos[juntos["_merge"] != "both"].iterrows():
+        lado = nomes[0] if linha["_merge"] == "left_only" else nomes[1]
+        divergencias.append(f"célula só no {lado}: {tuple(linha[c] for c in DIMENSOES)}")
+    ambos = juntos[juntos["_merge"] == "both"]
+    for col in AGREGACAO_CUBO:
+        x, y = ambos[f"{col}_a"], ambos[f"{col}_b"]
+        if col == "total":
+            difere = (x - y).abs() > 1e-6 * y.abs().clip(lower=1)
+        else:
+            difere = x != y
+        for _, linha in ambos[difere].iterrows():
+            divergencias.append(
+                f"{col} em {tuple(linha[c] for c in DIMENSOES)}: "
+                f"{linha[f'{col}_a']} != {linha[f'{col}_b']}")
+    return divergencias
+
+
+def _meses(coluna):
+    """A coluna "mes" do cubo em períodos mensais, qualquer que seja a resolução."""
+    return coluna if coluna.dtype == pd.PeriodDtype("M") else coluna.dt.asfreq("M")
+
+
+def filtrar_cubo(cubo, filtro):
+    """Recorte do cubo onde cada dimensão de `filtro` ({dim: valor}) bate."""
+    mascara = pd.Series(True, index=cubo.index)
+    for dim, valor in filtro.items():
+        coluna = cubo[dim]
+        if dim == "mes":
+            valor = pd.Period(valor, freq="M")
+            coluna = _meses(coluna)
+        mascara &= coluna == valor
+    return cubo[mascara].reset_index(drop=True)
+
+
+# ── 1b. ANÁLISES (derivadas do cubo) ─────────────────────────────────────────
+def _rotulo_periodo(periodo):
+    """Rótulo curto de um período no eixo dos gráficos."""
+    tipo = periodo.freqstr[0]
+    if tipo == "Q":
+        return periodo.strftime("T%q/%y")
+    if tipo in "DW":
+        # a semana é rotulada pelo dia em que começa
+        return periodo.start_time.strftime("%d/%m/%y")
+    return periodo.strftime("%b/%y")
+
+
+MESES_ABREV = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun",
+               "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+def rotulo_mes(periodo, ano=True):
+    """"Dez/2024" (ou só "Dez") de um período mensal."""
+    mes = MESES_ABREV[periodo.month - 1]
+    return f"{mes}/{periodo.year}" if ano else mes
+
+
+def rotulo_intervalo(meses):
+    """"Jan/2024 – Dez/2024", do primeiro ao último de `meses`."""
+    return f"{rotulo_mes(meses.min())} – {rotulo_mes(meses.max())}"
+
+
+def titulo_relatorio(meses):
+    """"Relatório de Vendas 2024" (ou "2023–2024"), para a capa e o rodapé."""
+    primeiro, ultimo = meses.min().year, meses.max().year
+    anos = str(primeiro) if primeiro == ultimo else f"{primeiro}–{ultimo}"
+    return f"Relatório de Vendas {anos}"
+
+
+class Agregados:
+    """KPIs, rankings e pivots do relatório, calculados a partir do cubo.
+
+    `granularidade` ("dia", "semana", "mes" ou "trimestre") define a série
+    dos gráficos de evolução; dia e semana pedem um cubo diário. As tabelas
+    continuam mensais em qualquer caso. Com `esbocos` (modo `--approx-top`)
+    produtos e vendedores vêm dos esboços, só os `top` primeiros, com
+    receitas estimadas.
+    """
+
+    def __init__(self, cubo, granularidade="mes", esbocos=None, top=10):
+        if cubo.empty:
+            raise ValueError("nenhuma venda para agregar")
+        if RESOLUCAO_CUBO[granularidade] == "D" and cubo["mes"].dtype != pd.PeriodDtype("D"):
+            raise ValueError(f"granularidade {granularidade!r} exige o cubo em resolução diária")
+        self.cubo     = cubo
+        self.data_min = cubo["data_min"].min()
+        self.data_max = cubo["data_max"].max()
+
+        # KPIs gerais
+        self.total_geral      = cubo["total"].sum()
+        self.total_transacoes = int(cubo["transacoes"].sum())
+        self.ticket_medio     = self.total_geral / self.total_transacoes
+        self.qtd_total        = cubo["quantidade"].sum()
+
+        # Análise mensal
+        por_mes = self._somar(_meses(cubo["mes"])).sort_index()
+        self.monthly        = por_mes["total"]
+        self.monthly_qtd    = por_mes["quantidade"]
+        self.monthly_trans  = por_mes["transacoes"]
+        self.monthly_short  = [m.strftime("%b/%y") for m in self.monthly.index]
+        self.monthly_growth = self.monthly.pct_change() * 100
+        self.crescimento_anual = (self.monthly.iloc[-1] / self.monthly.iloc[0] - 1) * 100
+
+        # Série dos gráficos de evolução, na granularidade pedida
+        self.granularidade = granularidade
+        if granularidade == "mes":
+            self.serie, self.serie_rotulos = self.monthly, self.monthly_short
+            self.serie_crescimento = self.monthly_growth
+        else:
+            self.serie = self._serie_temporal(GRANULARIDADES[granularidade])
+            self.serie_rotulos = [_rotulo_periodo(p) for p in self.serie.index]
+            # períodos sem venda não têm crescimento definido
+            self.serie_crescimento = (self.serie.pct_change()
+                                      .mask(self.serie.shift() == 0) * 100)
+
+        # Análise por categoria
+        por_cat = self._somar("categoria")
+        self.cat_receita = por_cat["total"].sort_values(ascending=False)
+        self.cat_qtd     = por_cat["quantidade"]
+        self.cat_ticket  = self.cat_receita / self.cat_qtd
+
+        # Análise por produto
+        por_prod = self._somar("produto")
+        self.prod_receita   = por_prod["total"].sort_values(ascending=False)
+        self.prod_qtd       = por_prod["quantidade"]
+        self.prod_categoria = cubo.groupby("produto", observed=True)["categoria"].first()
+        self.top5_prods     = self.prod_receita.head(5)
+
+        # Análise por vendedor
+        por_vend = self._somar("vendedor")
+        self.vend_receita    = por_vend["total"].sort_values(ascending=False)
+        self.vend_transacoes = por_vend["transacoes"]
+        self.vend_ticket     = por_vend["total"] / por_vend["transacoes"]
+
+        # Análise regional
+        por_reg = self._somar("regiao")
+        self.reg_receita    = por_reg["total"].sort_values(ascending=False)
+        self.reg_qtd        = por_reg["quantidade"]
+        self.reg_transacoes = por_reg["transacoes"]
+
+        # Pivots dimensão × categoria
+        self.pivot_vc = self._pivot("vendedor")
+        self.pivot_rc = self._pivot("regiao")
+
+        self.esbocos = esbocos
+        if esbocos is not None:
+            self._usar_esbocos(top)
+
+    def kpis(self):
+        """KPIs gerais em tipos nativos, para comparação com recortes."""
+        return {
+            "total_geral":      float(self.total_geral),
+            "total_transacoes": self.total_transacoes,
+            "ticket_medio":     float(self.ticket_medio),
+            "qtd_total":        int(self.qtd_total),
+        }
+
+    def _somar(self, dim):
+        return self.cubo.groupby(dim, observed=True)[["total", "quantidade", "transacoes"]].sum()
+
+    def _usar_esbocos(self, top):
+        """Rankings de produtos e vendedores a partir dos esboços (estimativas)."""
+        prods = self.esbocos["produto"].top(top).rename_axis("produto")
+        self.prod_receita   = prods["total"]
+        self.prod_qtd       = prods["quantidade"]
+        self.prod_categoria = prods["categoria"]
+        self.top5_prods     = self.prod_receita.head(5)
+
+        vends = self.esbocos["vendedor"].top(top).rename_axis("vendedor")
+        self.vend_receita    = vends["total"]
+        self.vend_transacoes = vends["transacoes"]
+        self.vend_ticket     = vends["total"] / vends["transacoes"]
+        categorias = self.pivot_rc.columns
+        self.pivot_vc = (vends.reindex(columns=[PREFIXO_CATEGORIA + str(c) for c in categorias],
+                                       fill_value=0)
+                              .set_axis(categorias, axis=1)
+                              .sort_index())
+
+    def _serie_temporal(self, freq):
+        """Receita por período `freq`, com zero nos períodos sem venda."""
+        serie = self.cubo.groupby(self.cubo["mes"].dt.asfreq(freq))["total"].sum()
+        return serie.reindex(pd.period_range(serie.index.min(), serie.index.max(), freq=freq),
+                             fill_value=0)
+
+    def _pivot(self, dim):
+        return (
+            self.cubo.groupby([dim, "categoria"], observed=True)["total"].sum()
+                     .unstack("categoria", fill_value=0)
+        )
+
+
+def analisar(df, granularidade="mes"):
+    """Constrói o cubo a partir do DataFrame e devolve os agregados do relatório."""
+    return Agregados(construir_cubo(df, RESOLUCAO_CUBO[granularidade]), granularidade)
+
+
+def novos_esbocos(capacidade):
+    """Esboços de top-N vazios para o modo `--approx-top`, um por dimensão ranqueada."""
+    import topn_sketch
+
+    return {dim: topn_sketch.EsbocoTopN(capacidade) for dim in DIMENSOES_ESBOCO}
+
+
+def alimentar_esbocos(esbocos, bloco):
+    """Soma um bloco aos esboços e devolve o bloco sem produto e vendedor.
+
+    O produto leva receita, quantidade e categoria; o vendedor leva
+    receita, transações e a receita por categoria (para o pivot). No
+    bloco devolvido as duas colunas viram uma constante, então o cubo não
+    cresce com o número de produtos e vendedores distintos.
+    """
+    esbocos["produto"].adicionar(
+        bloco.groupby("produto", observed=True, sort=False)
+             .agg(total=("total", "sum"), quantidade=("quantidade", "sum"),
+                  categoria=("categoria", "first")))
+    por_categoria = (bloco.groupby(["vendedor", "categoria"], observed=True)["total"].sum()
+                          .unstack("categoria", fill_value=0))
+    por_categoria.columns = [PREFIXO_CATEGORIA + str(c) for c in por_categoria.columns]
+    esbocos["vendedor"].adicionar(
+        bloco.groupby("vendedor", observed=True, sort=False)
+             .agg(total=("total", "sum"), transacoes=("total", "size"))
+             .join(por_categoria))
+    return bloco.assign(**{dim: "—" for dim in DIMENSOES_ESBOCO})
+
+
+def cubo_em_blocos(blocos, resolucao="M", esbocos=None):
+    """Cubo de um iterável de blocos, sem nunca manter mais de um bloco em memória.
+
+    Cada bloco vira um cubo parcial que é imediatamente somado ao cubo
+    acumulado, então o pico de memória depende do número de grupos e do
+    tamanho do bloco, não do número de linhas do arquivo. Com `esbocos`
+    (veja `novos_esbocos`) produtos e vendedores vão para os esboços e
+    não para o cubo.
+    """
+    cubo = None
+    for bloco in blocos:
+        if esbocos is not None:
+            bloco = alimentar_esbocos(esbocos, bloco)
+        parcial = construir_cubo(bloco, resolucao)
+        cubo = parcial if cubo is None else combinar_cubos([cubo, parcial])
+    if cubo is None:
+        raise ValueError("arquivo de entrada sem linhas")
+    return cubo
+
+
+def analisar_em_blocos(blocos, granularidade="mes", esbocos=None, top=10):
+    """Agrega um iterável de blocos (veja `cubo_em_blocos`)."""
+    cubo = cubo_em_blocos(blocos, RESOLUCAO_CUBO[granularidade], esbocos)
+    return Agregados(cubo, granularidade, esbocos, top)
+
+
+def cubo_de_lote(caminhos, esquema="padrao", chunksize=None, linhas_por_cubo=500_000,
+                 resolucao="M", capacidade=None):
+    """Cubo parcial de um lote de partições.
+
+    Partições pequenas (um dia, uma loja) são lidas cruas e concatenadas
+    até `linhas_por_cubo` linhas antes de converter datas e agregar, para
+    não pagar um groupby por arquivo. Arquivos grandes podem ser lidos em
+    blocos de `chunksize` linhas. Com `capacidade`, devolve (cubo, esboços)
+    do modo `--approx-top`.
+    """
+    def partes():
+        for caminho in caminhos:
+            if chunksize:
+                with _ler_csv(caminho, esquema, chunksize=chunksize) as leitor:
+                    yield from leitor
+            else:
+                yield _ler_csv(caminho, esquema)
+
+    def blocos():
+        pendentes, linhas = [], 0
+        for parte in partes():
+            pendentes.append(parte)
+            linhas += len(parte)
+            if linhas >= linhas_por_cubo:
+                yield preparar_linhas(pd.concat(pendentes, ignore_index=True), esquema)
+                pendentes, linhas = [], 0
+        if pendentes:
+            yield preparar_linhas(pd.concat(pendentes, ignore_index=True), esquema)
+
+    if capacidade is None:
+        return cubo_em_blocos(blocos(), resolucao)
+    esbocos = novos_esbocos(capacidade)
+    return cubo_em_blocos(blocos(), resolucao, esbocos), esbocos
+
+
+def cubo_de_arquivos(caminhos, workers=None, esquema="padrao", chunksize=None, resolucao="M",
+                     esbocos=None):
+    """Cubo de várias partições, descomprimidas e agregadas em paralelo.
+
+    Os arquivos são divididos em lotes contíguos, alguns por processo;
+    cada processo agrega o seu lote e devolve só o cubo parcial, então o
+    tempo de carga escala com o número de núcleos e o que atravessa
+    processos é proporcional aos grupos, não às linhas. Com `esbocos`,
+    cada processo devolve também os seus, que são mesclados nestes.
+    """
+    if workers is None:
+        workers = min(len(caminhos), os.cpu_count() or 1)
+    n_lotes = min(len(caminhos), max(workers, 1) * 4)
+    lotes = [caminhos[i * len(caminhos) // n_lotes:(i + 1) * len(caminhos) // n_lotes]
+             for i in range(n_lotes)]
+    capacidade = None if esbocos is None else esbocos["produto"].capacidade
+    tarefa = partial(cubo_de_lote, esquema=esquema, chunksize=chunksize, resolucao=resolucao,
+                     capacidade=capacidade)
+    if workers <= 1:
+        parciais = [tarefa(lote) for lote in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parciais = list(pool.map(tarefa, lotes))
+    if esbocos is not None:
+        for _, do_lote in parciais:
+            for dim, esboco in do_lote.items():
+                esbocos[dim].mesclar(esboco)
+        parciais = [cubo for cubo, _ in parciais]
+    return combinar_cubos(parciais)
 
-# Análise regional
-reg_receita = df.groupby("regiao")["total"].sum().sort_values(ascending=False)
-reg_qtd     = df.groupby("regiao")["quantidade"].sum()
 
 # ── 2. GERAÇÃO DE GRÁFICOS (matplotlib → BytesIO) ────────────────────────────
-plt.rcParams.update({
+# aplicado ao rcParams quando o matplotlib é importado
+RC_GRAFICOS = {
     "font.family":        "DejaVu Sans",
     "axes.spines.top":    False,
     "axes.spines.right":  False,
     "figure.facecolor":   "white",
     "axes.facecolor":     "white",
-})
+}
 
 
-def fig_to_image(fig, width_cm, height_cm):
+def fig_to_png(fig):
     buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight", facecolor="white")
+    fig.savefig(buf, format="png", dpi=DPI_GRAFICOS, bbox_inches="tight", facecolor="white")
     plt.close(fig)
-    buf.seek(0)
-    return Image(buf, width=width_cm * cm, height=height_cm * cm)
+    return buf.getvalue()
+
+
+def png_to_image(png, width_cm, height_cm):
+    return Image(BytesIO(png), width=width_cm * cm, height=height_cm * cm)
 
 
-def chart_tendencia_mensal():
-    """Linha de receita mensal com área preenchida."""
+def fig_to_image(fig, width_cm, height_cm):
+    return png_to_image(fig_to_png(fig), width_cm, height_cm)
+
+
+# Formatos de saída dos gráficos: PNG rasterizado, desenho vetorial ou PNG
+# de paleta na resolução que o gráfico ocupa na página
+FORMATOS_GRAFICO = ("png", "vetor", "indexado")
+
+
+def fig_to_bytes(fig, formato, width_cm, height_cm):
+    """Serializa a figura no `formato` pedido (bytes, para o pool e o cache)."""
+    if formato == "vetor":
+        import vector_charts
+        desenho, fontes = vector_charts.fig_to_drawing(
+            fig, width_cm * cm, height_cm * cm, bbox_inches="tight", facecolor="white")
+        plt.close(fig)
+        return vector_charts.serializar_desenho(desenho, fontes)
+    if formato == "indexado":
+        import indexed_images
+        png = indexed_images.fig_to_png_indexado(fig, width_cm, height_cm, DPI_GRAFICOS)
+        plt.close(fig)
+        return png
+    return fig_to_png(fig)
+
+
+def bytes_to_flowable(dados, formato, width_cm, height_cm):
+    if formato == "vetor":
+        import vector_charts
+        return vector_charts.carregar_desenho(dados)
+    if formato == "indexado":
+        import indexed_images
+        return indexed_images.ImagemIndexada(dados, width_cm * cm, height_cm * cm)
+    return png_to_image(dados, width_cm, height_cm)
+
+
+# Limites dos gráficos de evolução: acima deles a série é reduzida, para
+# que o tempo de renderização não cresça com o número de períodos
+MAX_PONTOS_LINHA  = 400  # pontos desenhados na linha (LTTB)
+MAX_BARRAS        = 120  # barras de crescimento (mínimo e máximo por faixa)
+MAX_ROTULOS       = 24   # rótulos de valor sobre a linha e as barras
+MAX_MARCAS        = 16   # marcas no eixo x
+
+TITULOS_GRANULARIDADE = {
+    "dia":       ("Receita Diária (R$ mil)",     "Crescimento Dia a Dia (%)"),
+    "semana":    ("Receita Semanal (R$ mil)",    "Crescimento Semana a Semana (%)"),
+    "mes":       ("Receita Mensal (R$ mil)",     "Crescimento Mês a Mês (%)"),
+    "trimestre": ("Receita Trimestral (R$ mil)", "Crescimento Trimestre a Trimestre (%)"),
+}
+
+
+def reduzir_lttb(valores, pontos):
+    """Índices dos `pontos` que o Largest-Triangle-Three-Buckets mantém da série.
+
+    Preserva a forma da linha (picos e vales) escolhendo, em cada faixa,
+    o ponto que forma o maior triângulo com o ponto escolhido na faixa
+    anterior e a média da seguinte. O primeiro e o último ponto ficam.
+    """
+    import numpy as np
+
+    y = np.asarray(valores, dtype="float64")
+    n = len(y)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+    bordas = np.linspace(1, n - 1, pontos - 1).astype("int64")
+    escolhidos = np.empty(pontos, dtype="int64")
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    a = 0
+    for i in range(pontos - 2):
+        ini, fim = bordas[i], bordas[i + 1]
+        prox_fim = bordas[i + 2] if i + 2 < len(bordas) else n
+        mx, my = (fim + prox_fim - 1) / 2, y[fim:prox_fim].mean()
+        xs = np.arange(ini, fim)
+        areas = np.abs((a - mx) * (y[ini:fim] - y[a]) - (a - xs) * (my - y[a]))
+        a = ini + int(areas.argmax())
+        escolhidos[i + 1] = a
+    return escolhidos
+
+
+def reduzir_minmax(valores, pontos):
+    """Índices do mínimo e do máximo de cada uma de `pontos` // 2 faixas, em ordem."""
+    import numpy as np
+
+    y = np.asarray(valores, dtype="float64")
+    if pontos >= len(y):
+        return np.arange(len(y))
+    faixas = np.array_split(np.arange(len(y)), max(pontos // 2, 1))
+    escolhidos = set()
+    for faixa in faixas:
+        escolhidos.add(faixa[y[faixa].argmin()])
+        escolhidos.add(faixa[y[faixa].argmax()])
+    return np.array(sorted(escolhidos))
+
+
+def _marcas_eixo(n, rotulos):
+    """Posições e rótulos do eixo x: todos, ou no máximo MAX_MARCAS espaçados."""
+    passo = max(1, math.ceil(n / MAX_MARCAS))
+    x = list(range(0, n, passo))
+    return x, [rotulos[i] for i in x]
+
+
+def chart_tendencia_mensal(monthly, monthly_short, granularidade="mes"):
+    """Linha de receita por período com área preenchida.
+
+    Séries longas são reduzidas com LTTB a MAX_PONTOS_LINHA pontos e só
+    o pico, o vale e o último período ganham rótulo de valor.
+    """
     fig, ax = plt.subplots(figsize=(13, 3.8))
-    x    = list(range(len(monthly)))
+    n    = len(monthly)
     vals = monthly.values / 1000
+    x    = list(range(n))
+    if n > MAX_PONTOS_LINHA:
+        x = reduzir_lttb(vals, MAX_PONTOS_LINHA)
+        vals = vals[x]
+    denso = len(x) > MAX_ROTULOS
 
     ax.fill_between(x, vals, alpha=0.12, color="#0f3460")
-    ax.plot(x, vals, color="#0f3460", linewidth=2.5, marker="o",
-            markersize=5, markerfacecolor="#e94560", markeredgewidth=0)
-
-    for i, v in enumerate(vals):
-        ax.annotate(f"R${v:.0f}k", (i, v),
+    if denso:
+        ax.plot(x, vals, color="#0f3460", linewidth=1.2)
+        rotulados = sorted({int(vals.argmax()), int(vals.argmin()), len(vals) - 1})
+    else:
+        ax.plot(x, vals, color="#0f3460", linewidth=2.5, marker="o",
+                markersize=5, markerfacecolor="#e94560", markeredgewidth=0)
+        rotulados = range(len(vals))
+
+    for i in rotulados:
+        ax.annotate(f"R${vals[i]:.0f}k", (x[i], vals[i]),
                     textcoords="offset points", xytext=(0, 9),
                     ha="center", fontsize=7.5, color="#333333")
 
-    ax.set_xticks(x)
-    ax.set_xticklabels(monthly_short, fontsize=8.5)
+    marcas, rotulos = _marcas_eixo(n, monthly_short)
+    ax.set_xticks(marcas)
+    ax.set_xticklabels(rotulos, fontsize=8.5)
     ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda v, _: f"R${v:.0f}k"))
     ax.tick_params(axis="y", labelsize=8)
-    ax.set_title("Receita Mensal (R$ mil)", fontsize=11,
+    ax.set_title(TITULOS_GRANULARIDADE[granularidade][0], fontsize=11,
                  fontweight="bold", color="#16213e", pad=10)
     ax.grid(axis="y", linestyle="--", alpha=0.35)
     fig.tight_layout()
     return fig
 
 
-def chart_crescimento_mensal():
-    """Barras de crescimento mês a mês."""
-    fig, ax = plt.subplots(figsize=(13, 2.8))
-    g    = monthly_growth.dropna()
-    x    = list(range(len(g)))
-    lbls = [monthly_short[i + 1] for i in x]
-    cors = ["#27ae60" if v >= 0 else "#e94560" for v in g.values]
+def chart_crescimento_mensal(monthly_growth, monthly_short, granularidade="mes"):
+    """Barras de crescimento período a período.
 
-    bars = ax.bar(x, g.values, color=cors, width=0.6)
-    ax.set_xticks(x)
-    ax.set_xticklabels(lbls, fontsize=8)
+    Acima de MAX_BARRAS períodos ficam o mínimo e o máximo de cada faixa,
+    desenhados como uma só coleção de linhas, sem rótulo por barra.
+    """
+    fig, ax = plt.subplots(figsize=(13, 2.8))
+    validos = monthly_growth.notna().to_numpy()
+    g    = monthly_growth[validos]
+    n    = len(g)
+    lbls = [r for r, ok in zip(monthly_short, validos) if ok]
+    vals = g.values
+    x    = list(range(n))
+    if n > MAX_BARRAS:
+        x = reduzir_minmax(vals, MAX_BARRAS)
+        vals = vals[x]
+    cors = ["#27ae60" if v >= 0 else "#e94560" for v in vals]
+
+    if n > MAX_BARRAS:
+        ax.vlines(x, 0, vals, colors=cors, linewidth=1.5)
+    else:
+        bars = ax.bar(x, vals, color=cors, width=0.6)
+    marcas, rotulos = _marcas_eixo(n, lbls)
+    ax.set_xticks(marcas)
+    ax.set_xticklabels(rotulos, fontsize=8)
     ax.axhline(0, color="#cccccc", linewidth=0.8)
     ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda v, _: f"{v:.0f}%"))
     ax.tick_params(axis="y", labelsize=8)
-    ax.set_title("Crescimento Mês a Mês (%)", fontsize=11,
+    ax.set_title(TITULOS_GRANULARIDADE[granularidade][1], fontsize=11,
                  fontweight="bold", color="#16213e", pad=10)
-    for bar, val in zip(bars, g.values):
-        offset = 1.2 if val >= 0 else -4
-        ax.text(bar.get_x() + bar.get_width() / 2,
-                bar.get_height() + offset,
-                f"{val:.1f}%", ha="center", va="bottom", fontsize=7)
+    if n <= MAX_ROTULOS:
+        for bar, val in zip(bars, vals):
+            offset = 1.2 if val >= 0 else -4
+            ax.text(bar.get_x() + bar.get_width() / 2,
+                    bar.get_height() + offset,
+                    f"{val:.1f}%", ha="center", va="bottom", fontsize=7)
     fig.tight_layout()
     return fig
 
 
-def chart_pizza_categorias():
+def chart_pizza_categorias(cat_receita):
     """Pizza de participação por categoria."""
     fig, ax = plt.subplots(figsize=(7, 6))
     wedges, _, autotexts = ax.pie(
@@ -166,7 +840,7 @@ def chart_pizza_categorias():
     return fig
 
 
-def chart_top_produtos():
+def chart_top_produtos(top5_prods):
     """Barras horizontais — top 5 produtos."""
     fig, ax = plt.subplots(figsize=(11, 3.5))
     prods = top5_prods.index.tolist()[::-1]
@@ -190,7 +864,7 @@ def chart_top_produtos():
     return fig
 
 
-def chart_vendedores():
+def chart_vendedores(vend_receita):
     """Barras de receita por vendedor."""
     fig, ax = plt.subplots(figsize=(8, 3.5))
     x    = list(range(len(vend_receita)))
@@ -212,7 +886,7 @@ def chart_vendedores():
     return fig
 
 
-def chart_regioes():
+def chart_regioes(reg_receita):
     """Barras de receita por região."""
     fig, ax = plt.subplots(figsize=(8, 3))
     x    = list(range(len(reg_receita)))
@@ -234,6 +908,124 @@ def chart_regioes():
     return fig
 
 
+def chart_comparativo_mensal(atual, anterior, rotulos, legendas):
+    """Receita mensal do período contra a do período comparado, mês a mês."""
+    fig, ax = plt.subplots(figsize=(13, 3.8))
+    x = list(range(len(atual)))
+    ax.plot(x, anterior.values / 1000, color="#90a4ae", linewidth=2, linestyle="--",
+            marker="o", markersize=4, label=legendas[1])
+    ax.plot(x, atual.values / 1000, color="#0f3460", linewidth=2.5, marker="o",
+            markersize=5, markerfacecolor="#e94560", markeredgewidth=0, label=legendas[0])
+    marcas, rotulos = _marcas_eixo(len(x), rotulos)
+    ax.set_xticks(marcas)
+    ax.set_xticklabels(rotulos, fontsize=8.5)
+    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda v, _: f"R${v:.0f}k"))
+    ax.tick_params(axis="y", labelsize=8)
+    ax.set_title("Receita Mensal × Período Comparado (R$ mil)", fontsize=11,
+                 fontweight="bold", color="#16213e", pad=10)
+    ax.legend(fontsize=8, frameon=False, loc="upper left")
+    ax.grid(axis="y", linestyle="--", alpha=0.35)
+    fig.tight_layout()
+    return fig
+
+
+# ── 2b. RENDERIZAÇÃO DOS GRÁFICOS (em paralelo) ──────────────────────────────
+def tarefas_graficos(ag, comparacao=None):
+    """Um job por gráfico: (função, séries agregadas, largura_cm, altura_cm).
+
+    Os jobs carregam só as séries pequenas que cada gráfico plota, então o
+    custo de enviá-los a outro processo é desprezível. Com `comparacao`
+    (`--compare`) entra também o gráfico do comparativo mensal.
+    """
+    tarefas = {
+        "tendencia_mensal":   (chart_tendencia_mensal,
+                               (ag.serie, ag.serie_rotulos, ag.granularidade), 17, 5.5),
+        "crescimento_mensal": (chart_crescimento_mensal,
+                               (ag.serie_crescimento, ag.serie_rotulos, ag.granularidade), 17, 4),
+        "pizza_categorias":   (chart_pizza_categorias, (ag.cat_receita,), 10, 8),
+        "top_produtos":       (chart_top_produtos, (ag.top5_prods,), 17, 5),
+        "vendedores":         (chart_vendedores, (ag.vend_receita,), 12, 5),
+        "regioes":            (chart_regioes, (ag.reg_receita,), 12, 4.5),
+    }
+    if comparacao is not None:
+        mensal = comparacao.mensal
+        tarefas["comparativo_mensal"] = (
+            chart_comparativo_mensal,
+            (mensal["atual"], mensal["anterior"], [m.strftime("%b/%y") for m in mensal.index],
+             (comparacao.periodo_atual, comparacao.periodo_anterior)), 17, 5.5)
+    return tarefas
+
+
+def renderizar_grafico(tarefa, formato="png"):
+    """Executa um job de gráfico e devolve os bytes no `formato` pedido."""
+    func, args, w, h = tarefa
+    return fig_to_bytes(func(*args), formato, w, h)
+
+
+def renderizar_grafico_medido(item, formato="png", tracemalloc=False):
+    """Como `renderizar_grafico`, para um par (nome, tarefa), medindo a execução.
+
+    Usada nos workers quando a instrumentação está ligada; devolve os
+    bytes e o registro da medição para o processo principal.
+    """
+    nome, tarefa = item
+    metricas = Metricas(tracemalloc=tracemalloc)
+    with metricas.etapa(f"graficos.{nome}"):
+        dados = renderizar_grafico(tarefa, formato)
+    return dados, metricas.registros[0]
+
+
+def renderizar_graficos(tarefas, workers=None, cache=None, formato="png", metricas=SEM_METRICAS):
+    """Renderiza todos os jobs e devolve {nome: flowable}.
+
+    Com `workers` > 1 os gráficos são renderizados num pool de processos;
+    cada worker devolve só os bytes do gráfico. A saída é idêntica à
+    renderização sequencial, apenas a ordem de execução muda. Com um
+    `CacheGraficos`, só os gráficos ausentes do cache são renderizados.
+    `formato` escolhe entre PNG (`Image`), desenho vetorial (`Drawing`)
+    e PNG de paleta (`indexed_images.ImagemIndexada`).
+    Com `metricas`, cada gráfico renderizado vira uma etapa "graficos.<nome>".
+    """
+    dados, chaves = {}, {}
+    if cache is not None:
+        for nome, (func, args, w, h) in tarefas.items():
+            chaves[nome] = cache.chave(func, args, w, h, formato, DPI_GRAFICOS,
+                                       matplotlib.rcParams)
+            em_cache = cache.obter(chaves[nome])
+            if em_cache is not None:
+                dados[nome] = em_cache
+
+    pendentes = [n for n in tarefas if n not in dados]
+    if workers is None:
+        workers = min(len(pendentes), os.cpu_count() or 1)
+    if workers <= 1:
+        novos = []
+        for nome in pendentes:
+            with metricas.etapa(f"graficos.{nome}"):
+                novos.append(renderizar_grafico(tarefas[nome], formato))
+    elif metricas is SEM_METRICAS:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            novos = list(pool.map(partial(renderizar_grafico, formato=formato),
+                                  [tarefas[n] for n in pendentes]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            medidos = list(pool.map(
+                partial(renderizar_grafico_medido, formato=formato, tracemalloc=metricas.tracemalloc),
+                [(n, tarefas[n]) for n in pendentes]))
+        novos = [dados for dados, _ in medidos]
+        for _, registro in medidos:
+            metricas.registrar(registro)
+    for nome, bruto in zip(pendentes, novos):
+        dados[nome] = bruto
+        if cache is not None:
+            cache.guardar(chaves[nome], bruto)
+
+    return {
+        nome: bytes_to_flowable(dados[nome], formato, tarefas[nome][2], tarefas[nome][3])
+        for nome in tarefas
+    }
+
+
 # ── 3. ESTILOS PDF ────────────────────────────────────────────────────────────
 _ss = getSampleStyleSheet()
 
@@ -286,352 +1078,1392 @@ def tabela_estilo(tem_total=False):
     return TableStyle(base)
 
 
+# Tabelas com mais linhas que isto são diagramadas como `TabelaLonga`
+LIMIAR_TABELA_LONGA = 100
+
+
 # ── 4. CANVAS COM NUMERAÇÃO DE PÁGINAS ───────────────────────────────────────
-class NumeradorPaginas(rl_canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        rl_canvas.Canvas.__init__(self, *args, **kwargs)
-        self._saved_page_states = []
+TITULO_PADRAO = "Relatório de Vendas"  # rodapé de quem não passa `titulo`
+
+class CanvasCompacto(rl_canvas.Canvas):
+    """Canvas que comprime o stream de cada página assim que ela termina."""
+
+    def showPage(self):
+        rl_canvas.Canvas.showPage(self)
+        self._comprimir_ultima_pagina()
+
+    def _comprimir_ultima_pagina(self):
+        # O ReportLab guarda o texto do stream e só o comprime no save;
+        # comprimir aqui deixa retido só o tamanho final da página no PDF.
+        pagina = self._doc.Pages.pages[-1]
+        if not (pagina.compression and pagina.stream):
+            return
+        filtros = ([pdfdoc.PDFBase85Encode, pdfdoc.PDFZCompress]
+                   if rl_config.useA85 else [pdfdoc.PDFZCompress])
+        conteudo = pagina.stream
+        for filtro in reversed(filtros):
+            conteudo = filtro.encode(conteudo)
+        stream = pdfdoc.PDFStream(content=conteudo)
+        stream.dictionary["Filter"] = pdfdoc.PDFArray(
+            [pdfdoc.PDFName(f.pdfname) for f in filtros])
+        stream.__Comment__ = "page stream"
+        pagina.Contents = stream
+        pagina.stream = None
+
+
+class NumeradorPaginas(CanvasCompacto):
+    """Canvas que escreve "Página X de Y" e grava cada página assim que ela termina.
+
+    O rodapé de cada página é só uma referência a um form XObject ainda
+    vazio, com o número já reservado no `DocumentoContinuo`; a página vai
+    para o destino (arquivo ou fluxo binário) e sai da memória. Os forms
+    são desenhados em `save`, quando o total de páginas já é conhecido.
+    `titulo` vai à esquerda do rodapé (veja `titulo_relatorio`).
+    """
+
+    def __init__(self, *args, titulo=TITULO_PADRAO, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.titulo = titulo
+        pdf_stream.DocumentoContinuo.de_canvas(self)
 
     def showPage(self):
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
+        atual = self.getPageNumber()
+        if atual > 1:  # capa sem rodapé
+            self._doc.reservar(self._doc.getXObjectName(f"rodape{atual}"))
+            self.doForm(f"rodape{atual}")
+        CanvasCompacto.showPage(self)
+        self._doc.gravar_prontos()
 
     def save(self):
-        total = len(self._saved_page_states)
-        for i, state in enumerate(self._saved_page_states):
-            self.__dict__.update(state)
-            if i > 0:  # capa sem rodapé
-                self._draw_footer(i + 1, total)
-            rl_canvas.Canvas.showPage(self)
+        total = self.getPageNumber() - 1
+        for atual in range(2, total + 1):
+            self.beginForm(f"rodape{atual}")
+            desenhar_rodape(self, atual, total, self.titulo)
+            self.endForm()
         rl_canvas.Canvas.save(self)
 
-    def _draw_footer(self, current, total):
-        self.saveState()
-        self.setFont("Helvetica", 7.5)
-        self.setFillColor(colors.HexColor("#aaaaaa"))
-        self.drawString(MARGEM, 1.3 * cm,
-                        "Relatório de Vendas 2024  |  Confidencial")
-        self.drawRightString(WIDTH - MARGEM, 1.3 * cm,
-                             f"Página {current} de {total}")
-        self.setStrokeColor(colors.HexColor("#dddddd"))
-        self.setLineWidth(0.5)
-        self.line(MARGEM, 1.6 * cm, WIDTH - MARGEM, 1.6 * cm)
-        self.restoreState()
 
+def desenhar_rodape(canvas, current, total, titulo=TITULO_PADRAO):
+    canvas.saveState()
+    canvas.setFont("Helvetica", 7.5)
+    canvas.setFillColor(colors.HexColor("#aaaaaa"))
+    canvas.drawString(MARGEM, 1.3 * cm, f"{titulo}  |  Confidencial")
+    canvas.drawRightString(WIDTH - MARGEM, 1.3 * cm,
+                           f"Página {current} de {total}")
+    canvas.setStrokeColor(colors.HexColor("#dddddd"))
+    canvas.setLineWidth(0.5)
+    canvas.line(MARGEM, 1.6 * cm, WIDTH - MARGEM, 1.6 * cm)
+    canvas.restoreState()
 
-# ── 5. CONSTRUÇÃO DO STORY ────────────────────────────────────────────────────
-story = []
 
-# ── CAPA ──────────────────────────────────────────────────────────────────────
-capa_header = Table(
-    [[Paragraph("RELATÓRIO DE VENDAS 2024", sTitle)]],
-    colWidths=[FULL_W],
-    rowHeights=[3.8 * cm],
-)
-capa_header.setStyle(TableStyle([
-    ("BACKGROUND", (0, 0), (-1, -1), AZUL_ESCURO),
-    ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
-    ("TOPPADDING", (0, 0), (-1, -1), 18),
-]))
-
-story.append(Spacer(1, 1.5 * cm))
-story.append(capa_header)
-story.append(Spacer(1, 0.4 * cm))
-story.append(Paragraph("Análise Completa de Desempenho Comercial", sCoverSub))
-story.append(Spacer(1, 0.15 * cm))
-story.append(Paragraph(
-    f"Período: Jan/2024 – Dez/2024  ·  Gerado em "
-    f"{datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-    sCoverDate,
-))
-story.append(Spacer(1, 0.8 * cm))
-story.append(HRFlowable(width="100%", thickness=1.5, color=AZUL_MEDIO))
-story.append(Spacer(1, 0.6 * cm))
-
-# Cards de KPIs
-cresc_str = f"+{crescimento_anual:.1f}%" if crescimento_anual >= 0 else f"{crescimento_anual:.1f}%"
-kpi_table = Table(
-    [
-        [Paragraph("RECEITA TOTAL",  sKpiLabel),
-         Paragraph("TRANSAÇÕES",     sKpiLabel),
-         Paragraph("TICKET MÉDIO",   sKpiLabel),
-         Paragraph("CRESCIMENTO\nJAN→DEZ", sKpiLabel)],
-        [Paragraph(f"R$ {total_geral / 1000:.1f}k", sKpiValue),
-         Paragraph(str(total_transacoes),            sKpiValue),
-         Paragraph(f"R$ {ticket_medio:,.0f}",        sKpiValue),
-         Paragraph(cresc_str,                         sKpiValue)],
-    ],
-    colWidths=[FULL_W / 4] * 4,
-    rowHeights=[0.75 * cm, 1.3 * cm],
-)
-kpi_table.setStyle(TableStyle([
-    ("BACKGROUND",    (0, 0), (-1, -1), AZUL_CLARO),
-    ("ALIGN",         (0, 0), (-1, -1), "CENTER"),
-    ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
-    ("TOPPADDING",    (0, 0), (-1, -1), 8),
-    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-    ("BOX",           (0, 0), (-1, -1), 0.5, colors.HexColor("#c0cfee")),
-    ("INNERGRID",     (0, 0), (-1, -1), 0.3, colors.HexColor("#c0cfee")),
-]))
-story.append(kpi_table)
-story.append(Spacer(1, 0.8 * cm))
-
-# Destaques do ano na capa
-melhor_mes_str = monthly.idxmax().strftime("%B/%Y")
-top_vendedor   = vend_receita.idxmax()
-melhor_cat     = cat_receita.idxmax()
-
-dest_rows = [
-    ["Destaque", "Detalhe", "Receita"],
-    ["Melhor Mês",       melhor_mes_str, f"R$ {monthly.max():,.2f}"],
-    ["Categoria Líder",  melhor_cat,     f"R$ {cat_receita.max():,.2f}"],
-    ["Top Vendedor",     top_vendedor,   f"R$ {vend_receita.max():,.2f}"],
-    ["Produto #1",       prod_receita.idxmax(),
-                         f"R$ {prod_receita.max():,.2f}"],
-]
-t_dest = Table(dest_rows, colWidths=[5 * cm, 7 * cm, 5 * cm])
-t_dest.setStyle(tabela_estilo())
-story.append(Paragraph("Destaques do Ano", sSection))
-story.append(t_dest)
-story.append(PageBreak())
-
-# ── SEÇÃO 1: EVOLUÇÃO MENSAL ──────────────────────────────────────────────────
-story.append(Paragraph("1. Evolução de Receita Mensal", sSection))
-story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
-story.append(Spacer(1, 0.3 * cm))
-story.append(fig_to_image(chart_tendencia_mensal(), 17, 5.5))
-story.append(Spacer(1, 0.4 * cm))
-story.append(fig_to_image(chart_crescimento_mensal(), 17, 4))
-story.append(Spacer(1, 0.5 * cm))
-
-story.append(Paragraph("Detalhamento Mensal", sSection))
-rows_mensal = [["Mês", "Receita", "Qtd Vendida", "Transações", "Crescimento MoM"]]
-for mes, receita in monthly.items():
-    label   = mes.strftime("%B/%Y").capitalize()
-    qtd_m   = int(df[df["mes"] == mes]["quantidade"].sum())
-    trans_m = int((df["mes"] == mes).sum())
-    growth  = monthly_growth[mes]
-    g_str   = f"{growth:+.1f}%" if pd.notna(growth) else "—"
-    rows_mensal.append([label, f"R$ {receita:,.2f}", f"{qtd_m:,}", str(trans_m), g_str])
-
-t_mensal = Table(rows_mensal,
-                 colWidths=[4.5 * cm, 4.5 * cm, 3.5 * cm, 2.5 * cm, 3.5 * cm])
-t_mensal.setStyle(tabela_estilo())
-story.append(t_mensal)
-story.append(PageBreak())
-
-# ── SEÇÃO 2: ANÁLISE POR CATEGORIA ───────────────────────────────────────────
-story.append(Paragraph("2. Análise por Categoria", sSection))
-story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
-story.append(Spacer(1, 0.3 * cm))
-
-# Pizza centralizada em largura total
-pizza_img = fig_to_image(chart_pizza_categorias(), 10, 8)
-pizza_centrado = Table(
-    [[pizza_img]],
-    colWidths=[FULL_W],
-)
-pizza_centrado.setStyle(TableStyle([
-    ("ALIGN",        (0, 0), (-1, -1), "CENTER"),
-    ("LEFTPADDING",  (0, 0), (-1, -1), 0),
-    ("RIGHTPADDING", (0, 0), (-1, -1), 0),
-]))
-story.append(pizza_centrado)
-story.append(Spacer(1, 0.4 * cm))
-
-# Tabela em largura total
-rows_cat = [["Categoria", "Receita", "% Total", "Qtd Vendida", "Ticket Médio"]]
-for cat in cat_receita.index:
-    pct = cat_receita[cat] / total_geral * 100
+# ── 5. CONSTRUÇÃO DO STORY ────────────────────────────────────────────────────
+class MarcoSecao(Flowable):
+    """Marcador invisível do início de uma seção no story.
+
+    Registra quando o `doc.build` começa a diagramar a seção e é onde
+    `dividir_secoes` corta o story. Usa `frameAction`, então o frame não
+    reserva espaço nem desenha nada e o PDF sai igual ao de um story sem
+    marcadores.
+    """
+
+    def __init__(self, metricas, nome):
+        super().__init__()
+        self.metricas = metricas
+        self.nome     = nome
+
+    def frameAction(self, frame):
+        self.metricas.marcar("pdf", self.nome)
+
+
+class TabelaLonga(Flowable):
+    """Tabela de milhares de linhas, cortada em blocos do tamanho da página.
+
+    Um `Table` do ReportLab recalcula a tabela inteira a cada quebra de
+    página (e guarda o estilo de cada célula), o que fica quadrático e
+    estoura a memória com dezenas de milhares de linhas. Aqui a altura de
+    uma linha é medida uma vez (as células são texto de uma linha só, então
+    todas têm a mesma altura), e `split` entrega um `Table` com o cabeçalho
+    e só as linhas que cabem no espaço restante, mais uma `TabelaLonga` com
+    o resto. Larguras e estilos são calculados uma vez e compartilhados.
+    O cabeçalho se repete em cada página; a linha de total (se
+    `tem_total`) fica no último bloco.
+    """
+
+    def __init__(self, linhas, larguras, tem_total=False, _medidas=None, _inicio=0):
+        super().__init__()
+        self.hAlign    = "CENTER"
+        self.linhas    = linhas  # compartilhada pelos pedaços, nunca copiada
+        self.larguras  = larguras
+        self.tem_total = tem_total
+        self._inicio   = _inicio  # 1ª linha do corpo ainda não diagramada
+        if _medidas is None:
+            amostra = Table(linhas[:2], colWidths=larguras)
+            amostra.setStyle(tabela_estilo())
+            amostra.wrap(sum(larguras), HEIGHT)
+            _medidas = {"cabecalho": amostra._rowHeights[0], "linha": amostra._rowHeights[1],
+                        "estilos": {}}
+        self._medidas = _medidas
+
+    def _restantes(self):
+        return len(self.linhas) - 1 - self._inicio
+
+    def _estilo(self, impar, total):
+        estilos = self._medidas["estilos"]
+        if (impar, total) not in estilos:
+            estilo = tabela_estilo(total)
+            if impar:
+                estilo.add("ROWBACKGROUNDS", (0, 1), (-1, -1), [CINZA_LINHA, colors.white])
+                if total:  # o fundo do total vem depois do das linhas
+                    estilo.add("BACKGROUND", (0, -1), (-1, -1), AZUL_CLARO)
+            estilos[impar, total] = estilo
+        return estilos[impar, total]
+
+    def _bloco(self, quantas):
+        total = self.tem_total and quantas == self._restantes()
+        primeira = 1 + self._inicio
+        tabela = Table([self.linhas[0]] + self.linhas[primeira:primeira + quantas],
+                       colWidths=self.larguras)
+        tabela.setStyle(self._estilo(self._inicio % 2 == 1, total))
+        return tabela
+
+    def wrap(self, largura_disp, altura_disp):
+        self.width  = sum(self.larguras)
+        self.height = self._medidas["cabecalho"] + self._restantes() * self._medidas["linha"]
+        return self.width, self.height
+
+    def split(self, largura_disp, altura_disp):
+        cabem = int((altura_disp - self._medidas["cabecalho"]) // self._medidas["linha"])
+        if cabem < 1:
+            return []  # nem o cabeçalho com uma linha: vai para a próxima página
+        if cabem >= self._restantes():
+            return [self._bloco(self._restantes())]
+        resto = TabelaLonga(self.linhas, self.larguras, self.tem_total,
+                            self._medidas, self._inicio + cabem)
+        return [self._bloco(cabem), resto]
+
+    def draw(self):
+        tabela = self._bloco(self._restantes())
+        tabela.wrapOn(self.canv, self.width, self.height)
+        tabela.drawOn(self.canv, 0, 0)
+
+
+def tabela(linhas, larguras, tem_total=False):
+    """`Table` com o estilo padrão; com muitas linhas, uma `TabelaLonga`."""
+    if len(linhas) - 1 > LIMIAR_TABELA_LONGA:
+        return TabelaLonga(linhas, larguras, tem_total)
+    t = Table(linhas, colWidths=larguras)
+    t.setStyle(tabela_estilo(tem_total=tem_total))
+    return t
+
+
+def _nota_esboco(esboco, n, itens):
+    """Texto das cotas de erro de um ranking aproximado (modo `--approx-top`)."""
+    if esboco.limite == 0:
+        return (f"Ranking calculado com um esboço Space-Saving de {esboco.capacidade:,} "
+                f"contadores sem descarte: a entrada não tem mais {itens} que isso, então "
+                f"os valores são exatos.")
+    erro, fora, garantida = esboco.cotas(n)
+    texto = (f"Ranking aproximado (Space-Saving, {esboco.capacidade:,} contadores): cada "
+             f"receita listada pode exceder a real em até R$ {erro:,.2f}, e nenhum dos "
+             f"demais {itens} passa de R$ {fora:,.2f}. ")
+    if garantida:
+        texto += f"Os {n} listados são com certeza os de maior receita."
+    else:
+        texto += "Itens com receita próxima ao corte podem ter ficado de fora da lista."
+    return texto + " Quantidades e transações de itens com erro são cotas inferiores."
+
+
+def _top_e_outros(serie, top):
+    """Índice dos `top` maiores de `serie` (já ordenada) e o dos demais."""
+    if top is None or len(serie) <= top + 1:
+        return serie.index, serie.index[:0]
+    return serie.index[:top], serie.index[top:]
+
+
+# Itens listados por dimensão no comparativo quando não há --top
+TOP_COMPARATIVO = 20
+
+
+def _fmt_variacao(atual, anterior):
+    """Variação percentual formatada; "novo" se o anterior é zero, "—" sem par."""
+    if pd.isna(anterior):
+        return "—"
+    if anterior <= 0:
+        return "novo" if atual > 0 else "—"
+    return f"{(atual / anterior - 1) * 100:+.1f}%"
+
+
+def _linhas_comparativo(tabela_dim, rotulo, periodos, top=None):
+    """Linhas de uma dimensão no comparativo: receita atual, anterior e variação."""
+    linhas = [[rotulo, *periodos, "Variação"]]
+    itens, outros = _top_e_outros(tabela_dim["atual"], top)
+    for item, atual, anterior in zip(itens, tabela_dim["atual"].reindex(itens).tolist(),
+                                     tabela_dim["anterior"].reindex(itens).tolist()):
+        linhas.append([item, f"R$ {atual:,.2f}", f"R$ {anterior:,.2f}",
+                       _fmt_variacao(atual, anterior)])
+    grupos = [(f"Outros ({len(outros):,})", tabela_dim.loc[outros])] if len(outros) else []
+    for nome, parte in grupos + [("TOTAL", tabela_dim)]:
+        atual, anterior = parte["atual"].sum(), parte["anterior"].sum()
+        linhas.append([nome, f"R$ {atual:,.2f}", f"R$ {anterior:,.2f}",
+                       _fmt_variacao(atual, anterior)])
+    return linhas
+
+
+# Grafo de dependências do story: o que cada seção lê dos agregados (atributos
+# de `Agregados`) e das opções de `montar_story`. A chave de uma seção no
+# cache de seções é o hash só destes valores; ao mudar o que uma seção
+# mostra, mude também a lista dela.
+DEPENDENCIAS_SECOES = {
+    "capa":       ["total_geral", "total_transacoes", "ticket_medio", "crescimento_anual",
+                   "monthly", "cat_receita", "vend_receita", "prod_receita",
+                   "recorte", "empresa", "gerado_em", "comparacao"],
+    "mensal":     ["monthly", "monthly_qtd", "monthly_trans", "monthly_growth",
+                   "serie", "serie_rotulos", "serie_crescimento", "granularidade"],
+    "categorias": ["total_geral", "ticket_medio", "qtd_total",
+                   "cat_receita", "cat_qtd", "cat_ticket"],
+    "produtos":   ["total_geral", "ticket_medio", "qtd_total",
+                   "prod_receita", "prod_qtd", "prod_categoria", "top5_prods", "top", "esbocos"],
+    "vendedores": ["total_geral", "total_transacoes", "ticket_medio", "cat_receita",
+                   "vend_receita", "vend_transacoes", "vend_ticket", "pivot_vc", "top",
+                   "esbocos"],
+    "regioes":    ["total_geral", "total_transacoes", "qtd_total", "cat_receita",
+                   "reg_receita", "reg_qtd", "reg_transacoes", "pivot_rc",
+                   "data_min", "data_max", "fonte"],
+    "comparativo": ["comparacao", "top"],
+}
+
+
+def entradas_secoes(ag, **opcoes):
+    """{seção: [valores de que ela depende]}, segundo `DEPENDENCIAS_SECOES`.
+
+    `opcoes` traz os argumentos de `montar_story` que entram no grafo
+    (fonte, recorte, empresa, top, gerado_em, comparacao); o resto vem de `ag`.
+    """
+    def valor(nome):
+        return opcoes[nome] if nome in opcoes else getattr(ag, nome)
+
+    return {secao: [valor(nome) for nome in nomes]
+            for secao, nomes in DEPENDENCIAS_SECOES.items()}
+
+
+def montar_story(ag, fonte=ARQUIVO_ENTRADA, imagens=None, recorte=None, empresa=None,
+                 metricas=SEM_METRICAS, top=None, gerado_em=None, comparacao=None):
+    """Monta a lista de flowables do relatório a partir dos agregados.
+
+    `imagens` são os gráficos já renderizados por `renderizar_graficos`;
+    se omitido, são renderizados aqui mesmo, em sequência. Em relatórios
+    de um recorte (um vendedor, uma região), `recorte` é o rótulo exibido
+    na capa e `empresa` traz os KPIs da empresa inteira para comparação.
+    Cada seção começa com um `MarcoSecao`; com `metricas`, a montagem e a
+    diagramação de cada seção são medidas como "story.<seção>" e
+    "pdf.<seção>". Com `top`, as tabelas de
+    produtos e vendedores listam só os `top` maiores e somam os demais
+    numa linha "Outros". `gerado_em` é o instante impresso na capa
+    (padrão: agora). Com `comparacao` (`period_comparison.Comparacao`) a
+    capa ganha os KPIs do período comparado e o relatório uma seção
+    "Comparativo" com as variações por mês e por dimensão.
+    """
+    if imagens is None:
+        imagens = renderizar_graficos(tarefas_graficos(ag, comparacao), workers=1)
+    story = []
+
+    def secao(nome):
+        metricas.marcar("story", nome)
+        story.append(MarcoSecao(metricas, nome))
+
+    secao("capa")
+
+    # ── CAPA ──────────────────────────────────────────────────────────────────
+    primeiro, ultimo = ag.monthly.index[0], ag.monthly.index[-1]
+    capa_header = Table(
+        [[Paragraph(titulo_relatorio(ag.monthly.index).upper(), sTitle)]],
+        colWidths=[FULL_W],
+        rowHeights=[3.8 * cm],
+    )
+    capa_header.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), AZUL_ESCURO),
+        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+        ("TOPPADDING", (0, 0), (-1, -1), 18),
+    ]))
+
+    story.append(Spacer(1, 1.5 * cm))
+    story.append(capa_header)
+    story.append(Spacer(1, 0.4 * cm))
+    story.append(Paragraph(recorte or "Análise Completa de Desempenho Comercial", sCoverSub))
+    story.append(Spacer(1, 0.15 * cm))
+    story.append(Paragraph(
+        f"Período: {rotulo_intervalo(ag.monthly.index)}  ·  Gerado em "
+        f"{(gerado_em or datetime.now()).strftime('%d/%m/%Y às %H:%M')}",
+        sCoverDate,
+    ))
+    story.append(Spacer(1, 0.8 * cm))
+    story.append(HRFlowable(width="100%", thickness=1.5, color=AZUL_MEDIO))
+    story.append(Spacer(1, 0.6 * cm))
+
+    # Cards de KPIs
+    crescimento_anual = ag.crescimento_anual
+    cresc_str = f"+{crescimento_anual:.1f}%" if crescimento_anual >= 0 else f"{crescimento_anual:.1f}%"
+    mesmo_ano = primeiro.year == ultimo.year
+    cresc_label = (f"CRESCIMENTO\n{rotulo_mes(primeiro, not mesmo_ano).upper()}→"
+                   f"{rotulo_mes(ultimo, not mesmo_ano).upper()}")
+    kpi_table = Table(
+        [
+            [Paragraph("RECEITA TOTAL",  sKpiLabel),
+             Paragraph("TRANSAÇÕES",     sKpiLabel),
+             Paragraph("TICKET MÉDIO",   sKpiLabel),
+             Paragraph(cresc_label, sKpiLabel)],
+            [Paragraph(f"R$ {ag.total_geral / 1000:.1f}k", sKpiValue),
+             Paragraph(str(ag.total_transacoes),            sKpiValue),
+             Paragraph(f"R$ {ag.ticket_medio:,.0f}",        sKpiValue),
+             Paragraph(cresc_str,                            sKpiValue)],
+        ],
+        colWidths=[FULL_W / 4] * 4,
+        rowHeights=[0.75 * cm, 1.3 * cm],
+    )
+    kpi_table.setStyle(TableStyle([
+        ("BACKGROUND",    (0, 0), (-1, -1), AZUL_CLARO),
+        ("ALIGN",         (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+        ("TOPPADDING",    (0, 0), (-1, -1), 8),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+        ("BOX",           (0, 0), (-1, -1), 0.5, colors.HexColor("#c0cfee")),
+        ("INNERGRID",     (0, 0), (-1, -1), 0.3, colors.HexColor("#c0cfee")),
+    ]))
+    story.append(kpi_table)
+    story.append(Spacer(1, 0.8 * cm))
+
+    if empresa is not None:
+        comp_rows = [
+            ["Comparativo", "Recorte", "Empresa", "Participação"],
+            ["Receita", f"R$ {ag.total_geral:,.2f}", f"R$ {empresa['total_geral']:,.2f}",
+             f"{ag.total_geral / empresa['total_geral'] * 100:.1f}%"],
+            ["Transações", str(ag.total_transacoes), str(empresa["total_transacoes"]),
+             f"{ag.total_transacoes / empresa['total_transacoes'] * 100:.1f}%"],
+            ["Ticket Médio", f"R$ {ag.ticket_medio:,.2f}", f"R$ {empresa['ticket_medio']:,.2f}",
+             f"{ag.ticket_medio / empresa['ticket_medio'] * 100:.0f}%"],
+        ]
+        t_comp = Table(comp_rows, colWidths=[4 * cm, 4.5 * cm, 4.5 * cm, 4 * cm])
+        t_comp.setStyle(tabela_estilo())
+        story.append(Paragraph("Comparativo com a Empresa", sSection))
+        story.append(t_comp)
+        story.append(Spacer(1, 0.4 * cm))
+
+    if comparacao is not None:
+        formatos = {"Receita": "R$ {:,.2f}", "Transações": "{:,.0f}",
+                    "Ticket Médio": "R$ {:,.2f}", "Qtd Vendida": "{:,.0f}"}
+        per_rows = [["Indicador", comparacao.periodo_atual, comparacao.periodo_anterior,
+                     "Variação"]]
+        for nome, atual, anterior in comparacao.kpis.itertuples():
+            per_rows.append([nome, formatos[nome].format(atual), formatos[nome].format(anterior),
+                             _fmt_variacao(atual, anterior)])
+        t_per = Table(per_rows, colWidths=[4 * cm, 4.5 * cm, 4.5 * cm, 4 * cm])
+        t_per.setStyle(tabela_estilo())
+        story.append(Paragraph(f"Comparativo com {comparacao.periodo_anterior}", sSection))
+        story.append(t_per)
+        story.append(Spacer(1, 0.4 * cm))
+
+    # Destaques do ano na capa
+    melhor_mes_str = ag.monthly.idxmax().strftime("%B/%Y")
+    top_vendedor   = ag.vend_receita.idxmax()
+    melhor_cat     = ag.cat_receita.idxmax()
+
+    dest_rows = [
+        ["Destaque", "Detalhe", "Receita"],
+        ["Melhor Mês",       melhor_mes_str, f"R$ {ag.monthly.max():,.2f}"],
+        ["Categoria Líder",  melhor_cat,     f"R$ {ag.cat_receita.max():,.2f}"],
+        ["Top Vendedor",     top_vendedor,   f"R$ {ag.vend_receita.max():,.2f}"],
+        ["Produto #1",       ag.prod_receita.idxmax(),
+                             f"R$ {ag.prod_receita.max():,.2f}"],
+    ]
+    t_dest = Table(dest_rows, colWidths=[5 * cm, 7 * cm, 5 * cm])
+    t_dest.setStyle(tabela_estilo())
+    story.append(Paragraph("Destaques do Ano", sSection))
+    story.append(t_dest)
+    story.append(PageBreak())
+
+    # ── SEÇÃO 1: EVOLUÇÃO MENSAL ──────────────────────────────────────────────
+    secao("mensal")
+    story.append(Paragraph("1. Evolução de Receita Mensal", sSection))
+    story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
+    story.append(Spacer(1, 0.3 * cm))
+    story.append(imagens["tendencia_mensal"])
+    story.append(Spacer(1, 0.4 * cm))
+    story.append(imagens["crescimento_mensal"])
+    story.append(Spacer(1, 0.5 * cm))
+
+    story.append(Paragraph("Detalhamento Mensal", sSection))
+    rows_mensal = [["Mês", "Receita", "Qtd Vendida", "Transações", "Crescimento MoM"]]
+    for mes, receita in ag.monthly.items():
+        label   = mes.strftime("%B/%Y").capitalize()
+        qtd_m   = int(ag.monthly_qtd[mes])
+        trans_m = int(ag.monthly_trans[mes])
+        growth  = ag.monthly_growth[mes]
+        g_str   = f"{growth:+.1f}%" if pd.notna(growth) else "—"
+        rows_mensal.append([label, f"R$ {receita:,.2f}", f"{qtd_m:,}", str(trans_m), g_str])
+
+    story.append(tabela(rows_mensal, [4.5 * cm, 4.5 * cm, 3.5 * cm, 2.5 * cm, 3.5 * cm]))
+    story.append(PageBreak())
+
+    # ── SEÇÃO 2: ANÁLISE POR CATEGORIA ───────────────────────────────────────
+    secao("categorias")
+    story.append(Paragraph("2. Análise por Categoria", sSection))
+    story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
+    story.append(Spacer(1, 0.3 * cm))
+
+    # Pizza centralizada em largura total
+    pizza_img = imagens["pizza_categorias"]
+    pizza_centrado = Table(
+        [[pizza_img]],
+        colWidths=[FULL_W],
+    )
+    pizza_centrado.setStyle(TableStyle([
+        ("ALIGN",        (0, 0), (-1, -1), "CENTER"),
+        ("LEFTPADDING",  (0, 0), (-1, -1), 0),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+    ]))
+    story.append(pizza_centrado)
+    story.append(Spacer(1, 0.4 * cm))
+
+    # Tabela em largura total
+    rows_cat = [["Categoria", "Receita", "% Total", "Qtd Vendida", "Ticket Médio"]]
+    for cat in ag.cat_receita.index:
+        pct = ag.cat_receita[cat] / ag.total_geral * 100
+        rows_cat.append([
+            cat,
+            f"R$ {ag.cat_receita[cat]:,.2f}",
+            f"{pct:.1f}%",
+            f"{int(ag.cat_qtd[cat]):,}",
+            f"R$ {ag.cat_ticket[cat]:,.2f}",
+        ])
     rows_cat.append([
-        cat,
-        f"R$ {cat_receita[cat]:,.2f}",
-        f"{pct:.1f}%",
-        f"{int(cat_qtd[cat]):,}",
-        f"R$ {cat_ticket[cat]:,.2f}",
+        "TOTAL",
+        f"R$ {ag.total_geral:,.2f}",
+        "100%",
+        f"{int(ag.qtd_total):,}",
+        f"R$ {ag.ticket_medio:,.2f}",
     ])
-rows_cat.append([
-    "TOTAL",
-    f"R$ {total_geral:,.2f}",
-    "100%",
-    f"{int(qtd_total):,}",
-    f"R$ {ticket_medio:,.2f}",
-])
-t_cat = Table(rows_cat,
-              colWidths=[4.5 * cm, 4 * cm, 2.5 * cm, 2.5 * cm, 3.5 * cm])
-t_cat.setStyle(tabela_estilo(tem_total=True))
-story.append(t_cat)
-story.append(PageBreak())
-
-# ── SEÇÃO 3: PERFORMANCE DE PRODUTOS ─────────────────────────────────────────
-story.append(Paragraph("3. Performance de Produtos", sSection))
-story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
-story.append(Spacer(1, 0.3 * cm))
-story.append(fig_to_image(chart_top_produtos(), 17, 5))
-story.append(Spacer(1, 0.5 * cm))
-
-rows_prod = [["Produto", "Categoria", "Receita", "Qtd", "Ticket Médio", "% Total"]]
-for prod in prod_receita.index:
-    cat_p    = df[df["produto"] == prod]["categoria"].iloc[0]
-    qtd_p    = int(prod_qtd[prod])
-    ticket_p = prod_receita[prod] / qtd_p
-    pct_p    = prod_receita[prod] / total_geral * 100
+    t_cat = Table(rows_cat,
+                  colWidths=[4.5 * cm, 4 * cm, 2.5 * cm, 2.5 * cm, 3.5 * cm])
+    t_cat.setStyle(tabela_estilo(tem_total=True))
+    story.append(t_cat)
+    story.append(PageBreak())
+
+    # ── SEÇÃO 3: PERFORMANCE DE PRODUTOS ─────────────────────────────────────
+    secao("produtos")
+    story.append(Paragraph("3. Performance de Produtos", sSection))
+    story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
+    story.append(Spacer(1, 0.3 * cm))
+    story.append(imagens["top_produtos"])
+    story.append(Spacer(1, 0.5 * cm))
+
+    rows_prod = [["Produto", "Categoria", "Receita", "Qtd", "Ticket Médio", "% Total"]]
+    prods, outros = _top_e_outros(ag.prod_receita, top)
+    # por posição e não por rótulo: com dezenas de milhares de produtos
+    # o acesso célula a célula às Series domina a montagem
+    for prod, cat_p, receita_p, qtd_p in zip(
+            prods, ag.prod_categoria.reindex(prods), ag.prod_receita.reindex(prods).tolist(),
+            ag.prod_qtd.reindex(prods).tolist()):
+        qtd_p    = int(qtd_p)
+        ticket_p = receita_p / qtd_p
+        pct_p    = receita_p / ag.total_geral * 100
+        rows_prod.append([
+            prod, cat_p,
+            f"R$ {receita_p:,.2f}",
+            f"{qtd_p:,}",
+            f"R$ {ticket_p:,.2f}",
+            f"{pct_p:.1f}%",
+        ])
+    aproximado = ag.esbocos is not None
+    if aproximado:
+        # o resto é o que falta aos listados para chegar aos totais exatos
+        receita_o = ag.total_geral - ag.prod_receita.sum()
+        qtd_o     = int(ag.qtd_total - ag.prod_qtd.sum())
+        rotulo_o  = "Outros (demais produtos)"
+    elif len(outros):
+        receita_o = ag.prod_receita[outros].sum()
+        qtd_o     = int(ag.prod_qtd[outros].sum())
+        rotulo_o  = f"Outros ({len(outros):,} produtos)"
+    if (aproximado and qtd_o > 0) or len(outros):
+        rows_prod.append([
+            rotulo_o, "—",
+            f"R$ {receita_o:,.2f}",
+            f"{qtd_o:,}",
+            f"R$ {receita_o / qtd_o:,.2f}",
+            f"{receita_o / ag.total_geral * 100:.1f}%",
+        ])
     rows_prod.append([
-        prod, cat_p,
-        f"R$ {prod_receita[prod]:,.2f}",
-        f"{qtd_p:,}",
-        f"R$ {ticket_p:,.2f}",
-        f"{pct_p:.1f}%",
+        "TOTAL", "—",
+        f"R$ {ag.total_geral:,.2f}",
+        f"{int(ag.qtd_total):,}",
+        f"R$ {ag.ticket_medio:,.2f}",
+        "100%",
     ])
-rows_prod.append([
-    "TOTAL", "—",
-    f"R$ {total_geral:,.2f}",
-    f"{int(qtd_total):,}",
-    f"R$ {ticket_medio:,.2f}",
-    "100%",
-])
-t_prod = Table(rows_prod,
-               colWidths=[4.5 * cm, 2.8 * cm, 3.2 * cm, 2 * cm, 2.8 * cm, 1.7 * cm])
-t_prod.setStyle(tabela_estilo(tem_total=True))
-story.append(t_prod)
-story.append(PageBreak())
-
-# ── SEÇÃO 4: PERFORMANCE DE VENDEDORES ───────────────────────────────────────
-story.append(Paragraph("4. Performance de Vendedores", sSection))
-story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
-story.append(Spacer(1, 0.3 * cm))
-story.append(fig_to_image(chart_vendedores(), 12, 5))
-story.append(Spacer(1, 0.5 * cm))
-
-rows_vend = [["#", "Vendedor", "Receita", "Transações", "Ticket Médio", "% Total"]]
-for i, (vend, receita) in enumerate(vend_receita.items(), 1):
+    story.append(tabela(rows_prod, [4.5 * cm, 2.8 * cm, 3.2 * cm, 2 * cm, 2.8 * cm, 1.7 * cm],
+                        tem_total=True))
+    if aproximado:
+        story.append(Spacer(1, 0.2 * cm))
+        story.append(Paragraph(_nota_esboco(ag.esbocos["produto"], len(prods), "produtos"),
+                               sBody))
+    story.append(PageBreak())
+
+    # ── SEÇÃO 4: PERFORMANCE DE VENDEDORES ───────────────────────────────────
+    secao("vendedores")
+    story.append(Paragraph("4. Performance de Vendedores", sSection))
+    story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
+    story.append(Spacer(1, 0.3 * cm))
+    story.append(imagens["vendedores"])
+    story.append(Spacer(1, 0.5 * cm))
+
+    rows_vend = [["#", "Vendedor", "Receita", "Transações", "Ticket Médio", "% Total"]]
+    vends, outros = _top_e_outros(ag.vend_receita, top)
+    for i, (vend, receita, trans_v, ticket_v) in enumerate(zip(
+            vends, ag.vend_receita.reindex(vends).tolist(),
+            ag.vend_transacoes.reindex(vends).tolist(),
+            ag.vend_ticket.reindex(vends).tolist()), 1):
+        rows_vend.append([
+            str(i), vend,
+            f"R$ {receita:,.2f}",
+            str(int(trans_v)),
+            f"R$ {ticket_v:,.2f}",
+            f"{receita / ag.total_geral * 100:.1f}%",
+        ])
+    if aproximado:
+        receita_o = ag.total_geral - ag.vend_receita.sum()
+        trans_o   = int(ag.total_transacoes - ag.vend_transacoes.sum())
+        rotulo_o  = "Outros (demais vendedores)"
+    elif len(outros):
+        receita_o = ag.vend_receita[outros].sum()
+        trans_o   = int(ag.vend_transacoes[outros].sum())
+        rotulo_o  = f"Outros ({len(outros):,} vendedores)"
+    if (aproximado and trans_o > 0) or len(outros):
+        rows_vend.append([
+            "", rotulo_o,
+            f"R$ {receita_o:,.2f}",
+            str(trans_o),
+            f"R$ {receita_o / trans_o:,.2f}",
+            f"{receita_o / ag.total_geral * 100:.1f}%",
+        ])
     rows_vend.append([
-        str(i), vend,
-        f"R$ {receita:,.2f}",
-        str(int(vend_transacoes[vend])),
-        f"R$ {vend_ticket[vend]:,.2f}",
-        f"{receita / total_geral * 100:.1f}%",
+        "", "TOTAL",
+        f"R$ {ag.total_geral:,.2f}",
+        str(ag.total_transacoes),
+        f"R$ {ag.ticket_medio:,.2f}",
+        "100%",
     ])
-rows_vend.append([
-    "", "TOTAL",
-    f"R$ {total_geral:,.2f}",
-    str(total_transacoes),
-    f"R$ {ticket_medio:,.2f}",
-    "100%",
-])
-t_vend = Table(rows_vend,
-               colWidths=[1 * cm, 4 * cm, 3.8 * cm, 2.5 * cm, 3.5 * cm, 2.2 * cm])
-t_vend.setStyle(tabela_estilo(tem_total=True))
-story.append(t_vend)
-
-# Pivot vendedor × categoria
-story.append(Spacer(1, 0.5 * cm))
-story.append(Paragraph("Receita por Vendedor × Categoria", sSection))
-pivot_vc  = df.pivot_table(
-    values="total", index="vendedor",
-    columns="categoria", aggfunc="sum", fill_value=0,
-)
-cats_vc   = list(pivot_vc.columns)
-n_vc      = len(cats_vc)
-cat_w     = (FULL_W - 4.5 * cm - 2.5 * cm) / n_vc
-rows_pv   = [["Vendedor"] + cats_vc + ["Total"]]
-for vend in pivot_vc.index:
-    linha = [vend]
+    story.append(tabela(rows_vend, [1 * cm, 4 * cm, 3.8 * cm, 2.5 * cm, 3.5 * cm, 2.2 * cm],
+                        tem_total=True))
+    if aproximado:
+        story.append(Spacer(1, 0.2 * cm))
+        story.append(Paragraph(_nota_esboco(ag.esbocos["vendedor"], len(vends), "vendedores"),
+                               sBody))
+
+    # Pivot vendedor × categoria
+    story.append(Spacer(1, 0.5 * cm))
+    story.append(Paragraph("Receita por Vendedor × Categoria", sSection))
+    pivot_vc  = ag.pivot_vc
+    cats_vc   = list(pivot_vc.columns)
+    n_vc      = len(cats_vc)
+    cat_w     = (FULL_W - 4.5 * cm - 2.5 * cm) / n_vc
+    rows_pv   = [["Vendedor"] + cats_vc + ["Total"]]
+    if len(outros):
+        pivot_vc = pivot_vc[pivot_vc.index.isin(vends)]
+    for vend, valores, total_v in zip(pivot_vc.index, pivot_vc.to_numpy().tolist(),
+                                      ag.vend_receita.reindex(pivot_vc.index).tolist()):
+        linha = [vend]
+        for valor in valores:
+            linha.append(f"R${valor / 1000:.1f}k")
+        linha.append(f"R${total_v / 1000:.1f}k")
+        rows_pv.append(linha)
+    if (aproximado and trans_o > 0) or len(outros):
+        if aproximado:
+            resto = ag.cat_receita.reindex(cats_vc) - pivot_vc.sum()
+            resto_total = ag.total_geral - ag.vend_receita.sum()
+            rotulo_o = "Outros"
+        else:
+            resto = ag.pivot_vc.loc[outros, cats_vc].sum()
+            resto_total = ag.vend_receita[outros].sum()
+            rotulo_o = f"Outros ({len(outros):,})"
+        rows_pv.append([rotulo_o]
+                       + [f"R${resto[cat] / 1000:.1f}k" for cat in cats_vc]
+                       + [f"R${resto_total / 1000:.1f}k"])
+    tot_pv = ["TOTAL"]
     for cat in cats_vc:
-        linha.append(f"R${pivot_vc.loc[vend, cat] / 1000:.1f}k")
-    linha.append(f"R${vend_receita[vend] / 1000:.1f}k")
-    rows_pv.append(linha)
-tot_pv = ["TOTAL"]
-for cat in cats_vc:
-    tot_pv.append(f"R${cat_receita[cat] / 1000:.1f}k")
-tot_pv.append(f"R${total_geral / 1000:.1f}k")
-rows_pv.append(tot_pv)
-
-t_pv = Table(rows_pv,
-             colWidths=[4.5 * cm] + [cat_w] * n_vc + [2.5 * cm])
-t_pv.setStyle(tabela_estilo(tem_total=True))
-story.append(t_pv)
-story.append(PageBreak())
-
-# ── SEÇÃO 5: ANÁLISE REGIONAL ─────────────────────────────────────────────────
-story.append(Paragraph("5. Análise Regional", sSection))
-story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
-story.append(Spacer(1, 0.3 * cm))
-story.append(fig_to_image(chart_regioes(), 12, 4.5))
-story.append(Spacer(1, 0.5 * cm))
-
-rows_reg = [["Região", "Receita", "% Total", "Qtd Vendida", "Transações"]]
-for reg in reg_receita.index:
-    pct_r   = reg_receita[reg] / total_geral * 100
-    qtd_r   = int(reg_qtd[reg])
-    trans_r = int((df["regiao"] == reg).sum())
+        tot_pv.append(f"R${ag.cat_receita[cat] / 1000:.1f}k")
+    tot_pv.append(f"R${ag.total_geral / 1000:.1f}k")
+    rows_pv.append(tot_pv)
+
+    story.append(tabela(rows_pv, [4.5 * cm] + [cat_w] * n_vc + [2.5 * cm], tem_total=True))
+    story.append(PageBreak())
+
+    # ── SEÇÃO 5: ANÁLISE REGIONAL ─────────────────────────────────────────────
+    secao("regioes")
+    story.append(Paragraph("5. Análise Regional", sSection))
+    story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
+    story.append(Spacer(1, 0.3 * cm))
+    story.append(imagens["regioes"])
+    story.append(Spacer(1, 0.5 * cm))
+
+    rows_reg = [["Região", "Receita", "% Total", "Qtd Vendida", "Transações"]]
+    for reg in ag.reg_receita.index:
+        pct_r   = ag.reg_receita[reg] / ag.total_geral * 100
+        qtd_r   = int(ag.reg_qtd[reg])
+        trans_r = int(ag.reg_transacoes[reg])
+        rows_reg.append([
+            reg,
+            f"R$ {ag.reg_receita[reg]:,.2f}",
+            f"{pct_r:.1f}%",
+            f"{qtd_r:,}",
+            str(trans_r),
+        ])
     rows_reg.append([
-        reg,
-        f"R$ {reg_receita[reg]:,.2f}",
-        f"{pct_r:.1f}%",
-        f"{qtd_r:,}",
-        str(trans_r),
+        "TOTAL",
+        f"R$ {ag.total_geral:,.2f}",
+        "100%",
+        f"{int(ag.qtd_total):,}",
+        str(ag.total_transacoes),
     ])
-rows_reg.append([
-    "TOTAL",
-    f"R$ {total_geral:,.2f}",
-    "100%",
-    f"{int(qtd_total):,}",
-    str(total_transacoes),
-])
-t_reg = Table(rows_reg,
-              colWidths=[4.5 * cm, 4.5 * cm, 2.5 * cm, 3 * cm, 2.5 * cm])
-t_reg.setStyle(tabela_estilo(tem_total=True))
-story.append(t_reg)
-
-# Pivot região × categoria
-story.append(Spacer(1, 0.5 * cm))
-story.append(Paragraph("Receita por Região × Categoria", sSection))
-pivot_rc = df.pivot_table(
-    values="total", index="regiao",
-    columns="categoria", aggfunc="sum", fill_value=0,
-)
-cats_rc  = list(pivot_rc.columns)
-n_rc     = len(cats_rc)
-cat_w2   = (FULL_W - 4.5 * cm - 2.5 * cm) / n_rc
-rows_prc = [["Região"] + cats_rc + ["Total"]]
-for reg in pivot_rc.index:
-    linha = [reg]
+    t_reg = Table(rows_reg,
+                  colWidths=[4.5 * cm, 4.5 * cm, 2.5 * cm, 3 * cm, 2.5 * cm])
+    t_reg.setStyle(tabela_estilo(tem_total=True))
+    story.append(t_reg)
+
+    # Pivot região × categoria
+    story.append(Spacer(1, 0.5 * cm))
+    story.append(Paragraph("Receita por Região × Categoria", sSection))
+    pivot_rc = ag.pivot_rc
+    cats_rc  = list(pivot_rc.columns)
+    n_rc     = len(cats_rc)
+    cat_w2   = (FULL_W - 4.5 * cm - 2.5 * cm) / n_rc
+    rows_prc = [["Região"] + cats_rc + ["Total"]]
+    for reg in pivot_rc.index:
+        linha = [reg]
+        for cat in cats_rc:
+            linha.append(f"R${pivot_rc.loc[reg, cat] / 1000:.1f}k")
+        linha.append(f"R${ag.reg_receita[reg] / 1000:.1f}k")
+        rows_prc.append(linha)
+    tot_rc = ["TOTAL"]
     for cat in cats_rc:
-        linha.append(f"R${pivot_rc.loc[reg, cat] / 1000:.1f}k")
-    linha.append(f"R${reg_receita[reg] / 1000:.1f}k")
-    rows_prc.append(linha)
-tot_rc = ["TOTAL"]
-for cat in cats_rc:
-    tot_rc.append(f"R${cat_receita[cat] / 1000:.1f}k")
-tot_rc.append(f"R${total_geral / 1000:.1f}k")
-rows_prc.append(tot_rc)
-
-t_prc = Table(rows_prc,
-              colWidths=[4.5 * cm] + [cat_w2] * n_rc + [2.5 * cm])
-t_prc.setStyle(tabela_estilo(tem_total=True))
-story.append(t_prc)
-
-# Rodapé final
-story.append(Spacer(1, 1 * cm))
-story.append(HRFlowable(width="100%", thickness=0.5,
-                         color=colors.HexColor("#cccccc")))
-story.append(Spacer(1, 0.3 * cm))
-story.append(Paragraph(
-    f"Período: {df['data'].min().strftime('%d/%m/%Y')} a "
-    f"{df['data'].max().strftime('%d/%m/%Y')}  |  "
-    f"Fonte: sales_data.csv  |  Gerado por generate_report.py",
-    sFooter,
-))
+        tot_rc.append(f"R${ag.cat_receita[cat] / 1000:.1f}k")
+    tot_rc.append(f"R${ag.total_geral / 1000:.1f}k")
+    rows_prc.append(tot_rc)
+
+    t_prc = Table(rows_prc,
+                  colWidths=[4.5 * cm] + [cat_w2] * n_rc + [2.5 * cm])
+    t_prc.setStyle(tabela_estilo(tem_total=True))
+    story.append(t_prc)
+
+    # Rodapé final
+    story.append(Spacer(1, 1 * cm))
+    story.append(HRFlowable(width="100%", thickness=0.5,
+                             color=colors.HexColor("#cccccc")))
+    story.append(Spacer(1, 0.3 * cm))
+    story.append(Paragraph(
+        f"Período: {ag.data_min.strftime('%d/%m/%Y')} a "
+        f"{ag.data_max.strftime('%d/%m/%Y')}  |  "
+        f"Fonte: {fonte}  |  Gerado por generate_report.py",
+        sFooter,
+    ))
+
+    # ── SEÇÃO 6: COMPARATIVO COM OUTRO PERÍODO ───────────────────────────────
+    if comparacao is not None:
+        story.append(PageBreak())
+        secao("comparativo")
+        periodos = [comparacao.periodo_atual, comparacao.periodo_anterior]
+        story.append(Paragraph(f"6. Comparativo com {comparacao.periodo_anterior}", sSection))
+        story.append(HRFlowable(width="100%", thickness=1, color=AZUL_CLARO))
+        story.append(Spacer(1, 0.3 * cm))
+        story.append(Paragraph(comparacao.descricao(), sBody))
+        story.append(imagens["comparativo_mensal"])
+        story.append(Spacer(1, 0.5 * cm))
+
+        story.append(Paragraph("Receita Mensal", sSection))
+        rows_cmp = [["Mês", "Receita", "Mês Comparado", "Receita Comparada", "Variação"]]
+        for mes, atual, anterior in comparacao.mensal.itertuples():
+            rows_cmp.append([
+                mes.strftime("%B/%Y").capitalize(),
+                f"R$ {atual:,.2f}",
+                (mes - comparacao.deslocamento).strftime("%B/%Y").capitalize(),
+                "—" if pd.isna(anterior) else f"R$ {anterior:,.2f}",
+                _fmt_variacao(atual, anterior),
+            ])
+        story.append(tabela(rows_cmp, [3.8 * cm, 3.6 * cm, 3.8 * cm, 3.6 * cm, 2.2 * cm]))
+
+        for dim, titulo, rotulo, limite in (
+                ("categoria", "Por Categoria", "Categoria", None),
+                ("regiao", "Por Região", "Região", None),
+                ("vendedor", "Por Vendedor", "Vendedor", top or TOP_COMPARATIVO),
+                ("produto", "Por Produto", "Produto", top or TOP_COMPARATIVO)):
+            story.append(Spacer(1, 0.5 * cm))
+            story.append(Paragraph(titulo, sSection))
+            story.append(tabela(
+                _linhas_comparativo(comparacao.por_dimensao[dim], rotulo, periodos, limite),
+                [6.4 * cm, 4 * cm, 4 * cm, 2.6 * cm], tem_total=True))
+    metricas.marcar("story", None)
+    return story
+
 
 # ── 6. GERAR PDF ──────────────────────────────────────────────────────────────
-doc = SimpleDocTemplate(
-    "sales_report.pdf",
-    pagesize=A4,
-    rightMargin=MARGEM,
-    leftMargin=MARGEM,
-    topMargin=MARGEM,
-    bottomMargin=2.5 * cm,
-)
-doc.build(story, canvasmaker=NumeradorPaginas)
-print("Relatorio gerado com sucesso: sales_report.pdf")
+def _documento(destino):
+    return SimpleDocTemplate(
+        destino,
+        pagesize=A4,
+        rightMargin=MARGEM,
+        leftMargin=MARGEM,
+        topMargin=MARGEM,
+        bottomMargin=2.5 * cm,
+    )
+
+
+def gerar_pdf(story, destino=ARQUIVO_SAIDA, metricas=SEM_METRICAS, titulo=TITULO_PADRAO):
+    """Diagrama o story e grava as páginas em `destino` à medida que ficam prontas.
+
+    `destino` é um caminho ou um fluxo binário com `write` (socket, pipe,
+    upload em partes), que recebe cada página já diagramada e não é
+    fechado. Um caminho é gravado num arquivo temporário ao lado e só
+    substitui o destino no fim, então uma falha no meio não deixa um PDF
+    truncado no lugar do anterior. `titulo` vai no rodapé das páginas.
+    """
+    canvas = partial(NumeradorPaginas, titulo=titulo)
+    if hasattr(destino, "write"):
+        _documento(destino).build(story, canvasmaker=canvas)
+    else:
+        _gravar_substituindo(destino, lambda f: _documento(f).build(story, canvasmaker=canvas))
+    metricas.marcar("pdf", None)
+
+
+def _gravar_substituindo(destino, gravar):
+    """Roda `gravar(f)` num arquivo temporário ao lado de `destino` e só no fim o renomeia."""
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            gravar(f)
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def dividir_secoes(story):
+    """Corta o story nos `MarcoSecao`: [(nome, flowables)], sem os marcadores.
+
+    Toda seção começa numa página nova, então cada uma pode ser
+    diagramada num documento separado sem mudar a paginação.
+    """
+    secoes = []
+    for flowable in story:
+        if isinstance(flowable, MarcoSecao):
+            secoes.append((flowable.nome, []))
+        else:
+            secoes[-1][1].append(flowable)
+    return secoes
+
+
+_SECOES = None  # seções do story, herdadas pelos workers via fork
+
+
+def _diagramar_secao(indice):
+    nome, flowables = _SECOES[indice]
+    parede, cpu = time.perf_counter(), time.process_time()
+    # PDF intermediário, lido de novo na junção: sem a camada ASCII85, que
+    # o pypdf decodifica em Python puro (só neste worker)
+    rl_config.useA85 = 0
+    destino = BytesIO()
+    _documento(destino).build(flowables, canvasmaker=CanvasCompacto)
+    return destino.getvalue(), {
+        "etapa": f"pdf.{nome}",
+        "parede_s": time.perf_counter() - parede,
+        "cpu_s": time.process_time() - cpu,
+    }
+
+
+def _carimbar(pagina, rodape, fonte):
+    """Desenha o conteúdo de `rodape` por cima de `pagina`.
+
+    O `merge_page` do pypdf analisa e renomeia o conteúdo da página
+    inteira; aqui só o do rodapé (uns poucos operadores) é analisado: a
+    fonte dele ganha um nome próprio nos recursos da página e o stream
+    do rodapé é acrescentado ao da página, isolado por q/Q.
+    """
+    from pypdf.generic import DictionaryObject, NameObject
+
+    operacoes = rodape.get_contents()
+    operacoes.operations = [
+        ([NameObject("/FRodape"), *operandos[1:]] if operador == b"Tf" else operandos, operador)
+        for operandos, operador in operacoes.operations
+    ]
+    conteudo = pagina.get_contents()
+    conteudo.set_data(b"q\n" + conteudo.get_data() + b"\nQ\n" + operacoes.get_data())
+    pagina.replace_contents(conteudo)
+    pagina.compress_content_streams()
+    # cópia dos recursos: os da página podem ser compartilhados com outras
+    recursos = DictionaryObject(pagina["/Resources"].get_object())
+    fontes = DictionaryObject(recursos.get("/Font", DictionaryObject()).get_object())
+    fontes[NameObject("/FRodape")] = fonte
+    recursos[NameObject("/Font")] = fontes
+    pagina[NameObject("/Resources")] = recursos
+
+
+def juntar_secoes(pdfs, destino, titulo=TITULO_PADRAO):
+    """Junta os PDFs das seções em `destino` e carimba "Página X de Y" em cada página.
+
+    Os rodapés são desenhados por `desenhar_rodape`, como no `gerar_pdf`,
+    num documento à parte com uma página por página do relatório, e
+    depois carimbados nas páginas das seções.
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        raise SystemExit("--parallel-pdf e o cache de seções requerem o pacote pypdf: "
+                         "pip install pypdf")
+    documento = PdfWriter()
+    for pdf in pdfs:
+        documento.append(PdfReader(BytesIO(pdf)))
+    rodapes = BytesIO()
+    canvas_rodapes = CanvasCompacto(rodapes, pagesize=A4, pageCompression=0)
+    total = len(documento.pages)
+    for atual in range(1, total + 1):
+        if atual > 1:  # capa sem rodapé
+            desenhar_rodape(canvas_rodapes, atual, total, titulo)
+        canvas_rodapes.showPage()
+    canvas_rodapes.save()
+    paginas_rodape = PdfReader(rodapes).pages
+    if total > 1:
+        # o rodapé usa uma fonte só (Helvetica), a mesma em todas as páginas
+        fonte, = paginas_rodape[1]["/Resources"]["/Font"].values()
+        fonte = fonte.get_object().clone(documento).indirect_reference
+        for pagina, rodape in zip(documento.pages[1:], paginas_rodape[1:]):
+            _carimbar(pagina, rodape, fonte)
+    if hasattr(destino, "write"):
+        # o pypdf grava as posições da xref com `tell()`, que um pipe ou um
+        # socket não têm: o PDF juntado é montado na memória e copiado
+        buf = BytesIO()
+        documento.write(buf)
+        destino.write(buf.getvalue())
+    else:
+        # como no `gerar_pdf`: uma falha no meio não trunca o PDF anterior
+        _gravar_substituindo(destino, documento.write)
+
+
+def _diagramar_secoes(secoes, indices, workers=1, metricas=SEM_METRICAS):
+    """PDFs sem rodapé das seções `indices`, num pool por fork se `workers` > 1."""
+    global _SECOES
+    _SECOES = secoes
+    try:
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            contexto = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(workers, mp_context=contexto) as pool:
+                resultados = list(pool.map(_diagramar_secao, indices))
+        else:
+            a85 = rl_config.useA85
+            try:
+                resultados = [_diagramar_secao(i) for i in indices]
+            finally:
+                rl_config.useA85 = a85
+    finally:
+        _SECOES = None
+    for _, registro in resultados:
+        metricas.registrar(registro)
+    return [pdf for pdf, _ in resultados]
+
+
+def gerar_pdf_paralelo(story, destino=ARQUIVO_SAIDA, workers=None, metricas=SEM_METRICAS,
+                       titulo=TITULO_PADRAO):
+    """Como `gerar_pdf`, mas diagrama cada seção num processo e junta os PDFs no fim.
+
+    As seções são repassadas aos workers por fork, sem serializar os
+    flowables; com um worker só ou sem fork (Windows) cai no `gerar_pdf`.
+    A diagramação de cada seção vira uma etapa "pdf.<seção>" e a junção,
+    "pdf.juntar".
+    """
+    secoes = dividir_secoes(story)
+    workers = min(len(secoes), workers or os.cpu_count() or 1)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return gerar_pdf(story, destino, metricas, titulo)
+    pdfs = _diagramar_secoes(secoes, range(len(secoes)), workers, metricas)
+    with metricas.etapa("pdf.juntar"):
+        juntar_secoes(pdfs, destino, titulo)
+
+
+def gerar_pdf_secoes(story, destino, chaves, cache, workers=1, metricas=SEM_METRICAS,
+                     titulo=TITULO_PADRAO):
+    """Como `gerar_pdf_paralelo`, reaproveitando as seções já diagramadas.
+
+    `chaves` é {seção: chave no `cache`} (veja `DEPENDENCIAS_SECOES`); só
+    as seções ausentes do cache são diagramadas, em até `workers`
+    processos, e guardadas. Devolve os nomes das seções diagramadas.
+    """
+    secoes = dividir_secoes(story)
+    pdfs = [cache.obter(chaves[nome]) if nome in chaves else None for nome, _ in secoes]
+    faltam = [i for i, pdf in enumerate(pdfs) if pdf is None]
+    if faltam:
+        novos = _diagramar_secoes(secoes, faltam, min(len(faltam), workers or 1), metricas)
+        for i, pdf in zip(faltam, novos):
+            pdfs[i] = pdf
+            if secoes[i][0] in chaves:
+                cache.guardar(chaves[secoes[i][0]], pdf)
+    with metricas.etapa("pdf.juntar"):
+        juntar_secoes(pdfs, destino, titulo)
+    return [secoes[i][0] for i in faltam]
+
+
+# etapas que `--profile` aceita e em que modo cada uma roda
+ETAPAS_PERFIL = {
+    "carga":              "entrada única, sem --chunksize",
+    "agregacao":          "entrada única, --state e --backend",
+    "carga_agregacao":    "--chunksize, --approx-top e várias entradas",
+    "estado":             "--state",
+    "verificacao_estado": "--verify-state",
+    "agregacao_sql":      "--backend sqlite/duckdb",
+    "comparacao":         "--compare e --save-aggregates",
+    "graficos":           "sempre",
+    "graficos.NOME":      "um gráfico renderizado com -j 1, fora do cache",
+    "imagens":            "--image-budget",
+    "story":              "sempre",
+    "pdf":                "sempre",
+    "pdf.juntar":         "--parallel-pdf e --section-cache",
+}
+
+
+def _etapa_perfilavel(nome):
+    return nome in ETAPAS_PERFIL or (nome.startswith("graficos.") and nome != "graficos.")
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description="Gera o relatório de vendas em PDF a partir de um CSV.")
+    parser.add_argument("entrada", nargs="?", default=ARQUIVO_ENTRADA,
+                        help=f"CSV de vendas, comprimido ou não, um diretório ou um glob "
+                             f"(\"exports/*.csv.gz\"); padrão: {ARQUIVO_ENTRADA}")
+    parser.add_argument("-o", "--output", default=ARQUIVO_SAIDA,
+                        help=f"PDF de saída; \"-\" grava na saída padrão, página a página "
+                             f"(padrão: {ARQUIVO_SAIDA})")
+    parser.add_argument("--chunksize", type=int, default=None, metavar="N",
+                        help="lê o CSV em blocos de N linhas (arquivos maiores que a memória)")
+    parser.add_argument("--schema", choices=ESQUEMAS, default="padrao",
+                        help="enxuto: dimensões categóricas, números estreitos e mês inteiro "
+                             "(menos memória em arquivos grandes)")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas",
+                        help="motor da agregação: pandas, ou SQL embutido (sqlite, duckdb) "
+                             "sem montar um DataFrame (padrão: pandas)")
+    parser.add_argument("--verify-backend", action="store_true",
+                        help="com --backend sqlite/duckdb, confere o cubo contra o do pandas")
+    parser.add_argument("--state", metavar="ARQUIVO",
+                        help="snapshot do cubo: lê só as linhas acrescentadas desde a última execução")
+    parser.add_argument("--verify-state", action="store_true",
+                        help="com --state, confere o cubo incremental contra um recálculo completo")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignora os caches (dados e gráficos) e refaz tudo")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="apaga os caches antes de gerar o relatório")
+    parser.add_argument("--cache-dir", default=data_cache.DIRETORIO_CACHE,
+                        help=f"diretório dos caches (padrão: {data_cache.DIRETORIO_CACHE})")
+    parser.add_argument("--chart-cache-mb", type=float, default=64, metavar="MB",
+                        help="tamanho máximo do cache de gráficos (padrão: 64)")
+    parser.add_argument("--charts", choices=FORMATOS_GRAFICO, default="png",
+                        help="gráficos em PNG a 150 dpi, vetoriais ou PNG de paleta a 150 "
+                             "pontos por polegada da página (padrão: png)")
+    parser.add_argument("--image-budget", type=float, default=None, metavar="KB",
+                        help="com --charts indexado, limite de bytes das imagens do relatório; "
+                             "cores e resolução são reduzidas até caber")
+    parser.add_argument("--granularity", choices=GRANULARIDADES, default="mes",
+                        help="período dos gráficos de evolução: dia, semana, mes ou trimestre; "
+                             "séries longas são reduzidas (padrão: mes)")
+    parser.add_argument("--top", type=int, default=None, metavar="N",
+                        help="tabelas de produtos e vendedores só com os N maiores "
+                             "e o resto somado em \"Outros\"")
+    parser.add_argument("--approx-top", type=int, default=None, metavar="N",
+                        help="ranking aproximado dos N maiores produtos e vendedores, em "
+                             "memória fixa (esboço Space-Saving), com as cotas de erro no PDF")
+    parser.add_argument("--sketch-size", type=int, default=CAPACIDADE_ESBOCO, metavar="K",
+                        help=f"contadores de cada esboço do --approx-top; mais contadores, "
+                             f"menos erro (padrão: {CAPACIDADE_ESBOCO})")
+    parser.add_argument("--save-aggregates", metavar="ARQUIVO",
+                        help="grava os agregados mensais por dimensão deste relatório, para "
+                             "compará-lo depois com outro período")
+    parser.add_argument("--compare", action="append", metavar="ARQUIVO",
+                        help="compara com agregados gravados por --save-aggregates (ano contra "
+                             "ano ou período equivalente); repetido, os arquivos são somados")
+    parser.add_argument("-j", "--workers", type=int, default=None, metavar="N",
+                        help="processos para ler as partições e renderizar os gráficos "
+                             "(padrão: nº de CPUs)")
+    parser.add_argument("--dry-run", "--only-validate", action="store_true",
+                        help="valida as opções e as entradas (cabeçalho e uma amostra de linhas), "
+                             "mostra o plano e sai sem gerar o PDF")
+    parser.add_argument("--parallel-pdf", action="store_true",
+                        help="diagrama cada seção num processo (até -j) e junta os PDFs "
+                             "no fim; requer pypdf")
+    parser.add_argument("--section-cache", action="store_true",
+                        help="guarda cada seção diagramada e só refaz as seções cujos "
+                             "agregados mudaram; requer pypdf")
+    parser.add_argument("--watch", action="store_true",
+                        help="observa a entrada e refaz o PDF a cada mudança, com o cache "
+                             "de seções, até Ctrl+C")
+    parser.add_argument("--watch-interval", type=float, default=0.25, metavar="S",
+                        help="intervalo entre verificações da entrada no --watch (padrão: 0.25)")
+    parser.add_argument("--metrics", metavar="ARQUIVO",
+                        help="grava tempo, CPU e memória de cada etapa (.prom = Prometheus, senão JSON)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="com --metrics, mede também o pico das alocações Python (mais lento)")
+    parser.add_argument("--profile", metavar="ETAPA",
+                        help="perfila uma etapa com cProfile: "
+                             + "; ".join(f"{nome} ({modo})" for nome, modo in ETAPAS_PERFIL.items()))
+    parser.add_argument("--profile-out", metavar="ARQUIVO",
+                        help="destino do dump do cProfile (padrão: ETAPA.prof)")
+    return parser
+
+
+def _validar(args):
+    if args.granularity not in GRANULARIDADES:
+        raise ErroRelatorio(f"granularidade desconhecida: {args.granularity!r}")
+    if args.top is not None and args.top < 1:
+        raise ErroRelatorio("--top precisa ser pelo menos 1")
+    if args.approx_top is not None:
+        if not 1 <= args.approx_top <= args.sketch_size:
+            raise ErroRelatorio("--approx-top precisa estar entre 1 e --sketch-size")
+        if args.top is not None:
+            raise ErroRelatorio("use --top ou --approx-top, não os dois")
+        if args.backend != "pandas" or args.state:
+            raise ErroRelatorio("--approx-top lê a entrada em blocos; não combina com "
+                                "--backend sqlite/duckdb nem --state")
+    if args.approx_top is not None and (args.compare or args.save_aggregates):
+        raise ErroRelatorio("--compare e --save-aggregates precisam dos produtos e vendedores "
+                            "exatos; não combinam com --approx-top")
+    if args.image_budget is not None:
+        if args.charts != "indexado" or args.image_budget <= 0:
+            raise ErroRelatorio("--image-budget precisa de --charts indexado e de um limite positivo")
+        if args.section_cache:
+            raise ErroRelatorio("--image-budget vale para o relatório inteiro; não combina com "
+                                "--section-cache")
+    if args.watch and args.output == "-":
+        raise ErroRelatorio("--watch regrava um arquivo a cada mudança; não combina com -o -")
+    if args.no_cache and (args.section_cache or args.watch):
+        raise ErroRelatorio("--section-cache e --watch usam os caches; não combinam com --no-cache")
+    if args.profile is not None and not _etapa_perfilavel(args.profile):
+        raise ErroRelatorio(f"etapa desconhecida em --profile: {args.profile!r} "
+                            f"(etapas: {', '.join(ETAPAS_PERFIL)})")
+    if args.backend != "pandas" and (args.state or args.chunksize):
+        raise ErroRelatorio("--backend sqlite/duckdb não se combina com --state nem --chunksize")
+    if args.backend != "pandas" and args.schema != "padrao":
+        raise ErroRelatorio("--schema escolhe os tipos da leitura pelo pandas; com --backend "
+                            "sqlite/duckdb os tipos são os do motor SQL")
+    if args.verify_backend and args.backend == "pandas":
+        raise ErroRelatorio("--verify-backend confere um --backend sqlite/duckdb com o pandas; "
+                            "informe o --backend")
+    if args.verify_state and not args.state:
+        raise ErroRelatorio("--verify-state confere o estado incremental; informe o --state")
+
+
+def parse_args(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    try:
+        _validar(args)
+    except ErroRelatorio as e:
+        parser.error(str(e))
+    return args
+
+
+# ── 7. API ────────────────────────────────────────────────────────────────────
+class ErroRelatorio(Exception):
+    """Opções inválidas ou verificação que falhou ao gerar um relatório."""
+
+
+def gerar_relatorio(entrada=ARQUIVO_ENTRADA, saida=ARQUIVO_SAIDA, opcoes=None, log=print):
+    """Gera o PDF de `entrada` em `saida`; é o que a CLI e o serviço chamam.
+
+    `saida` é um caminho ou um fluxo binário com `write` (socket, pipe,
+    upload em partes), que recebe as páginas à medida que ficam prontas
+    e não é fechado. `opcoes` usa os nomes das opções da linha de comando (`chunksize`,
+    `schema`, `backend`, `charts`, `workers`, `no_cache`...); as ausentes
+    ficam com os padrões da CLI. Mensagens de progresso vão para `log`.
+    Devolve um resumo: destino, tempo total, estado e cache de gráficos.
+    """
+    args = _parser().parse_args([])
+    desconhecidas = set(opcoes or {}) - set(vars(args))
+    if desconhecidas:
+        raise TypeError(f"opções desconhecidas: {', '.join(sorted(desconhecidas))}")
+    vars(args).update(opcoes or {})
+    args.entrada, args.output = entrada, saida
+    _validar(args)
+    if args.watch:
+        raise ErroRelatorio("--watch é um laço; use `observar`")
+    inicio = time.perf_counter()
+
+    metricas = SEM_METRICAS
+    if args.metrics or args.profile:
+        metricas = Metricas(tracemalloc=args.tracemalloc, perfil=args.profile,
+                            arquivo_perfil=args.profile_out)
+    arquivos = expandir_entradas(args.entrada)
+    if len(arquivos) > 1 and args.state:
+        raise ErroRelatorio("--state exige um único arquivo de entrada")
+    if args.dry_run:
+        return _ensaio(args, arquivos, log, inicio)
+    if args.clear_cache:
+        data_cache.limpar_cache(args.cache_dir)
+    info = None
+    resolucao = RESOLUCAO_CUBO[args.granularity]
+    esbocos = novos_esbocos(args.sketch_size) if args.approx_top else None
+    if args.backend != "pandas":
+        import sql_backend
+        with metricas.etapa("agregacao_sql"):
+            try:
+                cubo = sql_backend.construir_cubo_sql(arquivos, args.backend, resolucao)
+            except (ValueError, ImportError) as e:
+                raise ErroRelatorio(str(e)) from e
+        if args.verify_backend:
+            divergencias = comparar_cubos(cubo, cubo_de_arquivos(arquivos, args.workers,
+                                                                 resolucao=resolucao),
+                                          (args.backend, "pandas"))
+            for d in divergencias[:20]:
+                log(f"  divergência: {d}")
+            if divergencias:
+                raise ErroRelatorio(f"Backend {args.backend} difere do pandas "
+                                    f"({len(divergencias)} divergências)")
+            log(f"Cubo do backend {args.backend} confere com o do pandas")
+        with metricas.etapa("agregacao"):
+            ag = Agregados(cubo, args.granularity)
+    elif args.state:
+        import aggregate_state
+        chunksize = args.chunksize or 100_000
+        with metricas.etapa("estado"):
+            cubo, info = aggregate_state.atualizar(args.entrada, args.state, chunksize,
+                                                   resolucao, args.schema)
+        log(f"Estado {info['modo']}: {info['linhas_novas']:,} linhas novas "
+            f"({info['bytes_lidos']:,} bytes), {info['linhas_total']:,} no total")
+        if args.verify_state:
+            with metricas.etapa("verificacao_estado"):
+                divergencias = aggregate_state.verificar(cubo, args.entrada, chunksize,
+                                                         resolucao, args.schema)
+            for d in divergencias[:20]:
+                log(f"  divergência: {d}")
+            if divergencias:
+                raise ErroRelatorio(f"Estado incremental difere do recálculo completo "
+                                    f"({len(divergencias)} divergências)")
+            log("Estado incremental confere com o recálculo completo")
+        with metricas.etapa("agregacao"):
+            ag = Agregados(cubo, args.granularity)
+    elif len(arquivos) > 1:
+        # uma partição por processo; só os cubos parciais voltam
+        with metricas.etapa("carga_agregacao"):
+            cubo = cubo_de_arquivos(arquivos, args.workers, args.schema, args.chunksize,
+                                    resolucao, esbocos)
+            ag = Agregados(cubo, args.granularity, esbocos, args.approx_top)
+    elif args.chunksize or esbocos:
+        # carga e agregação se intercalam bloco a bloco
+        with metricas.etapa("carga_agregacao"):
+            blocos = ler_em_blocos(args.entrada, args.chunksize or 100_000, args.schema)
+            ag = analisar_em_blocos(blocos, args.granularity, esbocos, args.approx_top)
+    else:
+        with metricas.etapa("carga"):
+            if args.no_cache:
+                df = carregar_dados(args.entrada, args.schema)
+            else:
+                df = data_cache.carregar_com_cache(
+                    args.entrada, partial(carregar_dados, esquema=args.schema),
+                    os.path.join(args.cache_dir, "dados"), args.schema)
+        with metricas.etapa("agregacao"):
+            ag = analisar(df, args.granularity)
+        del df  # daqui em diante só o cubo é usado
+    comparacao = None
+    if args.save_aggregates or args.compare:
+        import period_comparison
+        with metricas.etapa("comparacao"):
+            resumo = period_comparison.resumir(ag.cubo)
+            if args.save_aggregates:
+                period_comparison.salvar(resumo, args.save_aggregates)
+            if args.compare:
+                try:
+                    comparacao = period_comparison.Comparacao(
+                        resumo, period_comparison.carregar(args.compare),
+                        ", ".join(os.path.basename(c) for c in args.compare))
+                    comparacao.conferir(ag.kpis())
+                except ValueError as e:
+                    raise ErroRelatorio(str(e)) from e
+        if args.save_aggregates:
+            log(f"Agregados gravados em {args.save_aggregates}")
+    cache = cache_secoes = None
+    if not args.no_cache:
+        cache = chart_cache.CacheGraficos(os.path.join(args.cache_dir, "graficos"),
+                                          int(args.chart_cache_mb * 1024 * 1024))
+    with metricas.etapa("graficos"):
+        imagens = renderizar_graficos(tarefas_graficos(ag, comparacao), args.workers, cache,
+                                      args.charts, metricas)
+    if args.charts == "indexado":
+        import indexed_images
+        limite = nivel = None
+        if args.image_budget is not None:
+            limite = int(args.image_budget * 1024)
+            with metricas.etapa("imagens"):
+                imagens, nivel = indexed_images.aplicar_orcamento(imagens, limite)
+        resumo_imagens = indexed_images.resumo(imagens, nivel, limite)
+    fonte, gerado_em = os.path.basename(os.path.normpath(args.entrada)), datetime.now()
+    with metricas.etapa("story"):
+        story = montar_story(ag, fonte, imagens, metricas=metricas,
+                             top=args.top or args.approx_top, gerado_em=gerado_em,
+                             comparacao=comparacao)
+    titulo = titulo_relatorio(ag.monthly.index)
+    with metricas.etapa("pdf"):
+        if args.section_cache:
+            cache_secoes = section_cache.CacheSecoes(os.path.join(args.cache_dir, "secoes"),
+                                                     _assinatura_codigo())
+            entradas = entradas_secoes(ag, fonte=fonte, recorte=None, empresa=None,
+                                       top=args.top or args.approx_top,
+                                       gerado_em=gerado_em.strftime("%d/%m/%Y %H:%M"),
+                                       comparacao=comparacao)
+            chaves = {nome: cache_secoes.chave(nome, valores, args.charts, DPI_GRAFICOS)
+                      for nome, valores in entradas.items()}
+            workers = args.workers if args.parallel_pdf else 1
+            refeitas = gerar_pdf_secoes(story, args.output, chaves, cache_secoes, workers,
+                                        metricas, titulo)
+        elif args.parallel_pdf:
+            gerar_pdf_paralelo(story, args.output, args.workers, metricas, titulo)
+        else:
+            gerar_pdf(story, args.output, metricas, titulo)
+    log(f"Relatorio gerado com sucesso: {_nome_saida(args.output)}")
+    if cache is not None:
+        log(cache.resumo())
+    if args.charts == "indexado":
+        log(resumo_imagens)
+    if cache_secoes is not None:
+        log(cache_secoes.resumo() + (f" (refeitas: {', '.join(refeitas)})" if refeitas else ""))
+    if args.metrics:
+        metricas.salvar(args.metrics)
+        log(f"Métricas gravadas em {args.metrics}")
+    if args.profile and metricas.perfil_gravado:
+        log(f"Perfil da etapa '{args.profile}' gravado em {metricas.arquivo_perfil}")
+    elif args.profile:
+        executadas = ", ".join(dict.fromkeys(r["etapa"] for r in metricas.registros))
+        log(f"Etapa '{args.profile}' não rodou neste modo; nenhum perfil gravado "
+            f"(etapas executadas: {executadas})")
+    return {
+        "entrada": args.entrada,
+        "saida": args.output,
+        "segundos": time.perf_counter() - inicio,
+        "estado": info,
+        "cache_graficos": None if cache is None else
+                          {"acertos": cache.acertos, "faltas": cache.faltas},
+        "cache_secoes": None if cache_secoes is None else
+                        {"acertos": cache_secoes.acertos, "faltas": cache_secoes.faltas},
+    }
+
+
+def _nome_saida(saida):
+    """Caminho de `saida`, ou o nome do fluxo binário (ex.: <stdout>)."""
+    if isinstance(saida, (str, os.PathLike)):
+        return os.fspath(saida)
+    nome = getattr(saida, "name", None)
+    return nome if isinstance(nome, str) else f"<{type(saida).__name__}>"
+
+
+def _assinatura_codigo():
+    """Hash deste módulo e dos codificadores: mudar layout ou gráficos invalida as seções."""
+    return chart_cache.assinatura_codigo(*chart_cache.arquivos_renderizacao(__name__))
+
+
+def _versao_entradas(entrada):
+    """(caminho, tamanho, mtime) de cada arquivo da entrada, ou None se sumiu."""
+    versao = []
+    try:
+        for caminho in expandir_entradas(entrada):
+            st = os.stat(caminho)
+            versao.append((caminho, st.st_size, st.st_mtime_ns))
+    except OSError:
+        return None
+    return versao
+
+
+def observar(entrada=ARQUIVO_ENTRADA, saida=ARQUIVO_SAIDA, opcoes=None, intervalo=0.25,
+             log=print):
+    """`--watch`: gera o relatório e o refaz a cada mudança na entrada, até Ctrl+C.
+
+    A entrada é verificada a cada `intervalo` segundos (tamanho e mtime
+    de cada arquivo). Toda geração usa o cache de seções, então uma
+    edição pequena só rediagrama as seções cujos agregados mudaram. Uma
+    falha (por exemplo, um arquivo salvo pela metade) é mostrada e o
+    laço continua esperando a próxima mudança.
+    """
+    opcoes = {**(opcoes or {}), "watch": False, "section_cache": True}
+    versao = None
+    plt.close("all")  # importa o pyplot já, e não na primeira edição
+    try:
+        while True:
+            atual = _versao_entradas(entrada)
+            if atual is not None and atual != versao:
+                versao = atual
+                try:
+                    resumo = gerar_relatorio(entrada, saida, opcoes, log)
+                    log(f"Atualizado em {resumo['segundos']:.2f}s; observando {entrada} "
+                        f"(Ctrl+C para sair)")
+                except Exception as e:  # o laço sobrevive a uma entrada inválida
+                    log(f"Falha ao gerar o relatório: {type(e).__name__}: {e}")
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        pass
+
+
+def _modo(args, arquivos):
+    if args.backend != "pandas":
+        return f"backend {args.backend}" + (" (conferido com o pandas)" if args.verify_backend else "")
+    if args.state:
+        return f"estado incremental em {args.state}"
+    if len(arquivos) > 1:
+        return f"{len(arquivos)} partições em paralelo (-j {args.workers or os.cpu_count()})"
+    if args.chunksize or args.approx_top:
+        return f"em blocos de {args.chunksize or 100_000:,} linhas"
+    return "arquivo inteiro em memória" + ("" if args.no_cache else ", com cache de dados")
+
+
+def _ensaio(args, arquivos, log, inicio):
+    """`--dry-run`: confere entradas e destino e mostra o que seria feito."""
+    problemas = []
+    # cabeçalho de todas as partições, mas no máximo ~1000 linhas de amostra
+    linhas = max(1, 1000 // len(arquivos))
+    for caminho in arquivos:
+        if not os.path.isfile(caminho):
+            problemas.append(f"{caminho}: arquivo não encontrado")
+        else:
+            problemas.extend(validar_amostra(caminho, linhas))
+    for caminho in args.compare or []:
+        if not os.path.isfile(caminho):
+            problemas.append(f"{caminho}: agregados para --compare não encontrados")
+    if isinstance(args.output, (str, os.PathLike)):
+        destino = os.path.dirname(os.path.abspath(args.output))
+        if not os.access(destino, os.W_OK):
+            problemas.append(f"{args.output}: sem permissão de escrita em {destino}")
+    for p in problemas[:20]:
+        log(f"  {p}")
+    if problemas:
+        raise ErroRelatorio(f"Entrada inválida ({len(problemas)} problemas)")
+    tamanho = sum(os.path.getsize(c) for c in arquivos)
+    log(f"Entrada ok: {len(arquivos)} arquivo(s), {tamanho / 2**20:.1f} MB")
+    comparar = f", comparado com {len(args.compare)} arquivo(s) de agregados" if args.compare else ""
+    log(f"Plano: {_modo(args, arquivos)}, esquema {args.schema}, gráficos {args.charts} "
+        f"por {args.granularity}{comparar} → {_nome_saida(args.output)}")
+    return {
+        "entrada": args.entrada,
+        "saida": args.output,
+        "segundos": time.perf_counter() - inicio,
+        "arquivos": len(arquivos),
+        "bytes": tamanho,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    opcoes = {k: v for k, v in vars(args).items() if k not in ("entrada", "output")}
+    try:
+        if args.watch:
+            observar(args.entrada, args.output, opcoes, args.watch_interval)
+        elif args.output == "-":
+            # o PDF ocupa a saída padrão; as mensagens vão para a de erros
+            gerar_relatorio(args.entrada, sys.stdout.buffer, opcoes,
+                            log=partial(print, file=sys.stderr))
+        else:
+            gerar_relatorio(args.entrada, args.output, opcoes)
+    except ErroRelatorio as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Gráficos em PNG de paleta, na resolução da página e gravados uma vez por PDF.
+
+No formato `--charts indexado` cada gráfico é rasterizado com o dpi que
+dá `ppi` pontos por polegada no tamanho em cm que ele ocupa na página,
+e não a 150 dpi sobre a figura do matplotlib, que é quase o dobro desse
+tamanho. O PNG é então reduzido a cores indexadas: os gráficos usam a
+paleta curta de `PALETA_MPL` mais os tons da suavização, e 256 cores
+cobrem isso sem diferença visível.
+
+No PDF o PNG entra sem ser decodificado: o IDAT já é um stream Flate
+com os preditores do PNG, que o PDF aceita como está, com a paleta num
+espaço de cor `/Indexed` (1 byte por pixel, ou menos). O `Image` do
+ReportLab, em vez disso, expande a imagem para RGB e comprime tudo de
+novo. Cada imagem é registrada no documento pelo hash dos seus bytes:
+imagens idênticas viram um único XObject, desenhado onde aparecerem.
+
+`aplicar_orcamento` encaixa as imagens de um relatório num limite de
+bytes, reduzindo cores e resolução por igual em todas.
+
+Só usa o Pillow, que já vem com o matplotlib.
+"""
+import hashlib
+import struct
+from io import BytesIO
+
+from PIL import Image as PILImage
+from reportlab import rl_config
+from reportlab.pdfbase import pdfdoc
+from reportlab.platypus import Flowable
+
+CORES = 256
+
+# Degraus do orçamento, do melhor para o pior: (fração da resolução, cores)
+# (abaixo de ~55% os rótulos dos eixos deixam de ser legíveis)
+NIVEIS_ORCAMENTO = ((1.0, 256), (1.0, 64), (0.85, 64), (0.85, 16), (0.7, 16), (0.55, 16))
+
+
+def dpi_para(fig, width_cm, height_cm, ppi):
+    """dpi com que `fig` fica com `ppi` pontos por polegada em `width_cm` × `height_cm`."""
+    largura, altura = fig.get_size_inches()
+    return ppi * max(width_cm / largura, height_cm / altura) / 2.54
+
+
+def quantizar(imagem, cores=CORES):
+    """PNG de paleta (até `cores` cores, sem pontilhado) de uma imagem do Pillow."""
+    paleta = imagem.convert("RGB").quantize(colors=cores, method=PILImage.Quantize.FASTOCTREE,
+                                            dither=PILImage.Dither.NONE)
+    buf = BytesIO()
+    paleta.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def fig_to_png_indexado(fig, width_cm, height_cm, ppi, cores=CORES):
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi_para(fig, width_cm, height_cm, ppi),
+                bbox_inches="tight", facecolor="white")
+    return quantizar(PILImage.open(buf), cores)
+
+
+def reduzir(png, escala, cores):
+    """O PNG com `escala` da resolução e no máximo `cores` cores."""
+    imagem = PILImage.open(BytesIO(png))
+    if escala < 1:
+        largura, altura = imagem.size
+        imagem = imagem.convert("RGB").resize(
+            (max(1, round(largura * escala)), max(1, round(altura * escala))),
+            PILImage.Resampling.LANCZOS)
+    return quantizar(imagem, cores)
+
+
+def _ler_png(png):
+    """(largura, altura, bits, paleta, IDAT) de um PNG de paleta sem entrelaçamento."""
+    pos, paleta, idat, cabecalho = 8, b"", [], None
+    while pos < len(png):
+        tamanho, tipo = struct.unpack(">I4s", png[pos:pos + 8])
+        corpo = png[pos + 8:pos + 8 + tamanho]
+        if tipo == b"IHDR":
+            cabecalho = struct.unpack(">IIBBBBB", corpo)
+        elif tipo == b"PLTE":
+            paleta = corpo
+        elif tipo == b"IDAT":
+            idat.append(corpo)
+        elif tipo == b"IEND":
+            break
+        pos += 12 + tamanho
+    if cabecalho is None or cabecalho[3] != 3 or cabecalho[6] != 0:
+        raise ValueError("esperado um PNG de paleta sem entrelaçamento")
+    largura, altura, bits = cabecalho[:3]
+    return largura, altura, bits, paleta, b"".join(idat)
+
+
+class _Hex(pdfdoc.PDFObject):
+    def __init__(self, dados):
+        self.dados = dados
+
+    def format(self, document):
+        return b"<" + self.dados.hex().encode("ascii") + b">"
+
+
+class XObjectIndexado(pdfdoc.PDFObject):
+    """XObject de imagem `/Indexed` com os dados do PNG como estão."""
+
+    def __init__(self, png):
+        self.largura, self.altura, self.bits, self.paleta, self.dados = _ler_png(png)
+
+    def format(self, document):
+        parametros = pdfdoc.PDFDictionary({"Predictor": 15, "Colors": 1,
+                                           "BitsPerComponent": self.bits,
+                                           "Columns": self.largura})
+        conteudo, filtros = self.dados, [pdfdoc.PDFName("FlateDecode")]
+        if rl_config.useA85:
+            conteudo = pdfdoc.PDFBase85Encode.encode(conteudo)
+            filtros.insert(0, pdfdoc.PDFName("ASCII85Decode"))
+            parametros = pdfdoc.PDFArray(["null", parametros])
+        stream = pdfdoc.PDFStream(content=conteudo)
+        stream.dictionary.dict.update({
+            "Type": pdfdoc.PDFName("XObject"),
+            "Subtype": pdfdoc.PDFName("Image"),
+            "Width": self.largura,
+            "Height": self.altura,
+            "BitsPerComponent": self.bits,
+            "ColorSpace": pdfdoc.PDFArray([pdfdoc.PDFName("Indexed"),
+                                           pdfdoc.PDFName("DeviceRGB"),
+                                           len(self.paleta) // 3 - 1, _Hex(self.paleta)]),
+            "Filter": pdfdoc.PDFArray(filtros),
+            "DecodeParms": parametros,
+        })
+        return stream.format(document)
+
+
+class ImagemIndexada(Flowable):
+    """Flowable de um PNG de paleta; cada conteúdo distinto vira um XObject só no PDF."""
+
+    def __init__(self, png, width, height):
+        super().__init__()
+        self.png = png
+        self.drawWidth, self.drawHeight = width, height
+        self.hAlign = "CENTER"
+        self.nome = "Idx" + hashlib.blake2b(png, digest_size=16).hexdigest()
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        canv, doc = self.canv, self.canv._doc
+        interno = doc.getXObjectName(self.nome)
+        if interno not in doc.idToObject:
+            doc.Reference(XObjectIndexado(self.png), interno)
+        canv._currentPageHasImages = 1
+        canv.saveState()
+        canv.scale(self.drawWidth, self.drawHeight)
+        canv._code.append(f"/{interno} Do")
+        canv.restoreState()
+        canv._formsinuse.append(self.nome)
+
+
+def bytes_distintos(imagens):
+    """Bytes das imagens {nome: ImagemIndexada} contando cada conteúdo uma vez."""
+    return sum(len(png) for png in {img.nome: img.png for img in imagens.values()}.values())
+
+
+def aplicar_orcamento(imagens, limite):
+    """Reduz as imagens {nome: ImagemIndexada} por igual até caberem em `limite` bytes.
+
+    Desce pelos `NIVEIS_ORCAMENTO` até a soma dos bytes distintos caber e
+    devolve (imagens, nível), com nível None se já cabiam. Se nem o último
+    degrau couber, fica o último.
+    """
+    if bytes_distintos(imagens) <= limite:
+        return imagens, None
+    for nivel in NIVEIS_ORCAMENTO[1:]:
+        reduzidos = {}
+        novas = {}
+        for nome, img in imagens.items():
+            if img.nome not in reduzidos:
+                reduzidos[img.nome] = reduzir(img.png, *nivel)
+            novas[nome] = ImagemIndexada(reduzidos[img.nome], img.drawWidth, img.drawHeight)
+        if bytes_distintos(novas) <= limite:
+            break
+    return novas, nivel
+
+
+def resumo(imagens, nivel=None, limite=None):
+    total = bytes_distintos(imagens)
+    texto = (f"Imagens: {len(imagens)} gráficos, "
+             f"{len({img.nome for img in imagens.values()})} distintos, {total / 1024:.1f} KB")
+    if limite is not None:
+        texto += f" (orçamento {limite / 1024:.0f} KB"
+        if nivel is not None:
+            escala, cores = nivel
+            texto += f": {escala:.0%} da resolução, {cores} cores"
+        texto += ", acima do limite)" if total > limite else ")"
+    return texto
@@ -0,0 +1,201 @@
+"""Medições por etapa do pipeline: tempo de parede, tempo de CPU e memória.
+
+Cada etapa é medida com `Metricas.etapa(nome)`; etapas aninhadas usam
+nomes com ponto ("graficos.pizza_categorias", "pdf.mensal"). O pico de
+memória de cada etapa é o pico do RSS do processo durante ela: no Linux o
+marcador de pico (VmHWM) é zerado no início da etapa via
+`/proc/self/clear_refs`, o que não custa nada durante a execução. Com
+`tracemalloc=True` mede-se também o pico das alocações Python/NumPy, bem
+mais preciso mas várias vezes mais lento nos gráficos. O resultado pode
+ser gravado em JSON ou no formato texto do Prometheus, e uma etapa
+escolhida pode ser perfilada com cProfile.
+
+Desligado, o pipeline recebe `SEM_METRICAS`, cujos métodos não fazem
+nada: nenhum relógio é lido e nenhum contador de memória é tocado.
+"""
+import cProfile
+import json
+import os
+import re
+import time
+import tracemalloc as _tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class _Pico:
+    """Pico de um contador de memória por etapa, com etapas aninhadas.
+
+    Zerar o pico no início de uma etapa interna apagaria o da externa;
+    por isso cada etapa aberta guarda o maior valor visto até a abertura
+    da próxima, e o pico de uma etapa fechada sobe para a que a contém.
+    """
+
+    def __init__(self, atual_e_pico, zerar):
+        self._ler   = atual_e_pico
+        self._zerar = zerar
+        self._pilha = []
+
+    def abrir(self):
+        atual, pico = self._ler()
+        if self._pilha:
+            self._pilha[-1] = max(self._pilha[-1], pico)
+        self._zerar()
+        self._pilha.append(atual)
+        return atual
+
+    def fechar(self):
+        atual, pico = self._ler()
+        pico = max(self._pilha.pop(), pico)
+        if self._pilha:
+            self._pilha[-1] = max(self._pilha[-1], pico)
+        self._zerar()
+        return atual, pico
+
+
+def _rss_e_pico():
+    with open("/proc/self/status") as f:
+        status = f.read()
+    kib = dict(re.findall(r"^(VmRSS|VmHWM):\s+(\d+)", status, re.M))
+    return int(kib["VmRSS"]) * 1024, int(kib["VmHWM"]) * 1024
+
+
+def _zerar_pico_rss():
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _pico_rss_disponivel():
+    try:
+        _rss_e_pico()
+        _zerar_pico_rss()
+    except (OSError, KeyError):
+        return False
+    return True
+
+
+# os contadores são do processo, então as pilhas também
+_PICO_RSS    = _Pico(_rss_e_pico, _zerar_pico_rss)
+_PICO_PYTHON = _Pico(_tracemalloc.get_traced_memory, _tracemalloc.reset_peak)
+
+
+class Metricas:
+    """Coleta as medições das etapas na ordem em que terminam.
+
+    `tracemalloc` liga também a medição das alocações Python. `perfil` é
+    o nome de uma etapa a perfilar com cProfile e `arquivo_perfil` o
+    destino do dump (formato do `pstats`).
+    """
+
+    def __init__(self, tracemalloc=False, perfil=None, arquivo_perfil=None):
+        self.tracemalloc    = tracemalloc
+        self.perfil         = perfil
+        self.arquivo_perfil = arquivo_perfil or f"{perfil}.prof"
+        self.perfil_gravado = False
+        self.registros      = []
+        self._marcos        = {}
+        self._rss           = _pico_rss_disponivel()
+        if tracemalloc and not _tracemalloc.is_tracing():
+            _tracemalloc.start()
+
+    @contextmanager
+    def etapa(self, nome):
+        perfilador = cProfile.Profile() if nome == self.perfil else None
+        if self._rss:
+            rss_inicio = _PICO_RSS.abrir()
+        if self.tracemalloc:
+            py_inicio = _PICO_PYTHON.abrir()
+        parede, cpu = time.perf_counter(), time.process_time()
+        if perfilador is not None:
+            perfilador.enable()
+        try:
+            yield
+        finally:
+            if perfilador is not None:
+                perfilador.disable()
+                perfilador.dump_stats(self.arquivo_perfil)
+                self.perfil_gravado = True
+            registro = {
+                "etapa": nome,
+                "parede_s": time.perf_counter() - parede,
+                "cpu_s": time.process_time() - cpu,
+            }
+            if self.tracemalloc:
+                atual, pico = _PICO_PYTHON.fechar()
+                registro["pico_python_bytes"] = pico - py_inicio
+                registro["alocado_python_bytes"] = atual - py_inicio
+            if self._rss:
+                atual, pico = _PICO_RSS.fechar()
+                registro["pico_rss_bytes"] = pico
+                registro["acrescimo_rss_bytes"] = pico - rss_inicio
+            self.registros.append(registro)
+
+    def registrar(self, registro):
+        """Acrescenta uma medição feita em outro processo (ex.: num worker)."""
+        self.registros.append(registro)
+
+    def marcar(self, grupo, nome):
+        """Fecha a subetapa anterior de `grupo` (se houver) e abre `nome`.
+
+        Serve para etapas que não cabem num `with`, como as seções do PDF,
+        que o ReportLab diagrama uma depois da outra dentro de `doc.build`.
+        Só mede tempo. `nome=None` fecha a última subetapa.
+        """
+        agora = (time.perf_counter(), time.process_time())
+        anterior = self._marcos.pop(grupo, None)
+        if anterior is not None:
+            nome_anterior, parede, cpu = anterior
+            self.registros.append({
+                "etapa": f"{grupo}.{nome_anterior}",
+                "parede_s": agora[0] - parede,
+                "cpu_s": agora[1] - cpu,
+            })
+        if nome is not None:
+            self._marcos[grupo] = (nome, *agora)
+
+    def como_dict(self):
+        return {"pid": os.getpid(), "etapas": self.registros}
+
+    def como_prometheus(self, prefixo="relatorio"):
+        series = [
+            ("parede_s", "etapa_segundos", "Tempo de parede da etapa"),
+            ("cpu_s", "etapa_cpu_segundos", "Tempo de CPU da etapa"),
+            ("pico_rss_bytes", "etapa_pico_rss_bytes", "Pico do RSS do processo durante a etapa"),
+            ("pico_python_bytes", "etapa_pico_python_bytes",
+             "Pico das alocações Python durante a etapa (tracemalloc)"),
+        ]
+        linhas = []
+        for chave, metrica, ajuda in series:
+            valores = [(r["etapa"], r[chave]) for r in self.registros if chave in r]
+            if not valores:
+                continue
+            linhas.append(f"# HELP {prefixo}_{metrica} {ajuda}")
+            linhas.append(f"# TYPE {prefixo}_{metrica} gauge")
+            for etapa, valor in valores:
+                linhas.append(f'{prefixo}_{metrica}{{etapa="{etapa}"}} {valor:g}')
+        return "\n".join(linhas) + "\n"
+
+    def salvar(self, caminho):
+        """Grava as medições; `.prom`/`.txt` usam o formato do Prometheus, o resto JSON."""
+        with open(caminho, "w", encoding="utf-8") as f:
+            if caminho.endswith((".prom", ".txt")):
+                f.write(self.como_prometheus())
+            else:
+                json.dump(self.como_dict(), f, indent=2)
+
+
+class _SemMetricas:
+    """Substituto de `Metricas` quando a instrumentação está desligada."""
+
+    registros = ()
+
+    def etapa(self, nome):
+        return nullcontext()
+
+    def registrar(self, registro):
+        pass
+
+    def marcar(self, grupo, nome):
+        pass
+
+
+SEM_METRICAS = _SemMetricas()
@@ -0,0 +1,162 @@
+"""PDF gravado página a página num fluxo binário qualquer.
+
+O `PDFDocument` do ReportLab guarda todos os objetos até o `save` e só
+então monta o arquivo inteiro na memória e o grava de uma vez: o
+primeiro byte sai depois da última página e o pico de memória cresce com
+o tamanho do PDF. O `DocumentoContinuo` grava cada página assim que ela
+termina: o dicionário da página, o stream de conteúdo e as imagens e
+forms que ela usa, seguidos de um `flush` no destino (arquivo, pipe,
+socket, upload em partes...). A página e o stream saem da memória; das
+páginas gravadas sobram só o número e a posição de cada objeto, para a
+tabela xref.
+
+O PDF permite objetos em qualquer ordem no arquivo e referências a
+objetos que vêm depois, então o que ainda pode mudar fica para o fim:
+a árvore de páginas, o dicionário de fontes, o catálogo, as informações
+do documento e os forms reservados com `reservar`, como os rodapés
+"Página X de Y", que uma página já gravada referencia mas que só são
+desenhados quando o total de páginas é conhecido. O destino não precisa
+aceitar `seek` nem `tell`: as posições são contadas aqui.
+"""
+import time
+
+from reportlab import rl_config
+from reportlab.pdfbase import pdfdoc
+
+
+class DocumentoContinuo(pdfdoc.PDFDocument):
+    """`PDFDocument` que grava em `saida` cada objeto pronto, a cada `gravar_prontos`.
+
+    `saida` é um caminho ou um objeto com `write` (e, opcionalmente,
+    `flush`), que não é fechado no fim. Criado a partir do documento de um
+    canvas por `de_canvas`; o `SaveToFile` do canvas grava o que faltou, a
+    xref e o trailer.
+    """
+
+    @classmethod
+    def de_canvas(cls, canvas):
+        """Troca o documento recém-criado de `canvas` por um `DocumentoContinuo`."""
+        doc = cls.__new__(cls)
+        doc.__dict__.update(canvas._doc.__dict__)
+        doc.saida           = canvas._filename
+        doc.posicao         = 0     # bytes já gravados
+        doc.primeiro_byte   = None  # perf_counter da gravação do cabeçalho
+        doc._arquivo        = None
+        doc._proximo        = 1     # próximo número de objeto ainda não visto
+        doc._adiados        = []    # números gravados só no fim
+        doc._reservados     = set()
+        doc._paginas_soltas = 0     # páginas de `Pages.pages` já trocadas por referências
+        canvas._doc = doc
+        return doc
+
+    def reservar(self, nome):
+        """Numera já o objeto `nome`, que só será registrado (e gravado) no fim."""
+        if nome not in self.idToObjectNumberAndVersion:
+            self.objectcounter += 1
+            self.idToObjectNumberAndVersion[nome] = (self.objectcounter, 0)
+            self.numberToId[self.objectcounter] = nome
+            self._reservados.add(nome)
+
+    def Reference(self, obj, name=None):
+        if name in self._reservados:
+            self._reservados.discard(name)
+            obj.__InternalName__ = name
+            self.idToObject[name] = obj
+            return pdfdoc.PDFObjectReference(name)
+        return super().Reference(obj, name)
+
+    def _abrir(self):
+        saida = self.saida
+        self._arquivo = saida if hasattr(saida, "write") else open(saida, "wb")
+        self.encrypt.prepare(self)
+        self.primeiro_byte = time.perf_counter()
+        # a versão do cabeçalho sai antes de se saber quais recursos o
+        # documento usa: a maior que o ReportLab pode exigir
+        versao = max(self._pdfVersion, *pdfdoc.PDF_SUPPORT_VERSION.values())
+        cabecalho = pdfdoc.PDFFile(versao).format(self)
+        self._arquivo.write(cabecalho)
+        self.posicao = len(cabecalho)
+
+    def _escrever(self, dados):
+        self._arquivo.write(dados)
+        self.posicao += len(dados)
+
+    def _mutaveis(self):
+        return (self.Catalog, self.Pages, self.info, self.Outlines,
+                self.idToObject[pdfdoc.BasicFonts])
+
+    def _gravar(self, numero):
+        if self._arquivo is None:
+            self._abrir()
+        nome = self.numberToId[numero]
+        obj = self.idToObject[nome]
+        dados = pdfdoc.PDFIndirectObject(nome, obj).format(self)
+        if not rl_config.invariant and rl_config.pdfComments:
+            self._escrever(pdfdoc.pdfdocEnc(
+                "%% %s: class %s \n" % (ascii(nome), obj.__class__.__name__[:50])))
+        self.idToOffset[nome] = self.posicao
+        self._escrever(dados)
+        if type(obj) in (pdfdoc.PDFPage, pdfdoc.PDFStream):
+            self.idToObject[nome] = None  # nunca mais formatado nem consultado
+
+    def gravar_prontos(self):
+        """Grava os objetos registrados desde a última chamada, menos os que ainda mudam."""
+        mutaveis = self._mutaveis()
+        # formatar um objeto pode registrar outros (o stream de uma página)
+        while self._proximo <= self.objectcounter:
+            numero, self._proximo = self._proximo, self._proximo + 1
+            nome = self.numberToId[numero]
+            obj = self.idToObject.get(nome)
+            if nome in self._reservados or any(obj is m for m in mutaveis):
+                self._adiados.append(numero)
+            else:
+                self._gravar(numero)
+        paginas = self.Pages.pages
+        for i in range(self._paginas_soltas, len(paginas)):
+            paginas[i] = pdfdoc.PDFObjectReference(paginas[i].__InternalName__)
+        self._paginas_soltas = len(paginas)
+        if self._arquivo is not None and hasattr(self._arquivo, "flush"):
+            self._arquivo.flush()
+
+    def SaveToFile(self, filename, canvas):
+        """Grava o resto do documento, a xref e o trailer (`filename` é o `saida`)."""
+        for fonte in self.delayedFonts:
+            fonte.addObjects(self)
+        self.info.invariant = self.invariant
+        self.info.digest(self.signature)
+        self.Reference(self.Catalog)
+        self.Reference(self.info)
+        self.Outlines.prepare(self, canvas)
+        if self.Outlines.ready < 0:
+            self.Catalog.Outlines = None
+        info_cripto = self.encrypt.info()
+        ref_cripto = self.Reference(info_cripto) if info_cripto else None
+
+        if self._reservados:
+            raise ValueError(f"objetos reservados e nunca registrados: "
+                             f"{', '.join(sorted(self._reservados))}")
+        self._adiados, adiados = [], self._adiados
+        for numero in adiados:
+            self._gravar(numero)
+        while self._proximo <= self.objectcounter:
+            self._proximo += 1
+            self._gravar(self._proximo - 1)
+
+        inicio_xref = self.posicao
+        total = self.objectcounter
+        linhas = [f"xref\n0 {total + 1}", "0000000000 65535 f "]
+        for numero in range(1, total + 1):
+            linhas.append("%0.10d %0.5d n " % (self.idToOffset[self.numberToId[numero]], 0))
+        self._escrever(pdfdoc.pdfdocEnc("\n".join(linhas) + "\n"))
+        trailer = pdfdoc.PDFTrailer(startxref=inicio_xref, Size=total + 1,
+                                    Root=self.Reference(self.Catalog),
+                                    Info=self.Reference(self.info),
+                                    Encrypt=ref_cripto, ID=self.ID())
+        self._escrever(trailer.format(self))
+        if self._arquivo is not self.saida:
+            self._arquivo.close()
+        elif hasattr(self._arquivo, "flush"):
+            self._arquivo.flush()
+
+    def GetPDFData(self, canvas):
+        raise RuntimeError("o DocumentoContinuo grava direto no destino; use save()")
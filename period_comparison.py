@@ -0,0 +1,148 @@
+"""Comparação entre períodos a partir de agregados mensais guardados.
+
+`--save-aggregates ARQUIVO` grava, junto com o relatório, a receita, a
+quantidade e as transações de cada mês: no total e por categoria,
+produto, vendedor e região. É uma tabela por dimensão, com meses × itens
+linhas e sem as combinações entre dimensões do cubo, então um ano de
+transações cabe em poucos KB (ou MB, com muitos produtos). Um relatório
+de outro período recebe esses arquivos em `--compare` e ganha variações
+contra eles na capa e em todas as dimensões, sem ler de novo as
+transações do período anterior.
+
+Os meses são alinhados pelo deslocamento entre o primeiro mês de cada
+período: a 12 meses de distância a comparação é ano contra ano (YoY);
+em qualquer outro caso, contra o período equivalente. Do período
+anterior só entram os meses que correspondem aos do atual, então um
+relatório parcial (jan–jun) é comparado com os mesmos meses do ano
+anterior, não com o ano inteiro.
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import generate_report as gr
+
+VERSAO_AGREGADOS = 1
+DIMENSOES = ("categoria", "produto", "vendedor", "regiao")
+MEDIDAS = ["total", "quantidade", "transacoes"]
+
+
+def resumir(cubo):
+    """Agregados mensais do cubo: {"mes": por mês, dim: por (mês, item)}."""
+    meses = gr._meses(cubo["mes"])
+    resumo = {"mes": cubo.groupby(meses)[MEDIDAS].sum()}
+    for dim in DIMENSOES:
+        tabela = cubo.groupby([meses, dim], observed=True)[MEDIDAS].sum().reset_index()
+        tabela[dim] = tabela[dim].astype(str)
+        resumo[dim] = tabela
+    return resumo
+
+
+def salvar(resumo, caminho):
+    tmp = caminho + ".tmp"
+    pd.to_pickle({"versao": VERSAO_AGREGADOS, **resumo}, tmp)
+    os.replace(tmp, caminho)
+
+
+def carregar(caminhos):
+    """Lê os agregados de `caminhos` e soma tudo num período só."""
+    partes = []
+    for caminho in caminhos:
+        try:
+            dados = pd.read_pickle(caminho)
+        except OSError as e:
+            raise ValueError(f"{caminho}: {e.strerror or e}") from e
+        except (EOFError, ValueError, pickle.UnpicklingError):
+            dados = None
+        if not isinstance(dados, dict) or dados.get("versao") != VERSAO_AGREGADOS:
+            raise ValueError(f"{caminho}: não é um arquivo gravado com --save-aggregates")
+        partes.append(dados)
+    if len(partes) == 1:
+        return {chave: partes[0][chave] for chave in ("mes", *DIMENSOES)}
+    resumo = {"mes": pd.concat([p["mes"] for p in partes]).groupby(level=0).sum()}
+    for dim in DIMENSOES:
+        resumo[dim] = (pd.concat([p[dim] for p in partes])
+                         .groupby(["mes", dim], as_index=False)[MEDIDAS].sum())
+    return resumo
+
+
+def _kpis(mensal):
+    total      = mensal["total"].sum()
+    quantidade = mensal["quantidade"].sum()
+    transacoes = mensal["transacoes"].sum()
+    return pd.Series({
+        "Receita":      total,
+        "Transações":   transacoes,
+        "Ticket Médio": total / transacoes if transacoes else float("nan"),
+        "Qtd Vendida":  quantidade,
+    })
+
+
+class Comparacao:
+    """Variações do período atual contra um anterior, no total, por mês e por dimensão.
+
+    `kpis`, `mensal` e cada tabela de `por_dimensao` têm as colunas
+    "atual" e "anterior"; no mensal, "anterior" é NaN nos meses sem par
+    no outro período.
+    """
+
+    def __init__(self, atual, anterior, fonte_anterior=None):
+        inicio, fim = atual["mes"].index.min(), atual["mes"].index.max()
+        self.deslocamento = (inicio - anterior["mes"].index.min()).n
+        de, ate = inicio - self.deslocamento, fim - self.deslocamento
+        anterior = {chave: (tabela.loc[de:ate] if chave == "mes"
+                            else tabela[(tabela["mes"] >= de) & (tabela["mes"] <= ate)])
+                    for chave, tabela in anterior.items()}
+        if anterior["mes"].empty:
+            raise ValueError("o período comparado não tem meses correspondentes aos do atual")
+        self.fonte_anterior   = fonte_anterior
+        self.periodo_atual    = gr.rotulo_intervalo(atual["mes"].index)
+        self.periodo_anterior = gr.rotulo_intervalo(anterior["mes"].index)
+
+        self.kpis = pd.DataFrame({"atual": _kpis(atual["mes"]),
+                                  "anterior": _kpis(anterior["mes"])})
+
+        receita = atual["mes"]["total"]
+        self.mensal = pd.DataFrame({
+            "atual": receita,
+            "anterior": anterior["mes"]["total"]
+                        .reindex(receita.index - self.deslocamento).to_numpy(),
+        })
+
+        self.por_dimensao = {}
+        for dim in DIMENSOES:
+            tabela = pd.DataFrame({
+                "atual": atual[dim].groupby(dim)["total"].sum(),
+                "anterior": anterior[dim].groupby(dim)["total"].sum(),
+            }).fillna(0).sort_values(["atual", "anterior"], ascending=False, kind="stable")
+            self.por_dimensao[dim] = tabela
+
+    def conferir(self, kpis):
+        """Confere os KPIs do período atual com os da capa (`Agregados.kpis()`)."""
+        capa = {"Receita": kpis["total_geral"], "Transações": kpis["total_transacoes"],
+                "Ticket Médio": kpis["ticket_medio"], "Qtd Vendida": kpis["qtd_total"]}
+        for nome, valor in capa.items():
+            atual = self.kpis.at[nome, "atual"]
+            if not np.isclose(atual, valor, rtol=1e-9, atol=1e-6):
+                raise ValueError(f"comparativo inconsistente com a capa: {nome} "
+                                 f"{atual:,.2f} contra {valor:,.2f}")
+
+    @property
+    def ano_contra_ano(self):
+        return self.deslocamento == 12
+
+    def descricao(self):
+        """Frase que explica contra o que cada mês foi comparado."""
+        if self.ano_contra_ano:
+            modo = "cada mês contra o mesmo mês do ano anterior (YoY)"
+        elif self.deslocamento == 0:
+            modo = "cada mês contra o mesmo mês"
+        else:
+            sentido = "antes" if self.deslocamento > 0 else "depois"
+            modo = (f"cada mês contra o mês equivalente do outro período "
+                    f"({abs(self.deslocamento)} meses {sentido})")
+        fonte = f", agregados de {self.fonte_anterior}" if self.fonte_anterior else ""
+        return (f"{self.periodo_atual} comparado com {self.periodo_anterior}{fonte}: {modo}. "
+                f"Do outro período só entram os meses correspondentes aos deste relatório.")
@@ -0,0 +1,242 @@
+"""Geração em lote: um PDF por vendedor, por região ou por filtro.
+
+O CSV é lido e agregado uma única vez; cada relatório é um recorte do
+cubo base, renderizado num pool de processos. Os KPIs da empresa inteira
+são calculados uma vez e entram na capa de cada recorte como comparativo.
+
+    python report_batch.py --by vendedor -o relatorios/
+    python report_batch.py --filter regiao=Sul --filter "vendedor=Ana Silva,regiao=Sudeste"
+
+Ao final é gravado um `manifest.json` no diretório de saída com os
+arquivos gerados e os tempos de cada etapa.
+"""
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import chart_cache
+import data_cache
+import generate_report as gr
+
+
+def slug(texto):
+    """Versão ASCII, minúscula e sem espaços de `texto`, para nomes de arquivo."""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-")
+
+
+def parse_filtro(texto):
+    """'regiao=Sul,vendedor=Ana Silva' → {'regiao': 'Sul', 'vendedor': 'Ana Silva'}."""
+    filtro = {}
+    for parte in texto.split(","):
+        dim, sep, valor = parte.partition("=")
+        dim = dim.strip()
+        if not sep or dim not in gr.DIMENSOES:
+            raise argparse.ArgumentTypeError(
+                f"filtro inválido {parte!r}: use dimensão=valor, com dimensão em {gr.DIMENSOES}")
+        valor = valor.strip()
+        if not valor:
+            raise argparse.ArgumentTypeError(f"filtro inválido {parte!r}: valor vazio")
+        if dim == "mes":
+            try:
+                gr.pd.Period(valor, freq="M")
+            except ValueError:
+                raise argparse.ArgumentTypeError(
+                    f"filtro inválido {parte!r}: o mês vai como AAAA-MM") from None
+        filtro[dim] = valor
+    return filtro
+
+
+def recortes_por_dimensao(cubo, dim):
+    """Um filtro por valor distinto de `dim` presente no cubo."""
+    return [{dim: valor} for valor in sorted(cubo[dim].unique())]
+
+
+ROTULOS = {"mes": "Mês", "categoria": "Categoria", "produto": "Produto",
+           "vendedor": "Vendedor", "regiao": "Região"}
+
+
+def rotulo(filtro):
+    return "  ·  ".join(f"{ROTULOS[dim]}: {valor}" for dim, valor in filtro.items())
+
+
+def nome_arquivo(filtro):
+    partes = [f"{dim}-{slug(valor)}" for dim, valor in filtro.items()]
+    return "relatorio_" + "_".join(partes) + ".pdf"
+
+
+def gerar_recorte(job):
+    """Gera o PDF de um recorte; roda dentro de um processo do pool."""
+    filtro, subcubo, empresa, fonte, destino, cache_dir, cache_bytes, formato, top, orcamento = job
+    t0 = time.perf_counter()
+    ag = gr.Agregados(subcubo)
+    t1 = time.perf_counter()
+    cache = chart_cache.CacheGraficos(cache_dir, cache_bytes) if cache_dir else None
+    imagens = gr.renderizar_graficos(gr.tarefas_graficos(ag), workers=1, cache=cache,
+                                     formato=formato)
+    if orcamento is not None:
+        import indexed_images
+        imagens, _ = indexed_images.aplicar_orcamento(imagens, orcamento)
+    t2 = time.perf_counter()
+    story = gr.montar_story(ag, fonte, imagens, recorte=rotulo(filtro), empresa=empresa,
+                            top=top)
+    gr.gerar_pdf(story, destino, titulo=gr.titulo_relatorio(ag.monthly.index))
+    t3 = time.perf_counter()
+    return {
+        "filtro": filtro,
+        "arquivo": destino,
+        "receita": float(ag.total_geral),
+        "transacoes": ag.total_transacoes,
+        "tempos": {
+            "agregados": round(t1 - t0, 4),
+            "graficos": round(t2 - t1, 4),
+            "pdf": round(t3 - t2, 4),
+            "total": round(t3 - t0, 4),
+        },
+    }
+
+
+def gerar_lote(entrada, filtros=None, por=None, destino="relatorios",
+               workers=None, usar_cache=True, cache_dir=data_cache.DIRETORIO_CACHE,
+               cache_mb=64, formato="png", esquema="padrao", backend="pandas", top=None,
+               orcamento_kb=None):
+    """Gera um relatório por recorte e devolve o manifesto (também gravado em disco).
+
+    Com `orcamento_kb` (só no formato "indexado") as imagens de cada PDF
+    são reduzidas até caberem nesse limite.
+    """
+    if orcamento_kb is not None and formato != "indexado":
+        raise ValueError("o orçamento de imagens precisa do formato indexado")
+    if por is not None and por not in gr.DIMENSOES:
+        raise ValueError(f"dimensão desconhecida: {por!r} (use uma de {gr.DIMENSOES})")
+    inicio = time.perf_counter()
+    arquivos = gr.expandir_entradas(entrada)
+    if backend != "pandas":
+        import sql_backend
+        # no SQL carga e agregação são uma coisa só
+        cubo = sql_backend.construir_cubo_sql(arquivos, backend)
+        t_carga = time.perf_counter()
+    elif len(arquivos) > 1:
+        cubo = gr.cubo_de_arquivos(arquivos, workers, esquema)
+        t_carga = time.perf_counter()
+    else:
+        if usar_cache:
+            df = data_cache.carregar_com_cache(
+                entrada, partial(gr.carregar_dados, esquema=esquema),
+                os.path.join(cache_dir, "dados"), esquema)
+        else:
+            df = gr.carregar_dados(entrada, esquema)
+        t_carga = time.perf_counter()
+        cubo = gr.construir_cubo(df)
+        del df
+    empresa = gr.Agregados(cubo).kpis()
+    t_cubo = time.perf_counter()
+
+    if por:
+        filtros = recortes_por_dimensao(cubo, por)
+    if not filtros:
+        raise ValueError("informe --by ou ao menos um --filter")
+
+    os.makedirs(destino, exist_ok=True)
+    fonte = os.path.basename(os.path.normpath(entrada))
+    graficos_dir = os.path.join(cache_dir, "graficos") if usar_cache else None
+    jobs = []
+    for filtro in filtros:
+        subcubo = gr.filtrar_cubo(cubo, filtro)
+        if subcubo.empty:
+            print(f"Recorte sem vendas, ignorado: {rotulo(filtro)}")
+            continue
+        jobs.append((filtro, subcubo, empresa, fonte,
+                     os.path.join(destino, nome_arquivo(filtro)),
+                     graficos_dir, int(cache_mb * 1024 * 1024), formato, top,
+                     None if orcamento_kb is None else int(orcamento_kb * 1024)))
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1) or 1
+    if workers <= 1:
+        resultados = [gerar_recorte(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(gerar_recorte, job) for job in jobs]
+            resultados = [f.result() for f in as_completed(futuros)]
+        resultados.sort(key=lambda r: r["arquivo"])
+    fim = time.perf_counter()
+
+    manifesto = {
+        "entrada": os.path.abspath(entrada),
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": workers,
+        "tempos": {
+            "carga": round(t_carga - inicio, 4),
+            "cubo": round(t_cubo - t_carga, 4),
+            "recortes": round(fim - t_cubo, 4),
+            "total": round(fim - inicio, 4),
+        },
+        "relatorios": resultados,
+    }
+    with open(os.path.join(destino, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2, default=str)
+    return manifesto
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera um relatório de vendas em PDF por recorte (vendedor, região...).")
+    parser.add_argument("entrada", nargs="?", default=gr.ARQUIVO_ENTRADA,
+                        help=f"CSV de vendas (padrão: {gr.ARQUIVO_ENTRADA})")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--by", choices=gr.DIMENSOES,
+                       help="gera um relatório para cada valor desta dimensão")
+    grupo.add_argument("--filter", dest="filtros", action="append", type=parse_filtro,
+                       metavar="DIM=VALOR[,DIM=VALOR]",
+                       help="um relatório por filtro; pode ser repetido")
+    parser.add_argument("-o", "--output-dir", default="relatorios",
+                        help="diretório dos PDFs e do manifest.json (padrão: relatorios)")
+    parser.add_argument("--charts", choices=gr.FORMATOS_GRAFICO, default="png",
+                        help="gráficos em PNG a 150 dpi, vetoriais ou PNG de paleta (padrão: png)")
+    parser.add_argument("--image-budget", type=float, default=None, metavar="KB",
+                        help="com --charts indexado, limite de bytes das imagens de cada PDF")
+    parser.add_argument("-j", "--workers", type=int, default=None, metavar="N",
+                        help="processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--schema", choices=gr.ESQUEMAS, default="padrao",
+                        help="esquema de leitura do CSV (veja generate_report.py --help)")
+    parser.add_argument("--backend", choices=gr.BACKENDS, default="pandas",
+                        help="motor da agregação (veja generate_report.py --help)")
+    parser.add_argument("--top", type=int, default=None, metavar="N",
+                        help="tabelas de produtos e vendedores só com os N maiores (+ \"Outros\")")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignora os caches de dados e de gráficos")
+    parser.add_argument("--cache-dir", default=data_cache.DIRETORIO_CACHE,
+                        help=f"diretório dos caches (padrão: {data_cache.DIRETORIO_CACHE})")
+    args = parser.parse_args(argv)
+    try:
+        _validar(args)
+    except gr.ErroRelatorio as e:
+        parser.error(str(e))
+    return args
+
+
+def _validar(args):
+    """Checa as opções com o `_validar` do generate_report, com os padrões dele no resto."""
+    opcoes = vars(gr._parser().parse_args([]))
+    opcoes.update((chave, valor) for chave, valor in vars(args).items() if chave in opcoes)
+    gr._validar(argparse.Namespace(**opcoes))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifesto = gerar_lote(args.entrada, filtros=args.filtros, por=args.by,
+                           destino=args.output_dir, workers=args.workers,
+                           usar_cache=not args.no_cache, cache_dir=args.cache_dir,
+                           formato=args.charts, esquema=args.schema,
+                           backend=args.backend, top=args.top, orcamento_kb=args.image_budget)
+    print(f"{len(manifesto['relatorios'])} relatorios gerados em "
+          f"{manifesto['tempos']['total']:.2f}s: {args.output_dir}/manifest.json")
+
+
+if __name__ == "__main__":
+    main()
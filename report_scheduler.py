@@ -0,0 +1,565 @@
+"""Agendador asyncio de relatórios: parte justa por cliente, contrapressão e métricas.
+
+Os relatórios de muitos clientes passam por um `Agendador`, que os roda
+num pool de processos com os imports já carregados (o mesmo forkserver
+do `report_server.py`). Cada relatório roda inteiro num processo:
+carga, agregação, gráficos e `doc.build` usam o cubo e as imagens em
+memória, e separar as etapas em processos diferentes custaria serializar
+tudo entre elas. O laço asyncio só decide a ordem e acompanha os jobs.
+
+- Justiça: cada cliente tem sua fila (por prioridade, depois ordem de
+  chegada) e o próximo processo livre vai para o cliente que menos usou
+  os processos, em segundos de execução divididos pelo seu peso. Um job
+  é cobrado pela duração estimada ao começar e acertado ao terminar,
+  então quem envia cem jobs de uma vez não ocupa todos os processos; um
+  cliente que volta de um período ocioso não acumula crédito.
+- Contrapressão: a fila tem `capacidade` jobs no total (e, se dado,
+  `limite_por_cliente`). `enviar` espera vaga; com `bloquear=False`
+  levanta `FilaCheia` na hora.
+- Cancelamento e prazo: `Tarefa.cancelar()` e `timeout` (contado desde
+  o envio) tiram o job da fila ou, se já está rodando, matam o processo,
+  que é substituído por outro.
+- Métricas: profundidade da fila, jobs em execução, percentis de
+  latência e de espera, vazão e contadores, em `metricas()` ou no
+  formato do Prometheus.
+
+    python report_scheduler.py pedidos.jsonl -w 2 --capacity 50 --metrics agendador.prom
+
+Cada linha de `pedidos.jsonl` é um job: {"cliente", "entrada", "saida",
+"opcoes", "prioridade", "timeout"}; só "entrada" e "saida" são obrigatórios.
+"""
+import argparse
+import asyncio
+import functools
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+import uuid
+from collections import deque
+
+ESTIMATIVA_INICIAL = 1.0   # segundos de um job de cliente ainda sem histórico
+SUAVIZACAO         = 0.3   # peso da última duração na média móvel de cada cliente
+JANELA_LATENCIAS   = 1000  # jobs recentes usados nos percentis
+JANELA_VAZAO_S     = 60.0
+PERCENTIS          = (0.5, 0.9, 0.99)
+
+
+class ErroAgendador(Exception):
+    """Pedido recusado ou job que não terminou bem no agendador."""
+
+
+class FilaCheia(ErroAgendador):
+    """A fila (ou a parte do cliente) está no limite e o envio não quis esperar."""
+
+
+class FalhaRelatorio(ErroAgendador):
+    """O relatório levantou um erro no processo que o gerava."""
+
+
+# ── PROCESSOS ─────────────────────────────────────────────────────────────────
+def _laco_trabalhador(conexao):
+    """Corpo de cada processo do pool: aquece e gera os relatórios recebidos."""
+    import report_server
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # o Ctrl+C é tratado pelo agendador
+    report_server._aquecer()
+    conexao.send(("pronto", os.getpid()))
+    while True:
+        try:
+            entrada, saida, opcoes = conexao.recv()
+        except EOFError:
+            return
+        try:
+            conexao.send(("ok", report_server._executar(entrada, saida, opcoes)))
+        except (Exception, SystemExit) as e:
+            conexao.send(("erro", f"{type(e).__name__}: {e}"))
+
+
+class _Trabalhador:
+    """Um processo do pool e a ponta do pipe do lado do agendador."""
+
+    def __init__(self, contexto):
+        self.conexao, filho = contexto.Pipe()
+        self.processo = contexto.Process(target=_laco_trabalhador, args=(filho,), daemon=True)
+        self.processo.start()
+        filho.close()
+        self.morto = False
+
+    async def _receber(self):
+        loop = asyncio.get_running_loop()
+        pronto = loop.create_future()
+        fd = self.conexao.fileno()
+        loop.add_reader(fd, lambda: pronto.done() or pronto.set_result(None))
+        try:
+            await pronto
+        finally:
+            loop.remove_reader(fd)
+        try:
+            return self.conexao.recv()
+        except EOFError:
+            self.morto = True
+            self.processo.join()
+            return ("erro", f"processo {self.processo.pid} terminou com código "
+                            f"{self.processo.exitcode}")
+
+    async def aquecer(self):
+        tipo, valor = await self._receber()
+        if tipo != "pronto":
+            raise ErroAgendador(f"processo do pool não subiu: {valor}")
+
+    async def executar(self, entrada, saida, opcoes):
+        try:
+            self.conexao.send((entrada, saida, opcoes))
+        except OSError as e:
+            self.morto = True
+            return ("erro", f"processo {self.processo.pid} inacessível: {e}")
+        return await self._receber()
+
+    async def encerrar(self, matar=False):
+        if matar:
+            self.processo.kill()
+        self.conexao.close()  # sem pedidos, o laço do processo termina
+        await asyncio.get_running_loop().run_in_executor(None, self.processo.join)
+
+
+# ── JOBS ──────────────────────────────────────────────────────────────────────
+class Tarefa:
+    """Um relatório enviado ao agendador; `await tarefa` devolve o resumo do relatório.
+
+    Termina em "concluido", "erro" (`FalhaRelatorio`), "cancelado"
+    (`asyncio.CancelledError`) ou "expirado" (`TimeoutError`).
+    """
+
+    def __init__(self, cliente, entrada, saida, opcoes, prioridade, prazo, seq):
+        self.id         = uuid.uuid4().hex[:12]
+        self.cliente    = cliente
+        self.entrada    = entrada
+        self.saida      = saida
+        self.opcoes     = opcoes
+        self.prioridade = prioridade
+        self.prazo      = prazo  # time.monotonic() limite, ou None
+        self.seq        = seq
+        self.estado     = "na_fila"
+        self.enviada    = time.monotonic()
+        self.iniciada   = None
+        self.terminada  = None
+        self.cobrado    = 0.0  # serviço cobrado do cliente ao começar
+        self.futuro     = asyncio.get_running_loop().create_future()
+        self._agendador = None
+        self._execucao  = None  # task asyncio enquanto roda
+        self._motivo    = "cancelado"  # estado final se `_execucao` for cancelada
+
+    def __await__(self):
+        return self.futuro.__await__()
+
+    def cancelar(self):
+        """Tira o job da fila ou interrompe o processo que o gera."""
+        if self.estado == "na_fila":
+            self._agendador._encerrar_na_fila(self, "cancelado")
+        elif self.estado == "executando":
+            self._motivo = "cancelado"
+            self._execucao.cancel()
+
+    def como_dict(self):
+        d = {"id": self.id, "cliente": self.cliente, "estado": self.estado,
+             "entrada": self.entrada, "saida": self.saida, "prioridade": self.prioridade}
+        if self.iniciada is not None:
+            d["espera_s"] = self.iniciada - self.enviada
+        if self.terminada is not None:
+            d["latencia_s"] = self.terminada - self.enviada
+        if self.futuro.done() and not self.futuro.cancelled():
+            erro = self.futuro.exception()
+            if erro is None:
+                d["resultado"] = self.futuro.result()
+            else:
+                d["erro"] = str(erro) or type(erro).__name__
+        return d
+
+
+def _percentis(valores):
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    return {f"p{round(p * 100)}": ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+            for p in PERCENTIS}
+
+
+# ── AGENDADOR ─────────────────────────────────────────────────────────────────
+class Agendador:
+    """Fila de relatórios por cliente sobre `trabalhadores` processos.
+
+    `pesos` dá a parte de cada cliente ({"acme": 2} recebe o dobro dos
+    demais, que pesam 1). `timeout` é o prazo padrão de cada job, em
+    segundos desde o envio. Use com `async with`, ou `iniciar`/`encerrar`.
+    """
+
+    def __init__(self, trabalhadores=None, capacidade=100, limite_por_cliente=None,
+                 pesos=None, timeout=None):
+        self.trabalhadores      = trabalhadores or os.cpu_count() or 1
+        self.capacidade         = capacidade
+        self.limite_por_cliente = limite_por_cliente
+        self.pesos              = dict(pesos or {})
+        self.timeout            = timeout
+        self._filas       = {}  # cliente → heap de (-prioridade, seq, tarefa)
+        self._na_fila     = {}  # cliente → jobs ainda na fila
+        self._executando  = {}  # cliente → jobs rodando
+        self._servico     = {}  # cliente → segundos de processo / peso
+        self._estimativa  = {}  # cliente → duração média recente
+        self._livres      = []
+        self._seq         = itertools.count()
+        self._tarefas     = set()
+        self._trocas      = set()  # processos sendo substituídos
+        self._despachante = None
+        self._contexto    = None
+        self._mudou       = None
+        self._vaga        = None
+        self._inicio      = None
+        self._latencias   = deque(maxlen=JANELA_LATENCIAS)
+        self._esperas     = deque(maxlen=JANELA_LATENCIAS)
+        self._conclusoes  = deque()
+        self.contadores   = dict.fromkeys(
+            ("enviados", "concluidos", "erros", "cancelados", "expirados", "recusados",
+             "esperas_por_vaga", "processos_substituidos"), 0)
+
+    async def __aenter__(self):
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, tipo, erro, tb):
+        await self.encerrar(esperar=tipo is None)
+
+    async def iniciar(self):
+        contexto = multiprocessing.get_context("forkserver")
+        contexto.set_forkserver_preload(["generate_report", "pandas", "matplotlib.pyplot"])
+        self._contexto = contexto
+        self._mudou  = asyncio.Event()
+        self._vaga   = asyncio.Condition()
+        self._inicio = time.monotonic()
+        loop = asyncio.get_running_loop()
+        novos = []
+        try:
+            for _ in range(self.trabalhadores):
+                novos.append(await loop.run_in_executor(None, _Trabalhador, contexto))
+            await asyncio.gather(*(t.aquecer() for t in novos))
+        except BaseException:
+            # o `async with` não chama `__aexit__` se a entrada falha
+            await asyncio.gather(*(t.encerrar(matar=True) for t in novos),
+                                 return_exceptions=True)
+            raise
+        self._livres.extend(novos)
+        self._despachante = asyncio.create_task(self._despachar())
+
+    async def encerrar(self, esperar=True):
+        """Para o agendador: com `esperar`, depois de terminar todos os jobs; senão cancela."""
+        if esperar:
+            while self._tarefas:
+                await asyncio.wait([t.futuro for t in list(self._tarefas)])
+        else:
+            for tarefa in list(self._tarefas):
+                tarefa.cancelar()
+            while self._tarefas:
+                await asyncio.sleep(0.01)
+        if self._despachante is not None:  # None se `iniciar` não rodou ou falhou
+            self._despachante.cancel()
+            await asyncio.gather(self._despachante, return_exceptions=True)
+            self._despachante = None
+        await asyncio.gather(*self._trocas, return_exceptions=True)
+        await asyncio.gather(*(t.encerrar() for t in self._livres))
+        self._livres.clear()
+
+    # ── envio ────────────────────────────────────────────────────────────────
+    def _cabe(self, cliente):
+        total = sum(self._na_fila.values())
+        return total < self.capacidade and (
+            self.limite_por_cliente is None
+            or self._na_fila.get(cliente, 0) < self.limite_por_cliente)
+
+    async def enviar(self, cliente, entrada, saida, opcoes=None, prioridade=0,
+                     timeout=None, bloquear=True):
+        """Enfileira um relatório de `cliente`; devolve a `Tarefa`.
+
+        Com a fila cheia espera uma vaga (contrapressão) ou, com
+        `bloquear=False`, levanta `FilaCheia`. `prioridade` maior passa à
+        frente dos outros jobs do mesmo cliente, não dos outros clientes.
+        """
+        async with self._vaga:
+            if not self._cabe(cliente):
+                if not bloquear:
+                    self.contadores["recusados"] += 1
+                    raise FilaCheia(f"fila cheia para {cliente!r} "
+                                    f"({sum(self._na_fila.values())}/{self.capacidade})")
+                self.contadores["esperas_por_vaga"] += 1
+                await self._vaga.wait_for(lambda: self._cabe(cliente))
+            opcoes = dict(opcoes or {})
+            opcoes.setdefault("workers", 1)  # aqui os jobs já são a unidade de paralelismo
+            timeout = self.timeout if timeout is None else timeout
+            prazo = None if timeout is None else time.monotonic() + timeout
+            tarefa = Tarefa(cliente, os.path.abspath(entrada), os.path.abspath(saida),
+                            opcoes, prioridade, prazo, next(self._seq))
+            tarefa._agendador = self
+            if not self._na_fila.get(cliente) and not self._executando.get(cliente):
+                self._ativar(cliente)
+            heapq.heappush(self._filas.setdefault(cliente, []),
+                           (-prioridade, tarefa.seq, tarefa))
+            self._na_fila[cliente] = self._na_fila.get(cliente, 0) + 1
+            self._tarefas.add(tarefa)
+            self.contadores["enviados"] += 1
+            if prazo is not None:
+                asyncio.get_running_loop().call_later(timeout, self._expirar, tarefa)
+        self._mudou.set()
+        return tarefa
+
+    def _ativar(self, cliente):
+        """Cliente que volta a ter jobs entra no nível dos ativos, sem crédito acumulado."""
+        ativos = [self._servico[c] for c in self._servico
+                  if c != cliente and (self._na_fila.get(c) or self._executando.get(c))]
+        atual = self._servico.get(cliente, 0.0)
+        self._servico[cliente] = max(atual, min(ativos)) if ativos else atual
+
+    def _expirar(self, tarefa):
+        if tarefa.estado == "na_fila":
+            self._encerrar_na_fila(tarefa, "expirado")
+        elif tarefa.estado == "executando":
+            tarefa._motivo = "expirado"
+            tarefa._execucao.cancel()
+
+    def _encerrar_na_fila(self, tarefa, estado):
+        # a entrada no heap fica e é descartada quando chegar ao topo
+        self._na_fila[tarefa.cliente] -= 1
+        self._finalizar(tarefa, estado)
+        asyncio.get_running_loop().create_task(self._avisar_vaga())
+
+    async def _avisar_vaga(self):
+        async with self._vaga:
+            self._vaga.notify_all()
+
+    # ── despacho ─────────────────────────────────────────────────────────────
+    def _proximo(self):
+        """Tarefa do cliente com menos serviço (empate: o job mais antigo), ou None."""
+        melhor = None
+        for cliente, fila in self._filas.items():
+            while fila and fila[0][2].estado != "na_fila":
+                heapq.heappop(fila)
+            if fila:
+                chave = (self._servico.get(cliente, 0.0), fila[0][2].seq)
+                if melhor is None or chave < melhor[0]:
+                    melhor = (chave, cliente)
+        if melhor is None:
+            return None
+        return heapq.heappop(self._filas[melhor[1]])[2]
+
+    async def _despachar(self):
+        while True:
+            while self._livres:
+                tarefa = self._proximo()
+                if tarefa is None:
+                    break
+                self._na_fila[tarefa.cliente] -= 1
+                trabalhador = self._livres.pop()
+                tarefa.estado   = "executando"
+                tarefa.iniciada = time.monotonic()
+                self._esperas.append(tarefa.iniciada - tarefa.enviada)
+                estimativa = self._estimativa.get(tarefa.cliente, ESTIMATIVA_INICIAL)
+                tarefa.cobrado = estimativa / self.pesos.get(tarefa.cliente, 1)
+                self._servico[tarefa.cliente] = self._servico.get(tarefa.cliente, 0.0) + tarefa.cobrado
+                self._executando[tarefa.cliente] = self._executando.get(tarefa.cliente, 0) + 1
+                tarefa._execucao = asyncio.create_task(self._rodar(tarefa, trabalhador))
+                tarefa._execucao.add_done_callback(
+                    functools.partial(self._terminou, tarefa, trabalhador))
+                await self._avisar_vaga()
+            self._mudou.clear()
+            await self._mudou.wait()
+
+    async def _rodar(self, tarefa, trabalhador):
+        tipo, resultado = await trabalhador.executar(tarefa.entrada, tarefa.saida,
+                                                     tarefa.opcoes)
+        return ("concluido" if tipo == "ok" else "erro"), resultado
+
+    def _terminou(self, tarefa, trabalhador, execucao):
+        """Fecha o job quando a task acaba, inclusive se cancelada antes do primeiro passo."""
+        if execucao.cancelled():
+            estado, resultado = tarefa._motivo, None
+        elif execucao.exception() is not None:
+            erro = execucao.exception()
+            estado, resultado = "erro", f"{type(erro).__name__}: {erro}"
+        else:
+            estado, resultado = execucao.result()
+        duracao = time.monotonic() - tarefa.iniciada
+        cliente = tarefa.cliente
+        self._executando[cliente] -= 1
+        # acerta a cobrança pela duração real
+        peso = self.pesos.get(cliente, 1)
+        self._servico[cliente] += duracao / peso - tarefa.cobrado
+        anterior = self._estimativa.get(cliente, duracao)
+        self._estimativa[cliente] = (1 - SUAVIZACAO) * anterior + SUAVIZACAO * duracao
+        self._finalizar(tarefa, estado, resultado)
+        if (not execucao.cancelled() and execucao.exception() is None
+                and not trabalhador.morto):
+            self._livres.append(trabalhador)
+        else:
+            substituicao = asyncio.create_task(self._substituir(trabalhador))
+            self._trocas.add(substituicao)
+            substituicao.add_done_callback(self._trocas.discard)
+        self._mudou.set()
+
+    async def _substituir(self, trabalhador):
+        """Mata o processo de um job interrompido e põe um novo, aquecido, no lugar."""
+        await trabalhador.encerrar(matar=True)
+        novo = await asyncio.get_running_loop().run_in_executor(None, _Trabalhador,
+                                                                 self._contexto)
+        await novo.aquecer()
+        self.contadores["processos_substituidos"] += 1
+        self._livres.append(novo)
+        self._mudou.set()
+
+    def _finalizar(self, tarefa, estado, resultado=None):
+        tarefa.estado    = estado
+        tarefa.terminada = time.monotonic()
+        self._tarefas.discard(tarefa)
+        if estado == "concluido":
+            self.contadores["concluidos"] += 1
+            self._latencias.append(tarefa.terminada - tarefa.enviada)
+            self._conclusoes.append(tarefa.terminada)
+            tarefa.futuro.set_result(resultado)
+        elif estado == "erro":
+            self.contadores["erros"] += 1
+            tarefa.futuro.set_exception(FalhaRelatorio(resultado))
+        elif estado == "expirado":
+            self.contadores["expirados"] += 1
+            tarefa.futuro.set_exception(TimeoutError(f"job {tarefa.id} passou do prazo"))
+        else:
+            self.contadores["cancelados"] += 1
+            tarefa.futuro.cancel()
+
+    # ── métricas ─────────────────────────────────────────────────────────────
+    def metricas(self):
+        agora = time.monotonic()
+        while self._conclusoes and self._conclusoes[0] < agora - JANELA_VAZAO_S:
+            self._conclusoes.popleft()
+        janela = min(JANELA_VAZAO_S, agora - self._inicio) if self._inicio else 0
+        return {
+            "fila": sum(self._na_fila.values()),
+            "capacidade": self.capacidade,
+            "executando": sum(self._executando.values()),
+            "trabalhadores": self.trabalhadores,
+            "fila_por_cliente": {c: n for c, n in self._na_fila.items() if n},
+            "servico_por_cliente_s": dict(self._servico),
+            "latencia_s": _percentis(self._latencias),
+            "espera_s": _percentis(self._esperas),
+            "vazao_por_s": len(self._conclusoes) / janela if janela > 0 else 0.0,
+            **self.contadores,
+        }
+
+    def como_prometheus(self, prefixo="agendador"):
+        m = self.metricas()
+        linhas = []
+
+        def serie(nome, tipo, ajuda, valores):
+            linhas.append(f"# HELP {prefixo}_{nome} {ajuda}")
+            linhas.append(f"# TYPE {prefixo}_{nome} {tipo}")
+            for rotulos, valor in valores:
+                linhas.append(f"{prefixo}_{nome}{rotulos} {valor:g}")
+
+        serie("fila", "gauge", "Jobs na fila", [("", m["fila"])])
+        serie("fila_cliente", "gauge", "Jobs na fila por cliente",
+              [(f'{{cliente="{c}"}}', n) for c, n in m["fila_por_cliente"].items()])
+        serie("executando", "gauge", "Jobs em execução", [("", m["executando"])])
+        serie("vazao_por_segundo", "gauge",
+              f"Jobs concluídos por segundo nos últimos {JANELA_VAZAO_S:g} s",
+              [("", m["vazao_por_s"])])
+        for chave, ajuda in (("latencia_s", "Do envio ao fim do job"),
+                             ("espera_s", "Do envio ao início do job")):
+            serie(f"{chave[:-2]}_segundos", "gauge", ajuda,
+                  [(f'{{quantile="{int(p[1:]) / 100:g}"}}', v) for p, v in m[chave].items()])
+        serie("jobs_total", "counter", "Jobs por desfecho",
+              [(f'{{desfecho="{c}"}}', m[c]) for c in
+               ("enviados", "concluidos", "erros", "cancelados", "expirados", "recusados")])
+        return "\n".join(linhas) + "\n"
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+def _ler_pesos(itens):
+    pesos = {}
+    for item in itens or []:
+        cliente, _, peso = item.partition("=")
+        try:
+            pesos[cliente] = float(peso)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"peso inválido: {item!r} (use CLIENTE=PESO)")
+        if pesos[cliente] <= 0:
+            raise argparse.ArgumentTypeError(f"peso precisa ser positivo: {item!r}")
+    return pesos
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pedidos", help="JSON lines com um job por linha (\"-\" = stdin)")
+    parser.add_argument("-w", "--workers", type=int, default=None, metavar="N",
+                        help="processos que geram relatórios (padrão: nº de CPUs)")
+    parser.add_argument("--capacity", type=int, default=100, metavar="N",
+                        help="jobs na fila; acima disso a leitura dos pedidos espera (padrão: 100)")
+    parser.add_argument("--per-tenant", type=int, default=None, metavar="N",
+                        help="jobs de um mesmo cliente na fila")
+    parser.add_argument("--weight", action="append", metavar="CLIENTE=PESO",
+                        help="parte de um cliente em relação aos demais (repetível)")
+    parser.add_argument("--timeout", type=float, default=None, metavar="S",
+                        help="prazo padrão de cada job, desde o envio")
+    parser.add_argument("--metrics", metavar="ARQUIVO",
+                        help="grava as métricas no fim (.prom = Prometheus, senão JSON)")
+    args = parser.parse_args(argv)
+    try:
+        args.pesos = _ler_pesos(args.weight)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    return args
+
+
+async def _processar(args, linhas):
+    async with Agendador(args.workers, args.capacity, args.per_tenant, args.pesos,
+                         args.timeout) as agendador:
+        for numero, linha in enumerate(linhas, 1):
+            if not linha.strip():
+                continue
+            try:
+                pedido = json.loads(linha)
+                tarefa = await agendador.enviar(
+                    pedido.get("cliente", "padrao"), pedido["entrada"], pedido["saida"],
+                    pedido.get("opcoes"), pedido.get("prioridade", 0), pedido.get("timeout"))
+            except (KeyError, ValueError, TypeError) as e:
+                print(f"linha {numero}: pedido inválido: {e}", flush=True)
+                continue
+            tarefa.futuro.add_done_callback(
+                lambda _f, t=tarefa: print(json.dumps(
+                    {k: v for k, v in t.como_dict().items() if k != "resultado"},
+                    ensure_ascii=False, default=str), flush=True))
+    m = agendador.metricas()
+    print(f"{m['concluidos']} concluídos, {m['erros']} com erro, {m['expirados']} expirados, "
+          f"{m['cancelados']} cancelados; latência p50 {m['latencia_s'].get('p50', 0):.2f}s "
+          f"p90 {m['latencia_s'].get('p90', 0):.2f}s", flush=True)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            if args.metrics.endswith((".prom", ".txt")):
+                f.write(agendador.como_prometheus())
+            else:
+                json.dump(m, f, indent=2)
+    return m
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.pedidos == "-":
+        import sys
+        m = asyncio.run(_processar(args, sys.stdin))
+    else:
+        with open(args.pedidos, encoding="utf-8") as f:
+            m = asyncio.run(_processar(args, f))
+    if m["erros"] or m["expirados"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
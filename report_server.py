@@ -0,0 +1,364 @@
+"""Serviço local de relatórios: imports e estilos já carregados e uma fila de jobs.
+
+Cada relatório pela CLI é um processo novo que importa pandas, matplotlib
+e ReportLab e monta as folhas de estilo antes de ler a primeira linha. O
+serviço faz isso uma vez: os jobs rodam num pool de processos criados a
+partir de um forkserver que já importou `generate_report`, e os workers
+são reaproveitados entre jobs. O número de processos limita quantos
+relatórios rodam ao mesmo tempo; os demais esperam na fila. Pedidos
+iguais (mesma entrada, saída e opções) feitos enquanto um job ainda não
+terminou recebem o mesmo job.
+
+    python report_server.py servir --port 8765 -c 2
+    python report_server.py servir --socket /tmp/relatorios.sock
+    python report_server.py enviar sales_data.csv -o relatorio.pdf --esperar 60
+
+API HTTP (JSON):
+
+    POST /relatorios       {"entrada": ..., "saida": ..., "opcoes": {...}}
+                           → 202 {"id": ..., "estado": "na_fila", "duplicado": false}
+                           → 503 {"erro": ..., "id": ...} se um worker morreu e
+                           o pool teve de ser recriado; o job não rodou
+    GET  /relatorios/<id>  estado do job; com ?esperar=S segura a resposta
+                           até o job terminar ou S segundos (até 60) passarem
+    GET  /saude            {"ok": true, ...}
+
+`opcoes` usa os nomes de `generate_report.gerar_relatorio`.
+"""
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PORTA_PADRAO   = 8765
+JOBS_GUARDADOS = 1000
+ESPERA_MAXIMA  = 60.0  # segundos que um GET com ?esperar= pode segurar a resposta
+
+
+def _aquecer():
+    """Primeira tarefa de cada worker: imports e uma figura (fontes, backend Agg)."""
+    import generate_report as gr
+
+    fig, ax = gr.plt.subplots(figsize=(2, 1))
+    ax.set_title("aquecimento")
+    gr.fig_to_png(fig)
+    return os.getpid()
+
+
+def _executar(entrada, saida, opcoes):
+    """Roda um job dentro de um worker do pool."""
+    import generate_report as gr
+
+    mensagens = []
+    resumo = gr.gerar_relatorio(entrada, saida, opcoes, log=mensagens.append)
+    resumo["mensagens"] = mensagens
+    return resumo
+
+
+class Job:
+    def __init__(self, id_, entrada, saida, opcoes):
+        self.id       = id_
+        self.entrada  = entrada
+        self.saida    = saida
+        self.opcoes   = opcoes
+        self.criado   = time.time()
+        self.futuro   = None
+        self.pedidos  = 1
+        self.terminou = threading.Event()
+
+    def estado(self):
+        if not self.futuro.done():
+            return "executando" if self.futuro.running() else "na_fila"
+        return "erro" if self.futuro.exception() is not None else "concluido"
+
+    def como_dict(self):
+        d = {"id": self.id, "estado": self.estado(), "entrada": self.entrada,
+             "saida": self.saida, "opcoes": self.opcoes, "pedidos": self.pedidos}
+        if self.futuro.done():
+            erro = self.futuro.exception()
+            if erro is None:
+                d["resultado"] = self.futuro.result()
+            else:
+                d["erro"] = f"{type(erro).__name__}: {erro}"
+        return d
+
+
+class PoolReiniciado(RuntimeError):
+    """O pool estava quebrado (um worker morreu): o job falhou e o pool foi recriado."""
+
+    def __init__(self, job):
+        super().__init__(f"o pool de processos caiu e foi recriado; job {job.id} não rodou")
+        self.job = job
+
+
+class FilaRelatorios:
+    """Fila de jobs sobre um pool de processos com imports pré-carregados."""
+
+    def __init__(self, concorrencia=2):
+        contexto = multiprocessing.get_context("forkserver")
+        # generate_report importa pandas e matplotlib sob demanda; aqui eles
+        # entram já no forkserver, para os workers herdarem os módulos prontos
+        contexto.set_forkserver_preload(["generate_report", "pandas", "matplotlib.pyplot"])
+        self.concorrencia = concorrencia
+        self._contexto    = contexto
+        self._pool        = self._novo_pool()
+        self._trava       = threading.Lock()
+        self._jobs        = {}
+        self._em_curso    = {}  # chave do pedido → id do job ainda não terminado
+
+    def _novo_pool(self):
+        pool = ProcessPoolExecutor(self.concorrencia, mp_context=self._contexto)
+        # sobe os workers já, em vez de no primeiro pedido
+        for futuro in [pool.submit(_aquecer) for _ in range(self.concorrencia)]:
+            futuro.result()
+        return pool
+
+    def _recriar_pool(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        try:
+            self._pool = self._novo_pool()
+        except BrokenProcessPool:
+            pass  # continua quebrado; o próximo envio tenta de novo
+
+    def enviar(self, entrada, saida, opcoes=None):
+        """Enfileira um relatório; devolve (job, duplicado).
+
+        Se o pool estiver quebrado, o job é dado como falho, o pool é
+        recriado e sai `PoolReiniciado`.
+        """
+        opcoes = dict(opcoes or {})
+        # neste pool os jobs já são a unidade de paralelismo
+        opcoes.setdefault("workers", 1)
+        entrada, saida = os.path.abspath(entrada), os.path.abspath(saida)
+        chave = json.dumps([entrada, saida, opcoes], sort_keys=True)
+        with self._trava:
+            id_ = self._em_curso.get(chave)
+            if id_ is not None:
+                job = self._jobs[id_]
+                job.pedidos += 1
+                return job, True
+            job = Job(uuid.uuid4().hex[:12], entrada, saida, opcoes)
+            self._jobs[job.id] = job
+            self._em_curso[chave] = job.id
+            try:
+                job.futuro = self._pool.submit(_executar, entrada, saida, opcoes)
+            except BrokenProcessPool as e:
+                job.futuro = Future()
+                job.futuro.set_exception(e)
+                del self._em_curso[chave]
+                job.terminou.set()
+                self._recriar_pool()
+                raise PoolReiniciado(job) from e
+            self._podar()
+        job.futuro.add_done_callback(partial(self._concluir, job, chave))
+        return job, False
+
+    def _concluir(self, job, chave, _futuro):
+        with self._trava:
+            self._em_curso.pop(chave, None)
+        job.terminou.set()
+
+    def _podar(self):
+        excesso = len(self._jobs) - JOBS_GUARDADOS
+        if excesso <= 0:
+            return
+        terminados = [j for j in self._jobs.values() if j.terminou.is_set()]
+        for job in sorted(terminados, key=lambda j: j.criado)[:excesso]:
+            del self._jobs[job.id]
+
+    def obter(self, id_):
+        with self._trava:
+            return self._jobs.get(id_)
+
+    def resumo(self):
+        with self._trava:
+            estados = [j.estado() for j in self._jobs.values()]
+        return {"concorrencia": self.concorrencia,
+                **{e: estados.count(e) for e in ("na_fila", "executando", "concluido", "erro")}}
+
+    def encerrar(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    fila = None  # definida em `servir`
+
+    def _responder(self, codigo, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/saude":
+            return self._responder(200, {"ok": True, "pid": os.getpid(), **self.fila.resumo()})
+        if url.path.startswith("/relatorios/"):
+            job = self.fila.obter(url.path.rsplit("/", 1)[-1])
+            if job is None:
+                return self._responder(404, {"erro": "job desconhecido"})
+            esperar = parse_qs(url.query).get("esperar")
+            if esperar:
+                try:
+                    segundos = float(esperar[0])
+                except ValueError:
+                    segundos = math.nan
+                if not math.isfinite(segundos):
+                    return self._responder(400, {"erro": f"esperar inválido: {esperar[0]!r}"})
+                job.terminou.wait(min(max(segundos, 0.0), ESPERA_MAXIMA))
+            return self._responder(200, job.como_dict())
+        self._responder(404, {"erro": "rota desconhecida"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/relatorios":
+            return self._responder(404, {"erro": "rota desconhecida"})
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+            pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+            job, duplicado = self.fila.enviar(pedido["entrada"], pedido["saida"],
+                                              pedido.get("opcoes"))
+        except (KeyError, ValueError, TypeError) as e:
+            return self._responder(400, {"erro": f"pedido inválido: {e}"})
+        except PoolReiniciado as e:
+            return self._responder(503, {"erro": str(e), "id": e.job.id})
+        self._responder(202, {"id": job.id, "estado": job.estado(), "duplicado": duplicado})
+
+    def address_string(self):
+        # em socket Unix não há endereço do cliente
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def servir(porta=PORTA_PADRAO, caminho_socket=None, concorrencia=2):
+    fila = FilaRelatorios(concorrencia)
+    Manipulador.fila = fila
+    if caminho_socket:
+        if os.path.exists(caminho_socket):
+            os.remove(caminho_socket)
+        servidor = ServidorUnix(caminho_socket, Manipulador)
+        onde = caminho_socket
+    else:
+        servidor = ThreadingHTTPServer(("127.0.0.1", porta), Manipulador)
+        onde = f"http://127.0.0.1:{porta}"
+    print(f"Servindo relatórios em {onde} ({concorrencia} em paralelo)", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        fila.encerrar()
+        if caminho_socket and os.path.exists(caminho_socket):
+            os.remove(caminho_socket)
+
+
+# ── CLIENTE ───────────────────────────────────────────────────────────────────
+class _ConexaoUnix(http.client.HTTPConnection):
+    def __init__(self, caminho, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.caminho = caminho
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.caminho)
+
+
+class Cliente:
+    """Cliente mínimo da API, por TCP local ou por socket Unix."""
+
+    def __init__(self, porta=PORTA_PADRAO, caminho_socket=None):
+        self.porta          = porta
+        self.caminho_socket = caminho_socket
+
+    def _pedir(self, metodo, rota, corpo=None):
+        if self.caminho_socket:
+            conexao = _ConexaoUnix(self.caminho_socket)
+        else:
+            conexao = http.client.HTTPConnection("127.0.0.1", self.porta)
+        try:
+            dados = json.dumps(corpo).encode() if corpo is not None else None
+            conexao.request(metodo, rota, body=dados,
+                            headers={"Content-Type": "application/json"})
+            resposta = conexao.getresponse()
+            return json.loads(resposta.read())
+        finally:
+            conexao.close()
+
+    def saude(self):
+        return self._pedir("GET", "/saude")
+
+    def enviar(self, entrada, saida, opcoes=None):
+        return self._pedir("POST", "/relatorios", {
+            "entrada": os.path.abspath(entrada), "saida": os.path.abspath(saida),
+            "opcoes": opcoes or {}})
+
+    def consultar(self, id_, esperar=None):
+        rota = f"/relatorios/{id_}" + (f"?esperar={esperar}" if esperar else "")
+        return self._pedir("GET", rota)
+
+    def gerar(self, entrada, saida, opcoes=None, timeout=600):
+        """Envia e espera o job terminar; devolve o estado final."""
+        job = self.enviar(entrada, saida, opcoes)
+        limite = time.monotonic() + timeout
+        while True:
+            estado = self.consultar(job["id"], esperar=min(30, max(limite - time.monotonic(), 0.1)))
+            if estado["estado"] in ("concluido", "erro") or time.monotonic() >= limite:
+                return estado
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="comando", required=True)
+    for nome in ("servir", "enviar"):
+        p = sub.add_parser(nome)
+        p.add_argument("--port", type=int, default=PORTA_PADRAO,
+                       help=f"porta TCP em 127.0.0.1 (padrão: {PORTA_PADRAO})")
+        p.add_argument("--socket", metavar="CAMINHO", help="usa um socket Unix em vez de TCP")
+        if nome == "servir":
+            p.add_argument("-c", "--concurrency", type=int, default=os.cpu_count() or 1,
+                           help="relatórios gerados ao mesmo tempo (padrão: nº de CPUs)")
+        else:
+            p.add_argument("entrada")
+            p.add_argument("-o", "--output", required=True)
+            p.add_argument("--opcoes", type=json.loads, default={},
+                           help='opções em JSON, ex.: \'{"charts": "vetor"}\'')
+            p.add_argument("--esperar", type=float, default=None, metavar="S",
+                           help="espera o job terminar (até S segundos)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.comando == "servir":
+        servir(args.port, args.socket, args.concurrency)
+        return
+    cliente = Cliente(args.port, args.socket)
+    if args.esperar:
+        resposta = cliente.gerar(args.entrada, args.output, args.opcoes, args.esperar)
+    else:
+        resposta = cliente.enviar(args.entrada, args.output, args.opcoes)
+    print(json.dumps(resposta, ensure_ascii=False, indent=2))
+    if resposta.get("estado") == "erro":
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
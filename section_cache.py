@@ -0,0 +1,47 @@
+"""Cache em disco das seções já diagramadas do relatório.
+
+Cada seção do story (capa, mensal, categorias, produtos, vendedores,
+regiões) é diagramada num PDF próprio, sem rodapé, e guardada sob um
+hash só do que ela usa: os valores listados para ela em
+`generate_report.DEPENDENCIAS_SECOES`, a assinatura do código que monta
+o relatório, o formato e o dpi dos gráficos, os `rcParams` e as versões
+do matplotlib e do ReportLab. Na execução seguinte só as seções cujas
+entradas mudaram são diagramadas de novo; as demais saem do disco e o
+PDF final é juntado por `generate_report.juntar_secoes`, que numera as
+páginas.
+
+O descarte é o mesmo do cache de gráficos: limite de bytes e LRU pelo
+mtime.
+"""
+import hashlib
+import pickle
+
+from chart_cache import CacheGraficos
+
+LIMITE_PADRAO = 64 * 1024 * 1024
+
+
+class CacheSecoes(CacheGraficos):
+    """PDFs de seções por chave de conteúdo, com limite de bytes e descarte LRU."""
+
+    def __init__(self, diretorio, assinatura, limite_bytes=LIMITE_PADRAO):
+        super().__init__(diretorio, limite_bytes)
+        self.assinatura = assinatura
+
+    def chave(self, secao, entradas, formato, dpi, rc_params=None):
+        """Hash de uma seção: o nome, as entradas de que ela depende e o ambiente."""
+        import matplotlib  # o chamador já o importou para renderizar os gráficos
+        import reportlab
+
+        if rc_params is None:
+            rc_params = matplotlib.rcParams
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"{secao}\n{self.assinatura}".encode())
+        h.update(pickle.dumps(entradas, protocol=5))
+        h.update(repr((formato, dpi)).encode())
+        h.update(repr(sorted(rc_params.items())).encode())
+        h.update(f"{matplotlib.__version__}\n{reportlab.Version}".encode())
+        return h.hexdigest()
+
+    def resumo(self):
+        return f"Cache de seções: {self.acertos} acertos, {self.faltas} faltas"
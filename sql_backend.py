@@ -0,0 +1,112 @@
+"""Backend SQL para a agregação: o cubo sai de um motor embutido, sem DataFrame.
+
+O relatório inteiro é derivado do cubo (veja `generate_report.construir_cubo`),
+então basta empurrar para o SQL o único GROUP BY sobre as linhas; o
+motor devolve só as células do cubo, cujo número depende dos grupos e não
+das linhas do arquivo. `Agregados` recebe esse cubo como recebe o do pandas.
+
+Motores:
+
+- "sqlite": da biblioteca padrão. O CSV é importado em lotes para um
+  banco temporário em disco e agregado lá; memória constante.
+- "duckdb": opcional (`pip install duckdb`). Lê o CSV, ou uma cópia em
+  Parquet (`.parquet`), direto do arquivo, em paralelo. Descomprime
+  gzip e zstd; `.bz2`, `.xz` e `.zip` são recusados (use o sqlite ou o
+  pandas).
+
+As datas precisam estar em ISO (AAAA-MM-DD), como no `sales_data.csv`.
+Com `resolucao="D"` a chave temporal do cubo é o dia em vez do mês.
+"""
+import csv
+import os
+import sqlite3
+import tempfile
+from itertools import islice
+
+import pandas as pd
+
+import generate_report as gr
+
+MOTORES = ("sqlite", "duckdb")
+COMPRESSOES_SEM_DUCKDB = (".bz2", ".xz", ".zip")
+COLUNAS = gr.COLUNAS_ENTRADA
+
+_SELECT_CUBO = """
+    SELECT {mes} AS mes, categoria, produto, vendedor, regiao,
+           SUM(quantidade * preco_unitario) AS total,
+           COUNT(*)                         AS transacoes,
+           SUM(quantidade)                  AS quantidade,
+           MIN(data)                        AS data_min,
+           MAX(data)                        AS data_max
+    FROM {origem}
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def _cubo_sqlite(caminhos, resolucao, lote=50_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        con = sqlite3.connect(os.path.join(tmp, "vendas.db"))
+        try:
+            con.execute("PRAGMA journal_mode = OFF")
+            con.execute("PRAGMA synchronous = OFF")
+            con.execute("""CREATE TABLE vendas (
+                data TEXT, produto TEXT, categoria TEXT, quantidade INTEGER,
+                preco_unitario REAL, vendedor TEXT, regiao TEXT)""")
+            for caminho in caminhos:
+                with gr.abrir_texto(caminho) as f:
+                    leitor = csv.DictReader(f)
+                    faltando = set(COLUNAS) - set(leitor.fieldnames or ())
+                    if faltando:
+                        raise ValueError(f"{caminho}: colunas ausentes: {sorted(faltando)}")
+                    linhas = ([r[c] for c in COLUNAS] for r in leitor)
+                    while bloco := list(islice(linhas, lote)):
+                        con.executemany("INSERT INTO vendas VALUES (?, ?, ?, ?, ?, ?, ?)", bloco)
+            tamanho = 10 if resolucao == "D" else 7
+            sql = _SELECT_CUBO.format(mes=f"substr(data, 1, {tamanho})", origem="vendas")
+            return pd.read_sql_query(sql, con)
+        finally:
+            con.close()
+
+
+def _cubo_duckdb(caminhos, resolucao):
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("O backend duckdb requer o pacote duckdb: pip install duckdb") from e
+    recusados = [c for c in caminhos if c.endswith(COMPRESSOES_SEM_DUCKDB)]
+    if recusados:
+        raise ValueError(f"o backend duckdb não lê {', '.join(COMPRESSOES_SEM_DUCKDB)}: "
+                         f"{', '.join(recusados)} (use --backend sqlite ou pandas)")
+    parquet = {c.endswith(".parquet") for c in caminhos}
+    if len(parquet) > 1:
+        raise ValueError("o backend duckdb não mistura arquivos Parquet e CSV")
+    # o DuckDB lê a lista de arquivos (e descomprime gzip/zstd) sozinho
+    leitura = "read_parquet" if parquet == {True} else "read_csv_auto"
+    formato = "%Y-%m-%d" if resolucao == "D" else "%Y-%m"
+    sql = _SELECT_CUBO.format(mes=f"strftime(CAST(data AS DATE), '{formato}')",
+                              origem=f"{leitura}(?)")
+    with duckdb.connect() as con:
+        return con.execute(sql, [list(caminhos)]).df()
+
+
+def construir_cubo_sql(caminhos, motor="sqlite", resolucao="M"):
+    """Cubo de um ou mais arquivos agregado pelo `motor`, nos tipos do cubo do pandas."""
+    if isinstance(caminhos, str):
+        caminhos = [caminhos]
+    construir = _cubo_sqlite if motor == "sqlite" else _cubo_duckdb
+    bruto = construir(caminhos, resolucao)
+    if bruto.empty:
+        raise ValueError(f"{', '.join(caminhos)}: nenhuma linha de dados")
+    cubo = pd.DataFrame({
+        "mes":        pd.PeriodIndex(bruto["mes"], freq=resolucao),
+        "categoria":  bruto["categoria"].astype(object),
+        "produto":    bruto["produto"].astype(object),
+        "vendedor":   bruto["vendedor"].astype(object),
+        "regiao":     bruto["regiao"].astype(object),
+        "total":      bruto["total"].astype("float64"),
+        "transacoes": bruto["transacoes"].astype("int64"),
+        "quantidade": bruto["quantidade"].astype("int64"),
+        "data_min":   pd.to_datetime(bruto["data_min"]),
+        "data_max":   pd.to_datetime(bruto["data_max"]),
+    })
+    return cubo.sort_values(gr.DIMENSOES, ignore_index=True)
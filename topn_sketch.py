@@ -0,0 +1,98 @@
+"""Top-N aproximado com memória fixa: Space-Saving ponderado e mesclável.
+
+No modo `--approx-top` os produtos e vendedores não entram no cubo; cada
+bloco de linhas é agregado por item e somado a um `EsbocoTopN`, que
+guarda no máximo `capacidade` itens, não importa quantos itens distintos
+a entrada tenha. A soma de um bloco é a fusão de dois resumos (Cafaro et
+al., "Parallel Space Saving on Multi- and Many-Core Processors"): um
+item ausente de um lado conta com a cota daquele lado e, se o resultado
+passar da capacidade, ficam os de maior estimativa. A mesma fusão junta
+os esboços calculados em processos diferentes.
+
+Garantias, para a coluna de peso (`total`, a receita):
+
+- a estimativa nunca é menor que o real, e o real está em
+  [`total` - `erro`, `total`];
+- nenhum item fora do esboço tem peso maior que `limite`;
+- o erro de qualquer item é no máximo o peso total / capacidade.
+
+Colunas numéricas extras (quantidade, transações, receita por categoria)
+são somadas só enquanto o item está no esboço: são exatas quando `erro`
+é zero e cotas inferiores nos demais. Colunas de texto (a categoria do
+produto) guardam o primeiro valor visto.
+"""
+import pandas as pd
+
+
+class EsbocoTopN:
+    """Os itens de maior peso de um fluxo, com cotas de erro, em memória fixa."""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.itens      = None  # DataFrame por item: total, erro e colunas extras
+        self.limite     = 0.0
+        self.peso_total = 0.0
+
+    def adicionar(self, parcial):
+        """Soma um agregado exato de um bloco (índice = item, coluna "total" = peso)."""
+        parcial = parcial.copy()
+        parcial.index = parcial.index.astype(object)
+        for col in parcial.columns:
+            if isinstance(parcial[col].dtype, pd.CategoricalDtype):
+                parcial[col] = parcial[col].astype(object)
+        parcial["erro"] = 0.0
+        self.peso_total += float(parcial["total"].sum())
+        self._fundir(parcial, 0.0)
+
+    def mesclar(self, outro):
+        """Junta a este esboço outro esboço (de outro bloco ou processo)."""
+        self.peso_total += outro.peso_total
+        if outro.itens is None:
+            self.limite += outro.limite
+        else:
+            self._fundir(outro.itens, outro.limite)
+
+    def _fundir(self, itens, limite):
+        if self.itens is None:
+            juntos, cota = itens, self.limite + limite
+        else:
+            a, b = self.itens, itens
+            colunas = list(a.columns) + [c for c in b.columns if c not in a.columns]
+            numericas = {c for c in colunas
+                         if pd.api.types.is_numeric_dtype((a if c in a.columns else b)[c])}
+            indice = a.index.union(b.index, sort=False)
+            a = a.reindex(index=indice, columns=colunas)
+            b = b.reindex(index=indice, columns=colunas)
+            juntos = pd.DataFrame(index=indice)
+            for col in colunas:
+                if col in ("total", "erro"):
+                    # ausente de um lado: vale a cota daquele lado
+                    juntos[col] = a[col].fillna(self.limite) + b[col].fillna(limite)
+                elif col in numericas:
+                    juntos[col] = a[col].fillna(0) + b[col].fillna(0)
+                else:
+                    juntos[col] = a[col].combine_first(b[col])
+            cota = self.limite + limite
+        if len(juntos) > self.capacidade:
+            juntos = juntos.sort_values("total", ascending=False, kind="stable")
+            cota = max(cota, float(juntos["total"].iloc[self.capacidade]))
+            juntos = juntos.iloc[:self.capacidade]
+        self.itens, self.limite = juntos, cota
+
+    def top(self, n):
+        """Os `n` itens de maior estimativa, em ordem decrescente."""
+        if self.itens is None:
+            return pd.DataFrame(columns=["total", "erro"])
+        return self.itens.sort_values("total", ascending=False, kind="stable").head(n)
+
+    def cotas(self, n):
+        """(erro máximo entre os `n` primeiros, cota de quem ficou de fora, lista garantida).
+
+        A lista é garantida quando o menor valor possível de cada um dos
+        `n` primeiros supera o maior valor possível de qualquer outro item.
+        """
+        ordenados = self.itens.sort_values("total", ascending=False, kind="stable")
+        primeiros, resto = ordenados.iloc[:n], ordenados.iloc[n:]
+        fora = max(self.limite, float(resto["total"].iloc[0]) if len(resto) else 0.0)
+        garantida = bool(((primeiros["total"] - primeiros["erro"]) >= fora).all())
+        return float(primeiros["erro"].max()), fora, garantida
@@ -0,0 +1,193 @@
+"""Backend vetorial para os gráficos: matplotlib → `reportlab.graphics`.
+
+Em vez de rasterizar a figura num PNG, um renderer do matplotlib traduz
+cada path desenhado (linhas, barras, fatias, marcadores) para shapes do
+ReportLab, e cada texto para uma `String` na mesma TTF que o matplotlib
+usou (embutida no PDF só com os glifos necessários). O resultado é um
+`Drawing`, que entra no story como qualquer flowable e é gravado no PDF
+como operadores vetoriais, sem PNG, sem zlib de pixels e sem perda de
+nitidez em qualquer zoom.
+
+Não há dependências além das que o relatório já usa.
+"""
+import os
+import pickle
+
+from matplotlib import font_manager
+from matplotlib.backend_bases import FigureCanvasBase, RendererBase
+from matplotlib.path import Path as MplPath
+from reportlab.graphics.shapes import Drawing, Group, Path, String, FILL_NON_ZERO
+from reportlab.lib import colors
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+_JUNCOES = {"miter": 0, "round": 1, "bevel": 2}
+_PONTAS  = {"butt": 0, "round": 1, "projecting": 2}
+
+
+def registrar_fonte(caminho):
+    """Registra no ReportLab a TTF usada pelo matplotlib e devolve o nome dela."""
+    nome = "mpl-" + os.path.splitext(os.path.basename(caminho))[0]
+    if nome not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(nome, caminho))
+    return nome
+
+
+def _caminho(path, transform, **kwargs):
+    """`Path` do ReportLab com os segmentos de `path` já transformados."""
+    forma = Path(fillMode=FILL_NON_ZERO, **kwargs)
+    atual = (0.0, 0.0)
+    for verts, codigo in path.iter_segments(transform, remove_nans=True, simplify=False):
+        if codigo == MplPath.MOVETO:
+            forma.moveTo(*verts)
+            atual = tuple(verts)
+        elif codigo == MplPath.LINETO:
+            forma.lineTo(*verts)
+            atual = tuple(verts)
+        elif codigo == MplPath.CURVE3:
+            # quadrática → cúbica com os mesmos extremos
+            (cx, cy, x, y), (x0, y0) = verts, atual
+            forma.curveTo(x0 + 2 / 3 * (cx - x0), y0 + 2 / 3 * (cy - y0),
+                          x + 2 / 3 * (cx - x), y + 2 / 3 * (cy - y), x, y)
+            atual = (x, y)
+        elif codigo == MplPath.CURVE4:
+            forma.curveTo(*verts)
+            atual = tuple(verts[-2:])
+        elif codigo == MplPath.CLOSEPOLY:
+            forma.closePath()
+    return forma
+
+
+def _cor(rgba, alpha=None):
+    if rgba is None:
+        return None
+    r, g, b = rgba[:3]
+    a = alpha if alpha is not None else (rgba[3] if len(rgba) > 3 else 1.0)
+    return colors.Color(r, g, b, a)
+
+
+class RendererReportLab(RendererBase):
+    """Acumula os paths desenhados pela figura como shapes do ReportLab.
+
+    Trabalha a 72 dpi, então 1 pixel do matplotlib é 1 ponto do PDF.
+    Shapes seguidas com o mesmo recorte (retângulo e/ou path de clip do
+    `gc`) vão num `Group` que começa pelos paths de recorte.
+    """
+
+    def __init__(self, largura, altura):
+        super().__init__()
+        self.width   = largura
+        self.height  = altura
+        self.shapes  = []
+        self.fontes  = {}
+        self._recorte = None  # (chave, grupo) do recorte das últimas shapes
+
+    def flipy(self):
+        return False
+
+    def get_canvas_width_height(self):
+        return self.width, self.height
+
+    def points_to_pixels(self, points):
+        return points
+
+    def _adicionar(self, gc, shape):
+        retangulo = gc.get_clip_rectangle()
+        clip, afim = gc.get_clip_path()
+        if retangulo is None and clip is None:
+            self._recorte = None
+            self.shapes.append(shape)
+            return
+        chave = (None if retangulo is None else tuple(retangulo.bounds),
+                 None if clip is None else (clip.vertices.tobytes(),
+                                            None if clip.codes is None else clip.codes.tobytes(),
+                                            tuple(afim.to_values())))
+        if self._recorte is None or self._recorte[0] != chave:
+            grupo = Group()
+            sem_tinta = {"isClipPath": 1, "fillColor": None, "strokeColor": None}
+            if retangulo is not None:
+                x, y, largura, altura = retangulo.bounds
+                grupo.add(Path([x, y, x + largura, y, x + largura, y + altura, x, y + altura],
+                               [0, 1, 1, 1, 3], fillMode=FILL_NON_ZERO, **sem_tinta))
+            if clip is not None:
+                grupo.add(_caminho(clip, afim, **sem_tinta))
+            self.shapes.append(grupo)
+            self._recorte = (chave, grupo)
+        self._recorte[1].add(shape)
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        forma = _caminho(path, transform)
+        alpha_forcado = gc.get_alpha() if gc.get_forced_alpha() else None
+        forma.fillColor = _cor(rgbFace, alpha_forcado)
+        largura = gc.get_linewidth()
+        if largura > 0:
+            forma.strokeColor    = _cor(gc.get_rgb(), alpha_forcado)
+            forma.strokeWidth    = largura
+            forma.strokeLineJoin = _JUNCOES.get(gc.get_joinstyle(), 0)
+            forma.strokeLineCap  = _PONTAS.get(gc.get_capstyle(), 0)
+            _, tracos = gc.get_dashes()
+            if tracos:
+                forma.strokeDashArray = list(tracos)
+        else:
+            forma.strokeColor = None
+        if forma.fillColor is None and forma.strokeColor is None:
+            return
+        self._adicionar(gc, forma)
+
+    def draw_text(self, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+        if ismath:
+            # mathtext vira contornos via draw_path (implementação base)
+            return super().draw_text(gc, x, y, s, prop, angle, ismath, mtext)
+        caminho = str(font_manager.findfont(prop))
+        nome = registrar_fonte(caminho)
+        self.fontes[nome] = caminho
+        alpha_forcado = gc.get_alpha() if gc.get_forced_alpha() else None
+        texto = String(0, 0, s, fontName=nome, fontSize=prop.get_size_in_points(),
+                       fillColor=_cor(gc.get_rgb(), alpha_forcado))
+        # (x, y) é o início da linha de base; a rotação é em torno dele
+        grupo = Group(texto)
+        grupo.translate(x, y)
+        grupo.rotate(angle)
+        self._adicionar(gc, grupo)
+
+
+class FigureCanvasReportLab(FigureCanvasBase):
+    """Canvas com o formato de saída "rlg" (um `Drawing` do ReportLab)."""
+
+    filetypes = {"rlg": "ReportLab Drawing"}
+
+    def print_rlg(self, destino, **kwargs):
+        largura, altura = self.figure.bbox.size
+        renderer = RendererReportLab(largura, altura)
+        self.figure.draw(renderer)
+        destino.append((largura, altura, renderer))
+
+
+def fig_to_drawing(fig, width_pt, height_pt, **savefig_kw):
+    """Converte `fig` num `Drawing` com exatamente `width_pt` × `height_pt`.
+
+    Aceita os mesmos ajustes de `savefig` (ex.: bbox_inches="tight"); a
+    figura é esticada até o tamanho pedido, como o `Image` faz com o PNG.
+    Devolve (desenho, fontes), onde `fontes` mapeia os nomes de fonte
+    usados no desenho para os arquivos TTF (veja `carregar_desenho`).
+    """
+    saida = []
+    FigureCanvasReportLab(fig).print_figure(saida, format="rlg", dpi=72, **savefig_kw)
+    largura, altura, renderer = saida[0]
+    grupo = Group(*renderer.shapes)
+    grupo.transform = (width_pt / largura, 0, 0, height_pt / altura, 0, 0)
+    desenho = Drawing(width_pt, height_pt)
+    desenho.add(grupo)
+    return desenho, renderer.fontes
+
+
+def serializar_desenho(desenho, fontes):
+    return pickle.dumps((fontes, desenho), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def carregar_desenho(dados):
+    """Inverso de `serializar_desenho`; registra as fontes neste processo."""
+    fontes, desenho = pickle.loads(dados)
+    for caminho in fontes.values():
+        registrar_fonte(caminho)
+    return desenho